@@ -1,6 +1,7 @@
 import os
+import secrets
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Annotated, Optional
 
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
@@ -10,16 +11,19 @@ from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import Admin, get_db
+from .database import Admin, get_primary_read_db
 
 load_dotenv()
 
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
+# Prometheus 抓取 /metrics 時帶的 Bearer token；未設定時不開放 /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -44,8 +48,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 async def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_primary_read_db),
 ) -> Admin:
+    return await get_admin_from_token(credentials.credentials, db)
+
+
+async def get_admin_from_token(token: str, db: AsyncSession) -> Admin:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="無效的認證憑證",
@@ -53,7 +61,6 @@ async def get_current_admin(
     )
 
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
         username: Optional[str] = payload.get("sub")
         if username is None:
@@ -70,6 +77,23 @@ async def get_current_admin(
     return admin
 
 
+def verify_metrics_token(
+    credentials: Annotated[
+        Optional[HTTPAuthorizationCredentials], Depends(optional_security)
+    ],
+) -> None:
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials, METRICS_TOKEN
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="無效的認證憑證",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
 async def authenticate_admin(
     db: AsyncSession, username: str, password: str
 ) -> Optional[Admin]:
@@ -0,0 +1,162 @@
+import os
+import re
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Optional
+
+from cachetools import LRUCache
+from sqlalchemy import distinct, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Character, KigerCharacter, Maker, read_session_maker
+from .metrics import AUTOCOMPLETE_REBUILD
+from .read_model import ReadModel
+from .search import normalize
+
+# 審核後等待多久才重建，期間的其他審核合併為一次
+AUTOCOMPLETE_REBUILD_DELAY = float(os.getenv("AUTOCOMPLETE_REBUILD_DELAY", "1"))
+# 其他 worker 的審核不會通知這個程序，超過此秒數後在背景比對資料版本，不同時重建
+AUTOCOMPLETE_MAX_AGE = float(os.getenv("AUTOCOMPLETE_MAX_AGE", "30"))
+AUTOCOMPLETE_MAX_LIMIT = 50
+# 符合的 key 超過此數量時，結果依前綴快取
+LARGE_RANGE = 256
+
+KINDS = ("character", "maker")
+KIND_ORDER = {kind: i for i, kind in enumerate(KINDS)}
+SEPARATOR = re.compile(r"[\s\-_・·/()（）]+")
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    kind: str
+    id: int
+    name: str
+    original_name: Optional[str]
+    kiger_count: int
+
+    def to_dict(self) -> dict:
+        return {
+            "type": self.kind,
+            "id": self.id,
+            "name": self.name,
+            "originalName": self.original_name,
+            "kigerCount": self.kiger_count,
+        }
+
+
+def rank(suggestion: Suggestion):
+    # 使用人數多的在前，同數量依名稱長度、類型、id，確保順序穩定
+    return (
+        -suggestion.kiger_count,
+        len(suggestion.name),
+        KIND_ORDER[suggestion.kind],
+        suggestion.id,
+    )
+
+
+def prefix_keys(suggestion: Suggestion) -> set[str]:
+    """名稱與原文名稱，以及其中每個單字開頭之後的部分（可由第二個字查到）"""
+    keys = set()
+    for text in (suggestion.name, suggestion.original_name):
+        text = normalize(text).strip()
+        if not text:
+            continue
+        keys.add(text)
+        keys.update(text[match.end() :] for match in SEPARATOR.finditer(text))
+    keys.discard("")
+    return keys
+
+
+class Snapshot:
+    """排序後的 key 陣列；建立後不再修改，重建時整個替換"""
+
+    def __init__(self, suggestions: list[Suggestion]):
+        # 位置即排名，同一前綴的結果取位置最小的幾個即可
+        self.suggestions = sorted(suggestions, key=rank)
+        pairs = sorted(
+            (key, position)
+            for position, suggestion in enumerate(self.suggestions)
+            for key in prefix_keys(suggestion)
+        )
+        self.keys = [key for key, _ in pairs]
+        self.positions = array("I", (position for _, position in pairs))
+        self.top = LRUCache(maxsize=1024)
+        # 載入前讀取的 data_version，由 ReadModel 設定
+        self.data_version: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
+
+    def matches(self, prefix: str, kinds: Optional[tuple[str, ...]]) -> list[int]:
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\U0010ffff", start)
+        if end - start > LARGE_RANGE:
+            cached = self.top.get((prefix, kinds))
+            if cached is None:
+                cached = self.rank_range(start, end, kinds)[:AUTOCOMPLETE_MAX_LIMIT]
+                self.top[(prefix, kinds)] = cached
+            return cached
+        return self.rank_range(start, end, kinds)
+
+    def rank_range(self, start: int, end: int, kinds) -> list[int]:
+        positions = sorted(set(self.positions[start:end]))
+        if kinds is None:
+            return positions
+        return [p for p in positions if self.suggestions[p].kind in kinds]
+
+    def complete(
+        self, query: str, kinds: Optional[tuple[str, ...]] = None, limit: int = 10
+    ) -> list[Suggestion]:
+        prefix = normalize(query).strip()
+        if not prefix:
+            return []
+        return [self.suggestions[p] for p in self.matches(prefix, kinds)[:limit]]
+
+
+async def load_snapshot(db: AsyncSession) -> Snapshot:
+    counts = {}
+    for kind, column in (
+        ("character", KigerCharacter.character_id),
+        ("maker", KigerCharacter.maker_id),
+    ):
+        result = await db.execute(
+            select(column, func.count(distinct(KigerCharacter.kiger_id)))
+            .where(column.is_not(None))
+            .group_by(column)
+        )
+        counts[kind] = dict(result.all())
+
+    suggestions = []
+    for kind, model in (("character", Character), ("maker", Maker)):
+        result = await db.execute(select(model.id, model.name, model.original_name))
+        suggestions.extend(
+            Suggestion(
+                kind, row.id, row.name, row.original_name, counts[kind].get(row.id, 0)
+            )
+            for row in result
+        )
+    return Snapshot(suggestions)
+
+
+class AutocompleteIndex(ReadModel):
+    """第一次查詢時建立，審核或更新後在背景重建並整個替換
+
+    重建與過期比對與 ReadModel 相同，但只保留在程序內，不寫入共用檔案
+    """
+
+    shared = False
+    rebuild_metric = AUTOCOMPLETE_REBUILD
+
+    def reset(self) -> None:
+        super().reset()
+        self.max_age = AUTOCOMPLETE_MAX_AGE
+        self.delay = AUTOCOMPLETE_REBUILD_DELAY
+
+    def complete(self, query: str, kinds=None, limit: int = 10) -> list[dict]:
+        if self.snapshot is None:
+            return []
+        return [s.to_dict() for s in self.snapshot.complete(query, kinds, limit)]
+
+
+autocomplete_index = AutocompleteIndex(load_snapshot, read_session_maker)
@@ -2,11 +2,53 @@ from typing import Any, Optional
 
 from cachetools import TTLCache
 
-cache = TTLCache(maxsize=1000, ttl=86400)
+from .metrics import (
+    CACHE_ENTRIES,
+    CACHE_EVICTIONS,
+    CACHE_REQUESTS,
+    add_collector,
+    cache_key_family,
+)
+
+
+class MeteredTTLCache(TTLCache):
+    """記錄因容量或過期而被移除的 key"""
+
+    def popitem(self):
+        key, value = super().popitem()
+        CACHE_EVICTIONS.inc(family=cache_key_family(key), reason="size")
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, _ in expired or ():
+            CACHE_EVICTIONS.inc(family=cache_key_family(key), reason="expired")
+        return expired
+
+    def clear(self):
+        # MutableMapping.clear 會逐一呼叫 popitem，主動清除不應計為淘汰
+        self.expire()
+        for key in list(self):
+            del self[key]
+
+
+cache = MeteredTTLCache(maxsize=1000, ttl=86400)
+
+
+def collect_cache_entries() -> bool:
+    CACHE_ENTRIES.set(len(cache))
+    return True
+
+
+add_collector(collect_cache_entries)
 
 
 def get_cache(key: str) -> Optional[Any]:
-    return cache.get(key)
+    value = cache.get(key)
+    CACHE_REQUESTS.inc(
+        family=cache_key_family(key), result="miss" if value is None else "hit"
+    )
+    return value
 
 
 def set_cache(key: str, value: Any) -> None:
@@ -22,8 +64,8 @@ def clear_cache() -> None:
     cache.clear()
 
 
-def invalidate_cache_by_prefix(prefix: str) -> None:
-    keys_to_delete = [key for key in cache.keys() if key.startswith(prefix)]
+def invalidate_cache_by_prefix(*prefixes: str) -> None:
+    keys_to_delete = [key for key in cache.keys() if key.startswith(prefixes)]
     for key in keys_to_delete:
         del cache[key]
 
@@ -1,20 +1,49 @@
+import asyncio
+import itertools
+import math
 import os
+import time
 from datetime import datetime
-from typing import AsyncGenerator, Optional
+from typing import Annotated, AsyncGenerator, Optional
 
 from dotenv import load_dotenv
+from fastapi import Depends, Request, Response
 from sqlalchemy import (
     JSON,
+    BigInteger,
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    event,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
 )
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from .metrics import instrument_pool
+from .migrations import ensure_schema
+from .querylog import slow_query_recorder
+from .sqlite import configure_sqlite, is_sqlite
 
 load_dotenv()
 
@@ -24,10 +53,96 @@ DATABASE_URL = os.getenv(
 )
 
 
-engine = create_async_engine(DATABASE_URL, echo=True, pool_pre_ping=True)
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+
+# 連線池設定，主資料庫、唯讀連線池與每個副本各自一份（每個 worker 也各自一份）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# 在資料庫關閉閒置連線（MySQL wait_timeout 預設 8 小時）之前先回收
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# 預設不在每次取得連線時 ping：遇到失效的連線時該次查詢失敗，
+# 連線池隨即作廢在那之前建立的所有連線
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "").lower() in ("1", "true", "yes")
+# 啟動時每個連線池預先建立的連線數，不超過 DB_POOL_SIZE
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+
+
+def engine_options(url: str) -> dict:
+    options = {
+        "echo": SQL_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    in_memory = make_url(url).database in (None, "", ":memory:")
+    if url.startswith("sqlite") and in_memory:
+        # 記憶體中的 SQLite 使用 StaticPool，沒有大小可以設定
+        return options
+    return {
+        **options,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_pool(engine, "primary")
 async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+if is_sqlite(DATABASE_URL):
+    configure_sqlite(engine, writer=True)
+# SQLite 同時只允許一個寫入者：同一個 worker 內使用 get_db 的請求依序執行到
+# commit 為止，不同 worker 之間則由 BEGIN IMMEDIATE 與 busy_timeout 排隊
+write_queue: Optional[asyncio.Lock] = (
+    asyncio.Lock() if is_sqlite(DATABASE_URL) else None
+)
+
+# 公開 GET 使用的唯讀連線池。連線固定為 autocommit，每個查詢自成 transaction，
+# 不送出 BEGIN/COMMIT；關閉 session 與歸還連線時也略過 ROLLBACK
+READ_ENGINE_OPTIONS = {
+    "isolation_level": "AUTOCOMMIT",
+    "skip_autocommit_rollback": True,
+}
+
+
+def create_read_engine(url: str, name: str) -> AsyncEngine:
+    read = create_async_engine(url, **engine_options(url), **READ_ENGINE_OPTIONS)
+    instrument_pool(read, name)
+    if is_sqlite(url):
+        configure_sqlite(read, writer=False)
+    return read
+
+
+read_engine = create_read_engine(DATABASE_URL, "read")
+slow_query_recorder.explain_with(engine, read_engine)
+read_session_maker = async_sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+# 以逗號分隔的唯讀副本，設定後公開 GET 會輪流使用；未設定時讀取主資料庫
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+replica_engines = [
+    create_read_engine(url, f"replica-{number}")
+    for number, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+]
+replica_session_makers = [
+    async_sessionmaker(replica, class_=AsyncSession, expire_on_commit=False)
+    for replica in replica_engines
+]
+_next_replica = itertools.count()
+
+# 管理員寫入後的這段時間內，該瀏覽器的讀取改走主資料庫，避免副本延遲讀到舊資料
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+STICKY_PRIMARY_COOKIE = "read_primary_until"
+# 這個 worker 最近一次 commit 公開資料的時間。寫入會清除快取，之後這段時間內
+# 副本的結果可能仍是舊資料，不寫回快取
+_last_write = 0.0
 
 
 class Base(DeclarativeBase):
@@ -69,8 +184,8 @@ class Kiger(Base):
     name: Mapped[str] = mapped_column(String(100))
     bio: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     profile_image: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
-    position: Mapped[str] = mapped_column(String(100), default="")
-    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    position: Mapped[str] = mapped_column(String(100), default="", index=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, index=True)
     social_media: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
@@ -88,10 +203,10 @@ class Character(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     original_name: Mapped[str] = mapped_column(String(100), unique=True, index=True)
     name: Mapped[str] = mapped_column(String(100))
-    type: Mapped[str] = mapped_column(String(50))
+    type: Mapped[str] = mapped_column(String(50), index=True)
     official_image: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     source_id: Mapped[Optional[int]] = mapped_column(
-        Integer, ForeignKey("sources.id"), nullable=True
+        Integer, ForeignKey("sources.id"), nullable=True, index=True
     )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
@@ -126,10 +241,14 @@ class KigerCharacter(Base):
     __tablename__ = "kiger_characters"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    kiger_id: Mapped[str] = mapped_column(String(100), ForeignKey("kigers.id"))
-    character_id: Mapped[int] = mapped_column(Integer, ForeignKey("characters.id"))
+    kiger_id: Mapped[str] = mapped_column(
+        String(100), ForeignKey("kigers.id"), index=True
+    )
+    character_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("characters.id"), index=True
+    )
     maker_id: Mapped[Optional[int]] = mapped_column(
-        Integer, ForeignKey("makers.id"), nullable=True
+        Integer, ForeignKey("makers.id"), nullable=True, index=True
     )
     images: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
 
@@ -138,6 +257,54 @@ class KigerCharacter(Base):
     maker: Mapped[Optional["Maker"]] = relationship(back_populates="kiger_characters")
 
 
+class FacetCount(Base):
+    """預先計算的分類數量（每個來源的角色數、每個商家的 Kiger 數）"""
+
+    __tablename__ = "facet_counts"
+
+    facet: Mapped[str] = mapped_column(String(50), primary_key=True)
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class DataVersion(Base):
+    """公開資料的版本（單一列），發布的資料變更時在同一個 transaction 中遞增
+
+    READ_MODEL_PATH 的快照檔在標頭記錄建立時的版本，與資料庫不同時重建
+    """
+
+    __tablename__ = "data_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+@event.listens_for(DataVersion.__table__, "after_create")
+def insert_data_version(target, connection, **_kw):
+    # 以建立時間為初始值，重建資料庫後不會與舊快照檔的版本相同
+    connection.execute(insert(target).values(id=1, version=time.time_ns()))
+
+
+def bump_data_version():
+    return (
+        update(DataVersion)
+        .where(DataVersion.id == 1)
+        .values(version=DataVersion.version + 1)
+    )
+
+
+async def bump_published(db) -> None:
+    """以 Core 的 insert/delete 修改公開資料表後呼叫；ORM 物件的變更由
+    after_flush 自動遞增，同一個 transaction 只遞增一次"""
+    if not db.info.get("published_changes"):
+        await db.execute(bump_data_version())
+        db.info["published_changes"] = True
+
+
+async def current_data_version(db) -> Optional[int]:
+    return await db.scalar(select(DataVersion.version).where(DataVersion.id == 1))
+
+
 class PendingKiger(Base):
     __tablename__ = "pending_kigers"
 
@@ -156,6 +323,11 @@ class PendingKiger(Base):
     submitted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     reviewed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
+    # 待審核列表：WHERE status = 'pending' ORDER BY submitted_at
+    __table_args__ = (
+        Index("ix_pending_kigers_status_submitted_at", "status", "submitted_at"),
+    )
+
 
 class PendingCharacter(Base):
     __tablename__ = "pending_characters"
@@ -171,6 +343,10 @@ class PendingCharacter(Base):
     submitted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     reviewed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_pending_characters_status_submitted_at", "status", "submitted_at"),
+    )
+
 
 class PendingMaker(Base):
     __tablename__ = "pending_makers"
@@ -185,9 +361,21 @@ class PendingMaker(Base):
     submitted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     reviewed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_pending_makers_status_submitted_at", "status", "submitted_at"),
+    )
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """會寫入的端點（投稿、審核、修改）用，請求結束時 commit，失敗時 rollback
+
+    SQLite 時在 write_queue 中排隊，第一次 commit 後就讓出，commit 之後的
+    等待（例如讀取模型重建）不會擋住其他寫入
+    """
     async with async_session_maker() as session:
+        if write_queue is not None:
+            await write_queue.acquire()
+            session.info["release_write_queue"] = write_queue.release
         try:
             yield session
             await session.commit()
@@ -195,9 +383,138 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback()
             raise
         finally:
+            release_write_queue(session)
             await session.close()
 
 
+async def get_primary_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """只讀取主資料庫的端點（管理員驗證、登入、待審核列表）用
+
+    使用 read_engine 的 autocommit 連線，不排入 write_queue，SQLite 時也不以
+    BEGIN IMMEDIATE 取得寫入鎖；在這個 session 中的寫入不會被 commit
+    """
+    async with read_session_maker() as session:
+        yield session
+
+
+def prefers_primary(request: Request) -> bool:
+    try:
+        until = float(request.cookies.get(STICKY_PRIMARY_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def choose_read_session_maker(request: Request) -> async_sessionmaker:
+    # 只有寫入的瀏覽器改走主資料庫；其他讀取在副本追上前可能看到舊資料
+    if not replica_session_makers or prefers_primary(request):
+        return read_session_maker
+    return replica_session_makers[next(_next_replica) % len(replica_session_makers)]
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """唯讀請求用，不 commit 也不 rollback；寫入請改用 get_db"""
+    session_maker = choose_read_session_maker(request)
+    async with session_maker() as session:
+        if session_maker in replica_session_makers:
+            session.info["replica_opened_at"] = time.time()
+        yield session
+
+
+def can_fill_cache(db: AsyncSession) -> bool:
+    """主資料庫的結果都可以寫入快取；副本的結果在寫入後 REPLICA_STICKY_SECONDS 內
+    不可以，否則可能把寫入前的舊資料放回剛清除的快取"""
+    opened_at = db.info.get("replica_opened_at")
+    return opened_at is None or opened_at > _last_write + REPLICA_STICKY_SECONDS
+
+
+def stick_to_primary(response: Optional[Response]) -> None:
+    """commit 公開資料的變更後呼叫：送出 cookie 的瀏覽器之後一小段時間內
+    改讀主資料庫，讀到自己的寫入；這個 worker 的快取也暫時不由副本填入"""
+    global _last_write
+    if not replica_session_makers or REPLICA_STICKY_SECONDS <= 0:
+        return
+    _last_write = time.time()
+    if response is None:
+        return
+    # cookie 的值也記錄到期時間，不依賴 client 遵守 max-age
+    response.set_cookie(
+        STICKY_PRIMARY_COOKIE,
+        f"{_last_write + REPLICA_STICKY_SECONDS:.3f}",
+        max_age=math.ceil(REPLICA_STICKY_SECONDS),
+        httponly=True,
+        samesite="lax",
+    )
+
+
+async def stick_after_commit(
+    response: Response, db: Annotated[AsyncSession, Depends(get_db)]
+) -> AsyncGenerator[None, None]:
+    """加在管理員寫入的端點上；寫入失敗或沒有 commit 公開資料時不送出 cookie"""
+    db.info["sticky_response"] = response
+    try:
+        yield
+    finally:
+        db.info.pop("sticky_response", None)
+
+
+async def warm_pool(db_engine: AsyncEngine, connections: int = DB_POOL_WARM) -> None:
+    """同時開啟數個連線後歸還，第一批請求不必等待建立連線"""
+    pool = db_engine.sync_engine.pool
+    if hasattr(pool, "size"):
+        connections = min(connections, pool.size())
+    opened = await asyncio.gather(
+        *(db_engine.connect().start() for _ in range(connections)),
+        return_exceptions=True,
+    )
+    await asyncio.gather(
+        *(conn.close() for conn in opened if isinstance(conn, AsyncConnection))
+    )
+    for result in opened:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def dispose_inherited_pools() -> None:
+    """fork 出的 worker 捨棄從 master 繼承的連線池，不關閉 master 的連線"""
+    for db_engine in (engine, read_engine, *replica_engines):
+        db_engine.sync_engine.dispose(close=False)
+
+
+# 這些資料表的變更會改變公開讀取的內容
+PUBLISHED_MODELS = (Source, Kiger, Character, Maker, KigerCharacter)
+
+
+@event.listens_for(Session, "after_commit")
+def release_write_queue(session):
+    release = session.info.pop("release_write_queue", None)
+    if release is not None:
+        release()
+
+
+@event.listens_for(Session, "after_flush")
+def bump_published_data_version(session, _flush_context):
+    # after_flush 時 new、dirty、deleted 仍是 flush 前的內容
+    if session.info.get("published_changes"):
+        return
+    changed = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(instance, PUBLISHED_MODELS) for instance in changed):
+        session.execute(bump_data_version())
+        session.info["published_changes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def stick_after_published_commit(session):
+    if session.info.pop("published_changes", False):
+        # 讀取模型只在公開資料改變時重建
+        session.info["published_committed"] = True
+        stick_to_primary(session.info.get("sticky_response"))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget_published_changes(session, _previous_transaction):
+    session.info.pop("published_changes", None)
+
+
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await ensure_schema(engine, Base.metadata)
@@ -0,0 +1,139 @@
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import delete, distinct, func, insert, literal, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .database import Character, FacetCount, KigerCharacter, Maker, Source
+from .migrations import schema_lock
+
+# facet -> (分組欄位, 計數)；分組欄位都有索引，只重算受影響的 key 不需掃描整張表
+FACETS = {
+    "character_sources": (Character.source_id, func.count(Character.id)),
+    "kiger_makers": (
+        KigerCharacter.maker_id,
+        func.count(distinct(KigerCharacter.kiger_id)),
+    ),
+}
+# facet -> (回應中的名稱, 名稱欄位, id 欄位)
+FACET_NAMES = {
+    "character_sources": ("characterSources", Source.title, Source.id),
+    "kiger_makers": ("kigerMakers", Maker.name, Maker.id),
+}
+
+# rebuild_facets 寫入的標記列。沒有任何角色或商家時計數表本來就是空的，
+# 以這一列判斷是否已建立，而不是計數表是否為空
+BUILT_FACET = "_built"
+
+Executor = Union[AsyncSession, AsyncConnection]
+
+
+def count_query(facet: str, keys: Optional[set[int]] = None):
+    column, total = FACETS[facet]
+    query = select(literal(facet), column, total).where(column.is_not(None))
+    if keys is not None:
+        query = query.where(column.in_(keys))
+    return query.group_by(column)
+
+
+async def insert_counts(db: Executor, facet: str, keys: Optional[set[int]] = None):
+    await db.execute(
+        insert(FacetCount).from_select(
+            ["facet", "item_id", "total"], count_query(facet, keys)
+        )
+    )
+
+
+def upsert_counts(dialect: str, facet: str, keys: set[int]):
+    """以子查詢算出每個 key 的數量後 upsert，數量為 0 的 key 保留 total=0 的列"""
+    column, total = FACETS[facet]
+    rows = [
+        {
+            "facet": facet,
+            "item_id": key,
+            "total": select(total).where(column == key).scalar_subquery(),
+        }
+        for key in sorted(keys)
+    ]
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(FacetCount).values(rows)
+        return statement.on_duplicate_key_update(total=statement.inserted.total)
+    if dialect == "sqlite":
+        statement = sqlite.insert(FacetCount).values(rows)
+    elif dialect == "postgresql":
+        statement = postgresql.insert(FacetCount).values(rows)
+    else:
+        raise NotImplementedError(f"facet upsert is not supported on {dialect}")
+    return statement.on_conflict_do_update(
+        index_elements=[FacetCount.facet, FacetCount.item_id],
+        set_={"total": statement.excluded.total},
+    )
+
+
+async def refresh_facets(db: AsyncSession, **changed: Iterable[Optional[int]]) -> None:
+    """重新計算受影響 key 的數量，與資料變更在同一個 transaction 中、commit 前呼叫
+
+    例如 refresh_facets(db, character_sources={舊來源, 新來源})
+
+    以 upsert 更新而不是先 DELETE 再 INSERT：InnoDB 刪除後插入會在索引上取得
+    gap lock，兩個同時審核的 transaction 容易互相 deadlock。key 依序寫入，
+    同時更新多個 key 的 transaction 也以相同順序上鎖
+    """
+    changed = {
+        facet: {key for key in keys if key is not None}
+        for facet, keys in changed.items()
+    }
+    changed = {facet: keys for facet, keys in changed.items() if keys}
+    if not changed:
+        return
+    # 先寫入 ORM 的變更，計數才會包含這次新增或修改的資料
+    await db.flush()
+    dialect = db.get_bind().dialect.name
+    for facet in sorted(changed):
+        await db.execute(upsert_counts(dialect, facet, changed[facet]))
+
+
+async def rebuild_facets(db: Executor) -> None:
+    """全部重新計算，用於匯入資料後或尚未建立時"""
+    await db.execute(delete(FacetCount))
+    for facet in FACETS:
+        await insert_counts(db, facet)
+    await db.execute(insert(FacetCount).values(facet=BUILT_FACET, item_id=0, total=0))
+
+
+async def facets_built(db: AsyncSession) -> bool:
+    built = await db.scalar(
+        select(FacetCount.facet).where(FacetCount.facet == BUILT_FACET)
+    )
+    # 結束這個 transaction，下次檢查才看得到其他 worker 寫入的資料
+    await db.rollback()
+    return built is not None
+
+
+async def ensure_facets(db: AsyncSession) -> None:
+    """尚未以 rebuild_facets 建立過時（新資料庫或直接匯入的資料）重建一次
+
+    多個 worker 同時啟動時，以 schema_lock 排隊，只有第一個重建
+    """
+    if await facets_built(db):
+        return
+    async with schema_lock(db.bind):
+        if not await facets_built(db):
+            await rebuild_facets(db)
+            await db.commit()
+
+
+async def load_facets(db: AsyncSession) -> dict[str, list[dict]]:
+    facets = {}
+    for facet, (key, name, id_column) in FACET_NAMES.items():
+        result = await db.execute(
+            select(FacetCount.item_id, name, FacetCount.total)
+            .join(id_column.table, id_column == FacetCount.item_id)
+            .where(FacetCount.facet == facet, FacetCount.total > 0)
+            .order_by(FacetCount.total.desc(), FacetCount.item_id)
+        )
+        facets[key] = [
+            {"id": item_id, "name": item_name, "count": total}
+            for item_id, item_name, total in result
+        ]
+    return facets
@@ -0,0 +1,74 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 flock，跨程序共用檔案的功能無法使用
+    fcntl = None
+
+
+def supported() -> bool:
+    return fcntl is not None
+
+
+def acquire(path: str, blocking: bool = True) -> int:
+    """開啟 path 並取得獨佔鎖，回傳持有鎖的 fd；關閉 fd 或程序結束時釋放。
+
+    blocking=False 時拿不到鎖會丟出 BlockingIOError
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """在 with 區塊內持有 path 的獨佔鎖，其他程序等待"""
+    fd = acquire(path)
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def _close_acquired(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        os.close(future.result())
+
+
+async def acquire_async(path: str) -> int:
+    """在 thread 中等待鎖，不卡住 event loop。
+
+    等待中的 task 被取消時 thread 仍會拿到鎖，拿到後立即釋放，不會遺留鎖
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(acquire, path))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_close_acquired)
+        raise
+
+
+@asynccontextmanager
+async def async_file_lock(path: str) -> AsyncIterator[None]:
+    """file_lock 的 async 版本"""
+    fd = await acquire_async(path)
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def is_held(path: str) -> bool:
+    """是否有其他程序持有 path 的鎖；持有者結束後鎖會自動釋放"""
+    try:
+        os.close(acquire(path, blocking=False))
+    except BlockingIOError:
+        return True
+    return False
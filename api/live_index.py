@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Hashable, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+class LiveIndex:
+    """程序內的索引：第一次使用時從資料庫建立，之後依 commit 的變更更新
+
+    每個 worker 只收得到自己送出的變更，超過 max_age 秒會從資料庫重建一次。
+    子類別提供 load（從資料庫建立）、entry（以變更建立索引項目）與
+    values（ORM 物件對應的變更，None 表示移除）；索引需有 add 與 remove
+    """
+
+    # ORM 類別 -> 類型名稱，只記錄這些類別的變更
+    model_kinds: dict[type, str] = {}
+
+    def __init__(self, changes_key: str, max_age: float):
+        """changes_key 為 commit 前暫存變更的 session.info 鍵"""
+        self.changes_key = changes_key
+        self.max_age = max_age
+        self.reset()
+        event.listen(Session, "after_flush", self.collect_changes)
+        event.listen(Session, "after_commit", self.publish_changes)
+        event.listen(Session, "after_soft_rollback", self.discard_changes)
+
+    def reset(self) -> None:
+        self.index = None
+        self.built_at = 0.0
+        self.building = False
+        self.pending: list[dict] = []
+        self.lock = asyncio.Lock()
+
+    async def load(self, db: AsyncSession):
+        raise NotImplementedError
+
+    def entry(self, key: tuple, values: tuple):
+        raise NotImplementedError
+
+    def values(self, kind: str, obj) -> Optional[tuple]:
+        raise NotImplementedError
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.built_at > self.max_age
+
+    async def ensure_built(self, db: AsyncSession):
+        # 已有索引時，重建期間其他請求繼續使用舊索引
+        if self.index is not None and (not self.stale() or self.lock.locked()):
+            return self.index
+        async with self.lock:
+            if self.index is None or self.stale():
+                await self.rebuild(db)
+        return self.index
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        self.building = True
+        try:
+            index = await self.load(db)
+            # 建立期間 commit 的變更不一定已包含在查詢結果中，建好後再套用一次
+            for changes in self.pending:
+                self.apply_changes(index, changes)
+            self.index = index
+            self.built_at = time.monotonic()
+        finally:
+            self.pending = []
+            self.building = False
+
+    def apply(self, changes: dict) -> None:
+        if self.building:
+            self.pending.append(changes)
+        if self.index is not None:
+            self.apply_changes(self.index, changes)
+
+    def apply_changes(self, index, changes: dict) -> None:
+        for key, values in changes.items():
+            if values is None:
+                index.remove(key)
+            else:
+                index.add(self.entry(key, values))
+
+    def record(
+        self,
+        session: Union[Session, AsyncSession],
+        key: Hashable,
+        values: Optional[tuple],
+    ) -> None:
+        """記錄待 commit 後更新索引的變更；values 為 None 表示移除"""
+        if isinstance(session, AsyncSession):
+            session = session.sync_session
+        session.info.setdefault(self.changes_key, {})[key] = values
+
+    def collect_changes(self, session: Session, _flush_context) -> None:
+        for obj in (*session.new, *session.dirty):
+            kind = self.model_kinds.get(type(obj))
+            if kind is not None:
+                self.record(session, (kind, obj.id), self.values(kind, obj))
+        for obj in session.deleted:
+            kind = self.model_kinds.get(type(obj))
+            if kind is not None:
+                self.record(session, (kind, obj.id), None)
+
+    def publish_changes(self, session: Session) -> None:
+        changes = session.info.pop(self.changes_key, None)
+        if changes:
+            self.apply(changes)
+
+    def discard_changes(self, session: Session, _previous_transaction) -> None:
+        session.info.pop(self.changes_key, None)
@@ -1,23 +1,40 @@
+import asyncio
 import os
 import sys
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime
+from importlib import import_module
 from uuid import uuid4
 
-from typing import Annotated, Optional
+from typing import Annotated, Callable, Optional, Union
 
 from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
-from sqlalchemy import delete, select
+from sqlalchemy import Text, and_, delete, insert, or_, select, type_coerce
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from .auth import authenticate_admin, create_access_token, get_current_admin
-from .cache import delete_cache, get_cache, invalidate_cache_by_prefix, set_cache
+from .auth import (
+    authenticate_admin,
+    create_access_token,
+    get_admin_from_token,
+    get_current_admin,
+    verify_metrics_token,
+)
+from .autocomplete import AUTOCOMPLETE_MAX_LIMIT
+from .autocomplete import KINDS as AUTOCOMPLETE_KINDS
+from .autocomplete import autocomplete_index
+from .cache import (
+    get_cache,
+    invalidate_cache_by_prefix,
+    set_cache,
+)
 from .database import Character as DBCharacter
 from .database import Kiger as DBKiger
 from .database import KigerCharacter
@@ -26,12 +43,32 @@ from .database import (
     PendingCharacter,
     PendingKiger,
     PendingMaker,
+    async_session_maker,
+    bump_published,
+    can_fill_cache,
     engine,
     get_db,
+    get_primary_read_db,
+    get_read_db,
+    read_engine,
+    read_session_maker,
+    replica_engines,
+    stick_after_commit,
+    warm_pool,
     init_db,
 )
 from .database import Source as DBSource
+from .facets import ensure_facets, load_facets, refresh_facets
+from .metrics import (
+    begin_request,
+    observe_request,
+    render_metrics,
+    start_worker_metrics,
+    stop_worker_metrics,
+    track_outbound,
+)
 from .models import (
+    BatchRequest,
     Character,
     CrawlImageRequest,
     CrawlTwitterTweetRequest,
@@ -40,22 +77,45 @@ from .models import (
     Maker,
     ReqRange,
 )
+from .profiling import finish_profile, profile_store, start_profile
+from .projections import (
+    Projection,
+    isoformat,
+    parse_names,
+    projected_response,
+    projection_cache_key,
+)
+from .query_budget import check_query_budget, query_budget
+from .querylog import slow_query_recorder
+from .read_model import ReadModel, SharedSnapshot, Snapshot, project
+from .search import KINDS, record_change, search_index
+from .snapshot_file import dump_json
+from .similarity import record_candidate, similarity_index
 from .schemas import (
+    AutocompleteResponse,
+    BatchResponse,
+    CharacterBatchResponse,
     CharacterReferenceResponse,
     CharacterListItemResponse,
     CharacterResponse,
+    FacetsResponse,
     ImageCharacterCrawlResponse,
+    KigerBatchResponse,
     KigerCharacterDataResponse,
     KigerDetailResponse,
     KigerListItemResponse,
     LoginResponse,
+    MakerBatchResponse,
     MakerListItemResponse,
     MakerResponse,
     MessageResponse,
     PendingCharacterResponse,
     PendingKigerResponse,
     PendingMakerResponse,
+    ProfileSummaryResponse,
     ReviewResponse,
+    SearchResultResponse,
+    SlowQueryResponse,
     SourceResponse,
     SourceResponseAPI,
     SubmitResponse,
@@ -64,19 +124,36 @@ from .schemas import (
 )
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from crawler import (
-    fetch_twitter_tweet,
-    fetch_twitter_user,
-    parse_character_from_tweet,
-    parse_character_image,
-)
+
+
+def lazy_crawler(name: str):
+    """crawler 會載入 google-genai 與 httpx，第一次呼叫 /crawl/* 時才匯入"""
+
+    async def call(*args, **kwargs):
+        return await getattr(import_module("crawler"), name)(*args, **kwargs)
+
+    call.__name__ = name
+    return call
+
+
+fetch_twitter_tweet = lazy_crawler("fetch_twitter_tweet")
+fetch_twitter_user = lazy_crawler("fetch_twitter_user")
+parse_character_from_tweet = lazy_crawler("parse_character_from_tweet")
+parse_character_image = lazy_crawler("parse_character_image")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    async with async_session_maker() as db:
+        await ensure_facets(db)
+    engines = (engine, read_engine, *replica_engines)
+    await asyncio.gather(*(warm_pool(db_engine) for db_engine in engines))
+    start_worker_metrics()
     yield
-    await engine.dispose()
+    await stop_worker_metrics()
+    for db_engine in engines:
+        await db_engine.dispose()
 
 
 def req_range(
@@ -99,6 +176,74 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def collect_metrics(request: Request, call_next):
+    stats = begin_request(request.url.path)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        observe_request(
+            request.method,
+            route.path if route else "unmatched",
+            status_code,
+            time.perf_counter() - start,
+            stats,
+        )
+        check_query_budget(request.method, route, stats)
+
+
+def profile_mode(request: Request) -> Optional[str]:
+    """X-Profile header 或 ?profile= 參數：1/store 存檔下載，inline 直接回傳"""
+    value = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not value:
+        return None
+    value = value.lower()
+    if value == "inline":
+        return "inline"
+    if value in ("1", "true", "yes", "store"):
+        return "store"
+    return None
+
+
+async def is_admin_request(request: Request, open_session: Callable) -> bool:
+    """open_session 為回傳 AsyncSession 的 async context manager"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    async with open_session() as db:
+        try:
+            await get_admin_from_token(token, db)
+        except HTTPException:
+            return False
+    return True
+
+
+# 註冊在 collect_metrics 之後，位於較外層，驗證管理員的查詢不會計入請求統計
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    mode = profile_mode(request)
+    if mode is None or not await is_admin_request(request, read_session_maker):
+        return await call_next(request)
+
+    profile = start_profile(request.method, request.url.path)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        result = finish_profile(profile, status_code)
+
+    if mode == "inline":
+        return JSONResponse(result, headers={"X-Profile-Id": profile.id})
+    response.headers["X-Profile-Id"] = profile.id
+    return response
+
+
 async def get_or_create_source(db: AsyncSession, source_dict: dict) -> DBSource:
     title = source_dict.get("title", "")
     company = source_dict.get("company", "")
@@ -117,16 +262,652 @@ async def get_or_create_source(db: AsyncSession, source_dict: dict) -> DBSource:
     return new_source
 
 
+def source_key(source_dict: dict) -> tuple[str, str]:
+    return (source_dict.get("title", ""), source_dict.get("company", ""))
+
+
+async def _select_source_ids(
+    db: AsyncSession, keys: list[tuple[str, str]]
+) -> dict[tuple[str, str], int]:
+    result = await db.execute(
+        select(DBSource.id, DBSource.title, DBSource.company).where(
+            or_(
+                *(
+                    and_(DBSource.title == title, DBSource.company == company)
+                    for title, company in keys
+                )
+            )
+        )
+    )
+    return {(row.title, row.company): row.id for row in result}
+
+
+async def get_or_create_sources(
+    db: AsyncSession, source_dicts: list[dict]
+) -> dict[tuple[str, str], int]:
+    """批次版本的 get_or_create_source，回傳 (title, company) -> source id"""
+    wanted: dict[tuple[str, str], int] = {}
+    for source_dict in source_dicts:
+        wanted.setdefault(source_key(source_dict), source_dict.get("releaseYear", 0))
+    if not wanted:
+        return {}
+
+    source_ids = await _select_source_ids(db, list(wanted))
+    missing = [key for key in wanted if key not in source_ids]
+    if missing:
+        await db.execute(
+            insert(DBSource),
+            [
+                {"title": title, "company": company, "release_year": wanted[key]}
+                for key in missing
+                for title, company in [key]
+            ],
+        )
+        await bump_published(db)
+        source_ids.update(await _select_source_ids(db, missing))
+    return source_ids
+
+
+async def create_characters(db: AsyncSession, rows: list[dict]) -> dict[str, int]:
+    """一次寫入多個角色（row 的 source 為來源 dict），回傳 original_name -> id"""
+    source_ids = await get_or_create_sources(
+        db, [row["source"] for row in rows if row.get("source")]
+    )
+    await db.execute(
+        insert(DBCharacter),
+        [
+            {
+                "original_name": row["original_name"],
+                "name": row["name"],
+                "type": row["type"],
+                "official_image": row["official_image"],
+                "source_id": source_ids[source_key(row["source"])]
+                if row.get("source")
+                else None,
+            }
+            for row in rows
+        ],
+    )
+    await bump_published(db)
+    await refresh_facets(db, character_sources=source_ids.values())
+    result = await db.execute(
+        select(DBCharacter.id, DBCharacter.name, DBCharacter.original_name).where(
+            DBCharacter.original_name.in_([row["original_name"] for row in rows])
+        )
+    )
+    ids = {}
+    for row in result:
+        # Core insert 不會觸發 ORM 事件，需自行通知搜尋與相似度索引
+        record_change(db, "character", row.id, row.name, row.original_name)
+        record_candidate(db, "character", row.id, row.name, row.original_name)
+        ids[row.original_name] = row.id
+    return ids
+
+
+# 列表端點只查詢需要的欄位，直接把 row 轉成 dict，不建立 ORM 物件
+KIGER_LIST_QUERY = select(
+    DBKiger.id,
+    DBKiger.name,
+    DBKiger.bio,
+    DBKiger.profile_image,
+    DBKiger.position,
+    DBKiger.is_active,
+    DBKiger.social_media,
+    DBKiger.created_at,
+    DBKiger.updated_at,
+)
+
+CHARACTER_LIST_QUERY = (
+    select(
+        DBCharacter.id,
+        DBCharacter.name,
+        DBCharacter.original_name,
+        DBCharacter.type,
+        DBCharacter.official_image,
+        DBSource.title.label("source_title"),
+        DBSource.company.label("source_company"),
+        DBSource.release_year.label("source_release_year"),
+    )
+    .outerjoin(DBSource, DBCharacter.source_id == DBSource.id)
+    .order_by(DBCharacter.id)
+)
+
+MAKER_LIST_QUERY = select(
+    DBMaker.id,
+    DBMaker.name,
+    DBMaker.original_name,
+    DBMaker.avatar,
+    DBMaker.social_media,
+)
+
+FieldsParam = Annotated[
+    Optional[str],
+    Query(description="以逗號分隔要回傳的欄位，例如 id,name,profileImage"),
+]
+
+
+def filter_conditions(*pairs) -> list:
+    """(欄位, 值) 中有指定值的轉成等值條件；篩選欄位都有索引"""
+    return [column == value for column, value in pairs if value is not None]
+
+
+def filtered_cache_key(base: str, **filters) -> str:
+    # 篩選結果的 key 以原本的 key 為前綴，失效時一併清除
+    parts = [f"{name}={value}" for name, value in filters.items() if value is not None]
+    return "|".join([base, *parts])
+
+
+KIGER_FIELDS = {
+    "id": ((DBKiger.id,), lambda row: row.id),
+    "name": ((DBKiger.name,), lambda row: row.name),
+    "bio": ((DBKiger.bio,), lambda row: row.bio),
+    "profileImage": ((DBKiger.profile_image,), lambda row: row.profile_image),
+    "position": ((DBKiger.position,), lambda row: row.position),
+    "isActive": ((DBKiger.is_active,), lambda row: row.is_active),
+    "socialMedia": ((DBKiger.social_media,), lambda row: row.social_media),
+    "createdAt": ((DBKiger.created_at,), lambda row: isoformat(row.created_at)),
+    "updatedAt": ((DBKiger.updated_at,), lambda row: isoformat(row.updated_at)),
+}
+KIGER_LIST_FIELDS = Projection(DBKiger.id, KIGER_FIELDS)
+KIGER_DETAIL_FIELDS = Projection(DBKiger.id, {**KIGER_FIELDS, "Characters": ((), None)})
+
+SOURCE_COLUMNS = tuple(CHARACTER_LIST_QUERY.selected_columns)[-3:]
+CHARACTER_FIELDS = {
+    "id": ((DBCharacter.id,), lambda row: row.id),
+    "name": ((DBCharacter.name,), lambda row: row.name),
+    "originalName": ((DBCharacter.original_name,), lambda row: row.original_name),
+    "type": ((DBCharacter.type,), lambda row: row.type),
+    "officialImage": ((DBCharacter.official_image,), lambda row: row.official_image),
+    "source": (
+        SOURCE_COLUMNS,
+        lambda row: (
+            {
+                "title": row.source_title,
+                "company": row.source_company,
+                "releaseYear": row.source_release_year,
+            }
+            if row.source_title is not None
+            else None
+        ),
+    ),
+}
+CHARACTER_LIST_FIELDS = Projection(DBCharacter.id, CHARACTER_FIELDS)
+CHARACTER_DETAIL_FIELDS = Projection(
+    DBCharacter.id, {**CHARACTER_FIELDS, "kigers": ((), None)}
+)
+
+MAKER_FIELDS = {
+    "id": ((DBMaker.id,), lambda row: row.id),
+    "name": ((DBMaker.name,), lambda row: row.name),
+    "originalName": ((DBMaker.original_name,), lambda row: row.original_name),
+    "Avatar": ((DBMaker.avatar,), lambda row: row.avatar),
+    "socialMedia": ((DBMaker.social_media,), lambda row: row.social_media),
+}
+MAKER_LIST_FIELDS = Projection(DBMaker.id, MAKER_FIELDS)
+MAKER_DETAIL_FIELDS = Projection(DBMaker.id, {**MAKER_FIELDS, "kigers": ((), None)})
+
+
+def character_projection_query(fields: tuple[str, ...]):
+    query = select(*CHARACTER_DETAIL_FIELDS.columns(fields)).order_by(DBCharacter.id)
+    if "source" in fields:
+        query = query.select_from(DBCharacter).outerjoin(
+            DBSource, DBCharacter.source_id == DBSource.id
+        )
+    return query
+
+
+def kiger_list_items(rows) -> list[dict]:
+    """KIGER_LIST_QUERY 的結果轉成 KigerListItemResponse 格式"""
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "bio": row.bio,
+            "profileImage": row.profile_image,
+            "position": row.position,
+            "isActive": row.is_active,
+            "socialMedia": row.social_media,
+            "createdAt": row.created_at.isoformat() + "Z" if row.created_at else None,
+            "updatedAt": row.updated_at.isoformat() + "Z" if row.updated_at else None,
+        }
+        for row in rows
+    ]
+
+
+def character_list_items(rows) -> list[dict]:
+    """CHARACTER_LIST_QUERY 的結果轉成 CharacterListItemResponse 格式"""
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "originalName": row.original_name,
+            "type": row.type,
+            "officialImage": row.official_image,
+            "source": {
+                "title": row.source_title,
+                "company": row.source_company,
+                "releaseYear": row.source_release_year,
+            }
+            if row.source_title is not None
+            else None,
+        }
+        for row in rows
+    ]
+
+
+def maker_list_items(rows) -> list[dict]:
+    """MAKER_LIST_QUERY 的結果轉成 MakerListItemResponse 格式"""
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "originalName": row.original_name,
+            "Avatar": row.avatar,
+            "socialMedia": row.social_media,
+        }
+        for row in rows
+    ]
+
+
+async def kiger_character_refs(
+    db: AsyncSession, kiger_ids: list[str]
+) -> dict[str, list[CharacterReferenceResponse]]:
+    """Kiger 詳情中的角色列表，依 kiger_id 分組"""
+    characters_result = await db.execute(
+        select(KigerCharacter)
+        .where(KigerCharacter.kiger_id.in_(kiger_ids))
+        .options(
+            selectinload(KigerCharacter.character),
+            selectinload(KigerCharacter.maker),
+        )
+    )
+    refs: dict[str, list[CharacterReferenceResponse]] = {}
+    for kc in characters_result.scalars().all():
+        refs.setdefault(kc.kiger_id, []).append(
+            CharacterReferenceResponse(
+                characterId=kc.character_id,
+                characterName=kc.character.name,
+                makerId=kc.maker_id,
+                makerName=kc.maker.name if kc.maker else "",
+                images=kc.images or [],
+            )
+        )
+    return refs
+
+
+async def load_kiger_details(
+    db: AsyncSession, kiger_ids: list[str]
+) -> dict[str, KigerDetailResponse]:
+    """以 IN 查詢一次取得多個 Kiger 詳情"""
+    result = await db.execute(select(DBKiger).where(DBKiger.id.in_(kiger_ids)))
+    kigers = result.scalars().all()
+    if not kigers:
+        return {}
+
+    refs = await kiger_character_refs(db, [kiger.id for kiger in kigers])
+
+    return {
+        kiger.id: KigerDetailResponse(
+            id=kiger.id,
+            name=kiger.name,
+            bio=kiger.bio,
+            profileImage=kiger.profile_image,
+            position=kiger.position,
+            isActive=kiger.is_active,
+            socialMedia=kiger.social_media,
+            Characters=refs.get(kiger.id, []),
+            createdAt=kiger.created_at.isoformat() + "Z" if kiger.created_at else None,
+            updatedAt=kiger.updated_at.isoformat() + "Z" if kiger.updated_at else None,
+        )
+        for kiger in kigers
+    }
+
+
+def kiger_character_data(relations) -> list[KigerCharacterDataResponse]:
+    """角色與商家詳情中的 Kiger 列表，relations 需已載入 kiger/character/maker"""
+    return [
+        KigerCharacterDataResponse(
+            kigerid=kc.kiger.id,
+            kigername=kc.kiger.name,
+            characterId=kc.character.id,
+            characterName=kc.character.name,
+            makerId=kc.maker.id if kc.maker else None,
+            makerName=kc.maker.name if kc.maker else "",
+            images=kc.images if kc.images else [],
+        )
+        for kc in relations
+    ]
+
+
+async def load_character_details(
+    db: AsyncSession, character_ids: list[int]
+) -> dict[int, CharacterResponse]:
+    """以 IN 查詢一次取得多個 Character 詳情"""
+    result = await db.execute(
+        select(DBCharacter)
+        .where(DBCharacter.id.in_(character_ids))
+        .options(
+            selectinload(DBCharacter.source),
+            selectinload(DBCharacter.kiger_relations).selectinload(
+                KigerCharacter.kiger
+            ),
+            selectinload(DBCharacter.kiger_relations).selectinload(
+                KigerCharacter.character
+            ),
+            selectinload(DBCharacter.kiger_relations).selectinload(
+                KigerCharacter.maker
+            ),
+        )
+    )
+    return {
+        character.id: CharacterResponse(
+            id=character.id,
+            name=character.name,
+            originalName=character.original_name,
+            type=character.type,
+            officialImage=character.official_image,
+            source=(
+                SourceResponse(
+                    title=character.source.title,
+                    company=character.source.company,
+                    releaseYear=character.source.release_year,
+                )
+                if character.source
+                else None
+            ),
+            kigers=kiger_character_data(character.kiger_relations),
+        )
+        for character in result.scalars().all()
+    }
+
+
+async def load_maker_details(
+    db: AsyncSession, maker_ids: list[int]
+) -> dict[int, MakerResponse]:
+    """以 IN 查詢一次取得多個 Maker 詳情"""
+    result = await db.execute(
+        select(DBMaker)
+        .where(DBMaker.id.in_(maker_ids))
+        .options(
+            selectinload(DBMaker.kiger_characters).selectinload(KigerCharacter.kiger),
+            selectinload(DBMaker.kiger_characters).selectinload(
+                KigerCharacter.character
+            ),
+            selectinload(DBMaker.kiger_characters).selectinload(KigerCharacter.maker),
+        )
+    )
+    return {
+        maker.id: MakerResponse(
+            id=maker.id,
+            name=maker.name,
+            originalName=maker.original_name,
+            Avatar=maker.avatar,
+            socialMedia=maker.social_media,
+            kigers=kiger_character_data(maker.kiger_characters),
+        )
+        for maker in result.scalars().all()
+    }
+
+
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
+
+def batch_ids(ids: list) -> list:
+    """去除重複並保留順序，超過 BATCH_MAX_IDS 時回傳 400"""
+    unique = list(dict.fromkeys(ids))
+    if len(unique) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request"
+        )
+    return unique
+
+
+def split_ids(raw: str, convert=str) -> list:
+    """解析以逗號分隔的 ids 參數"""
+    try:
+        return [convert(item.strip()) for item in raw.split(",") if item.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid id in ids") from None
+
+
+def fill_cache(db: AsyncSession, key: str, value) -> None:
+    """副本的結果可能早於最近一次寫入，只在 can_fill_cache 時寫入快取"""
+    if can_fill_cache(db):
+        set_cache(key, value)
+
+
+async def batch_details(db: AsyncSession, prefix: str, ids: list, load) -> dict:
+    """先讀單筆快取（與 /{prefix}/{id} 共用），未命中的以一次批次查詢取得並寫回快取"""
+    found = {}
+    misses = []
+    for item_id in ids:
+        cached = get_cache(f"{prefix}:{item_id}")
+        if cached:
+            found[item_id] = cached
+        else:
+            misses.append(item_id)
+
+    if misses:
+        for item_id, detail in (await load(db, misses)).items():
+            found[item_id] = detail.model_dump()
+            fill_cache(db, f"{prefix}:{item_id}", found[item_id])
+
+    return {
+        "data": [found[item_id] for item_id in ids if item_id in found],
+        "missing": [item_id for item_id in ids if item_id not in found],
+    }
+
+
+async def load_kiger_character_data(
+    db: AsyncSession, condition
+) -> list[KigerCharacterDataResponse]:
+    result = await db.execute(
+        select(KigerCharacter)
+        .where(condition)
+        .options(
+            selectinload(KigerCharacter.kiger),
+            selectinload(KigerCharacter.character),
+            selectinload(KigerCharacter.maker),
+        )
+    )
+    return kiger_character_data(result.scalars().all())
+
+
+ExpandParam = Annotated[
+    Optional[str],
+    Query(
+        description="以逗號分隔要一併回傳的關聯資料，放在 included 中，"
+        "例如 characters,makers,sources"
+    ),
+]
+
+KIGER_EXPANSIONS = ("characters", "makers", "sources")
+CHARACTER_EXPANSIONS = ("kigers", "makers", "sources")
+MAKER_EXPANSIONS = ("kigers", "characters", "sources")
+
+# 每次 IN 查詢的 id 數量上限，與 selectinload 相同
+EXPAND_CHUNK_SIZE = 500
+
+# 以角色 id 查詢其來源
+SOURCE_ITEM_QUERY = (
+    select(DBSource.id, DBSource.title, DBSource.company, DBSource.release_year)
+    .join(DBCharacter, DBCharacter.source_id == DBSource.id)
+    .distinct()
+    .order_by(DBSource.id)
+)
+
+
+async def select_in(db: AsyncSession, query, column, ids) -> list:
+    """以分批的 IN 查詢取得 ids 對應的資料列"""
+    ids = sorted(ids)
+    rows = []
+    for i in range(0, len(ids), EXPAND_CHUNK_SIZE):
+        result = await db.execute(
+            query.where(column.in_(ids[i : i + EXPAND_CHUNK_SIZE]))
+        )
+        rows.extend(result)
+    return rows
+
+
+async def load_included(
+    db: AsyncSession, condition, expansion: tuple[str, ...], character_ids=()
+) -> dict:
+    """依 kiger_characters 關聯找出相關資料，每種資料各一次批次查詢"""
+    result = await db.execute(
+        select(
+            KigerCharacter.kiger_id,
+            KigerCharacter.character_id,
+            KigerCharacter.maker_id,
+        ).where(condition)
+    )
+    relations = result.all()
+    character_ids = {row.character_id for row in relations} | set(character_ids)
+
+    included = {}
+    if "kigers" in expansion:
+        rows = await select_in(
+            db, KIGER_LIST_QUERY, DBKiger.id, {row.kiger_id for row in relations}
+        )
+        included["kigers"] = kiger_list_items(rows)
+    if "characters" in expansion:
+        rows = await select_in(db, CHARACTER_LIST_QUERY, DBCharacter.id, character_ids)
+        included["characters"] = character_list_items(rows)
+    if "makers" in expansion:
+        maker_ids = {row.maker_id for row in relations if row.maker_id is not None}
+        rows = await select_in(db, MAKER_LIST_QUERY, DBMaker.id, maker_ids)
+        included["makers"] = maker_list_items(rows)
+    if "sources" in expansion:
+        rows = await select_in(db, SOURCE_ITEM_QUERY, DBCharacter.id, character_ids)
+        # 不同批次可能查到同一個來源
+        sources = {row.id: row for row in rows}
+        included["sources"] = [
+            {
+                "id": row.id,
+                "title": row.title,
+                "company": row.company,
+                "releaseYear": row.release_year,
+            }
+            for _, row in sorted(sources.items())
+        ]
+    return included
+
+
+async def expanded_response(
+    db: AsyncSession,
+    data,
+    key: str,
+    expansion: tuple[str, ...],
+    condition,
+    character_ids=(),
+) -> JSONResponse:
+    """在詳情資料加上 included；included 以 expand: 為前綴另外快取，任何寫入都會清除"""
+    cache_key = f"expand:{key}|{','.join(expansion)}"
+    included = get_cache(cache_key)
+    if included is None:
+        included = await load_included(db, condition, expansion, character_ids)
+        fill_cache(db, cache_key, included)
+    if not isinstance(data, dict):
+        data = data.model_dump()
+    return JSONResponse({**data, "included": included})
+
+
+async def load_read_model(db: AsyncSession) -> Snapshot:
+    """讀取整份公開資料，格式與各列表端點相同"""
+    kigers = kiger_list_items(await db.execute(KIGER_LIST_QUERY))
+    rows = (
+        await db.execute(CHARACTER_LIST_QUERY.add_columns(DBCharacter.source_id))
+    ).all()
+    makers = maker_list_items(await db.execute(MAKER_LIST_QUERY))
+    result = await db.execute(select(DBSource).order_by(DBSource.id))
+    sources = [
+        {
+            "id": source.id,
+            "title": source.title,
+            "company": source.company,
+            "releaseYear": source.release_year,
+        }
+        for source in result.scalars()
+    ]
+    relations = await db.execute(
+        select(
+            KigerCharacter.kiger_id,
+            KigerCharacter.character_id,
+            KigerCharacter.maker_id,
+            type_coerce(KigerCharacter.images, Text).label("images"),
+        ).order_by(KigerCharacter.id)
+    )
+    return Snapshot(
+        kigers=kigers,
+        characters=character_list_items(rows),
+        character_sources={row.id: row.source_id for row in rows},
+        makers=makers,
+        sources=sources,
+        relations=relations.all(),
+        facets=await load_facets(db),
+    )
+
+
+read_model = ReadModel(load_read_model, read_session_maker)
+
+
+async def read_snapshot() -> Optional[Union[Snapshot, SharedSnapshot]]:
+    """READ_MODEL 開啟時回傳程序內的快照，不查詢資料庫；否則為 None。
+
+    第一次建立時一律讀取主資料庫，不使用請求可能分配到的副本
+    """
+    if not read_model.enabled:
+        return None
+    return await read_model.ensure_built()
+
+
+def snapshot_response(content) -> Response:
+    """共用檔案的快照回傳已編碼的 JSON（RawJSON），直接輸出"""
+    return Response(dump_json(content), media_type="application/json")
+
+
+def snapshot_detail(
+    snapshot: Union[Snapshot, SharedSnapshot],
+    kind: str,
+    item_id,
+    projection: Optional[tuple[str, ...]],
+    expansion: Optional[tuple[str, ...]],
+) -> Response:
+    if projection or expansion:
+        content = snapshot.detail(kind, item_id)
+    else:
+        content = snapshot.detail_content(kind, item_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"{kind.capitalize()} not found")
+    content = project(content, projection)
+    if expansion:
+        content = {**content, "included": snapshot.included(kind, item_id, expansion)}
+    return snapshot_response(content)
+
+
 @app.get("/", response_model=MessageResponse)
 async def root():
     return MessageResponse(message="Kigurumi Static Data API v2.0 - Database Edition")
 
 
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(verify_metrics_token)],
+)
+async def metrics():
+    """Prometheus 格式的監控指標，合併所有 worker 的數值（見 METRICS_DIR）"""
+    return PlainTextResponse(
+        await render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/crawl/twitter/user", response_model=TwitterUserCrawlResponse)
 @limiter.limit("1/3seconds")
 async def crawl_twitter_user(payload: CrawlTwitterUserRequest, request: Request):
     try:
-        twitter_data = await fetch_twitter_user(payload.username)
+        with track_outbound("twitter_user"):
+            twitter_data = await fetch_twitter_user(payload.username)
 
         user_id = payload.username
         name = twitter_data.get("name", payload.username)
@@ -158,7 +939,8 @@ async def crawl_twitter_user(payload: CrawlTwitterUserRequest, request: Request)
 @limiter.limit("1/3seconds")
 async def crawl_twitter_tweet(payload: CrawlTwitterTweetRequest, request: Request):
     try:
-        tweet_data = await fetch_twitter_tweet(payload.username, payload.tweet_id)
+        with track_outbound("twitter_tweet"):
+            tweet_data = await fetch_twitter_tweet(payload.username, payload.tweet_id)
 
         images = []
         if "media_extended" in tweet_data:
@@ -166,7 +948,8 @@ async def crawl_twitter_tweet(payload: CrawlTwitterTweetRequest, request: Reques
                 if media.get("type") == "image":
                     images.append(media.get("url", ""))
 
-        character = await parse_character_from_tweet(tweet_data)
+        with track_outbound("gemini_tweet"):
+            character = await parse_character_from_tweet(tweet_data)
         if not character:
             raise HTTPException(
                 status_code=404, detail="No character information found in the tweet"
@@ -196,7 +979,8 @@ async def crawl_image(payload: CrawlImageRequest, request: Request):
                 error="無效的圖片 URL 格式，必須以 http:// 或 https:// 開頭",
             )
 
-        character = await parse_character_image(payload.image_url)
+        with track_outbound("gemini_image"):
+            character = await parse_character_image(payload.image_url)
 
         if character:
             return ImageCharacterCrawlResponse(success=True, character=character)
@@ -212,7 +996,75 @@ async def crawl_image(payload: CrawlImageRequest, request: Request):
         )
 
 
+async def referenced_characters(
+    db: AsyncSession, ref_ids: set[int], ref_names: set[str]
+) -> tuple[set[int], set[str], set[str]]:
+    """投稿引用的角色中已發布的 id、原文名稱，以及已有待審核角色的名稱"""
+    existing_ids: set[int] = set()
+    existing_names: set[str] = set()
+    if ref_ids or ref_names:
+        existing_result = await db.execute(
+            select(DBCharacter.id, DBCharacter.original_name).where(
+                DBCharacter.id.in_(ref_ids) | DBCharacter.original_name.in_(ref_names)
+            )
+        )
+        for row in existing_result:
+            existing_ids.add(row.id)
+            existing_names.add(row.original_name)
+
+    pending_names: set[str] = set()
+    lookup_names = ref_names | {str(char_id) for char_id in ref_ids}
+    if lookup_names:
+        pending_result = await db.execute(
+            select(PendingCharacter.original_name).where(
+                PendingCharacter.original_name.in_(lookup_names),
+                PendingCharacter.status == "pending",
+            )
+        )
+        pending_names.update(pending_result.scalars())
+    return existing_ids, existing_names, pending_names
+
+
+async def pending_character_duplicates(db: AsyncSession, rows: list[dict]) -> list:
+    """自動建立的角色可能重複的既有角色，標示是哪一個投稿的角色"""
+    if not rows:
+        return []
+    await similarity_index.ensure_built(db)
+    return [
+        {**duplicate, "submitted": row["original_name"]}
+        for row in rows
+        for duplicate in similarity_index.duplicates(row["original_name"], row["name"])
+    ]
+
+
+async def create_pending_characters(db: AsyncSession, rows: list[dict]) -> list[int]:
+    """一次寫入所有自動建立的角色，再以名稱取回 id"""
+    if not rows:
+        return []
+    await db.execute(insert(PendingCharacter), rows)
+    names = [row["original_name"] for row in rows]
+    created_result = await db.execute(
+        select(PendingCharacter.id, PendingCharacter.original_name)
+        .where(
+            PendingCharacter.original_name.in_(names),
+            PendingCharacter.status == "pending",
+        )
+        .order_by(PendingCharacter.id)
+    )
+    created_ids = {row.original_name: row.id for row in created_result}
+    for row in rows:
+        record_candidate(
+            db,
+            "pendingCharacter",
+            created_ids[row["original_name"]],
+            row["name"],
+            row["original_name"],
+        )
+    return [created_ids[name] for name in names]
+
+
 @app.post("/kiger", response_model=SubmitResponse)
+@query_budget(8)
 async def submit_kiger(kiger_data: Kiger, db: AsyncSession = Depends(get_db)):
     try:
         kiger_dict = kiger_data.model_dump()
@@ -245,8 +1097,25 @@ async def submit_kiger(kiger_data: Kiger, db: AsyncSession = Depends(get_db)):
                         changed_fields.append(db_field)
 
         # 檢查 Characters 引用的 character 是否存在，不存在則自動建立 PendingCharacter
-        auto_created_character_ids = []
-        for char_ref in kiger_dict.get("Characters", []):
+        char_refs = kiger_dict.get("Characters", [])
+        ref_ids = {
+            int(char_ref["characterId"])
+            for char_ref in char_refs
+            if char_ref.get("characterId")
+        }
+        ref_names = {
+            char_ref["characterData"].get("originalName", "")
+            for char_ref in char_refs
+            if not char_ref.get("characterId") and char_ref.get("characterData")
+        }
+        ref_names.discard("")
+
+        existing_ids, existing_names, pending_names = await referenced_characters(
+            db, ref_ids, ref_names
+        )
+
+        new_pending_chars: list[dict] = []
+        for char_ref in char_refs:
             char_id = char_ref.get("characterId")
             char_data = char_ref.get("characterData")
 
@@ -257,65 +1126,33 @@ async def submit_kiger(kiger_data: Kiger, db: AsyncSession = Depends(get_db)):
                 original_name = char_data.get("originalName", "")
                 if not original_name:
                     continue
-                existing_char = await db.execute(
-                    select(DBCharacter).where(
-                        DBCharacter.original_name == original_name
-                    )
-                )
-                if existing_char.scalar_one_or_none():
+                if original_name in existing_names or original_name in pending_names:
                     continue
-                existing_pending = await db.execute(
-                    select(PendingCharacter).where(
-                        PendingCharacter.original_name == original_name,
-                        PendingCharacter.status == "pending",
-                    )
-                )
-                if existing_pending.scalar_one_or_none():
+            else:
+                if int(char_id) in existing_ids or str(char_id) in pending_names:
                     continue
-                pending_char = PendingCharacter(
-                    original_name=original_name,
-                    name=char_data.get("name", ""),
-                    type=char_data.get("type", ""),
-                    official_image=char_data.get("officialImage", ""),
-                    source=char_data.get("source"),
-                    changed_fields=None,
-                    status="pending",
-                    submitted_at=datetime.utcnow(),
-                )
-                db.add(pending_char)
-                await db.flush()
-                auto_created_character_ids.append(pending_char.id)
-                continue
+                if not char_data:
+                    continue
+                original_name = char_data.get("originalName", str(char_id))
 
-            existing_char = await db.execute(
-                select(DBCharacter).where(DBCharacter.id == int(char_id))
+            new_pending_chars.append(
+                {
+                    "original_name": original_name,
+                    "name": char_data.get("name", ""),
+                    "type": char_data.get("type", ""),
+                    "official_image": char_data.get("officialImage", ""),
+                    "source": char_data.get("source"),
+                    "changed_fields": None,
+                    "status": "pending",
+                    "submitted_at": datetime.utcnow(),
+                }
             )
-            if existing_char.scalar_one_or_none():
-                continue
+            pending_names.add(original_name)
 
-            existing_pending = await db.execute(
-                select(PendingCharacter).where(
-                    PendingCharacter.original_name == str(char_id),
-                    PendingCharacter.status == "pending",
-                )
-            )
-            if existing_pending.scalar_one_or_none():
-                continue
-
-            if char_data:
-                pending_char = PendingCharacter(
-                    original_name=char_data.get("originalName", str(char_id)),
-                    name=char_data.get("name", ""),
-                    type=char_data.get("type", ""),
-                    official_image=char_data.get("officialImage", ""),
-                    source=char_data.get("source"),
-                    changed_fields=None,
-                    status="pending",
-                    submitted_at=datetime.utcnow(),
-                )
-                db.add(pending_char)
-                await db.flush()
-                auto_created_character_ids.append(pending_char.id)
+        duplicates = await pending_character_duplicates(db, new_pending_chars)
+        auto_created_character_ids = await create_pending_characters(
+            db, new_pending_chars
+        )
 
         pending_kiger = PendingKiger(
             id=kiger_id,
@@ -340,6 +1177,7 @@ async def submit_kiger(kiger_data: Kiger, db: AsyncSession = Depends(get_db)):
             message=f"Kiger {kiger_id} submitted for review",
             status="pending",
             id=kiger_id,
+            duplicates=duplicates,
         )
     except Exception as e:
         await db.rollback()
@@ -347,6 +1185,7 @@ async def submit_kiger(kiger_data: Kiger, db: AsyncSession = Depends(get_db)):
 
 
 @app.post("/character", response_model=SubmitResponse)
+@query_budget(6)
 async def submit_character(
     character_data: Character, db: AsyncSession = Depends(get_db)
 ):
@@ -388,6 +1227,14 @@ async def submit_character(
             if submitted_source != existing_source_dict:
                 changed_fields.append("source")
 
+        await similarity_index.ensure_built(db)
+        duplicates = [
+            {**duplicate, "submitted": character_dict["originalName"]}
+            for duplicate in similarity_index.duplicates(
+                character_dict["originalName"], character_dict["name"]
+            )
+        ]
+
         pending_character = PendingCharacter(
             original_name=character_dict["originalName"],
             name=character_dict["name"],
@@ -409,6 +1256,7 @@ async def submit_character(
             message=f"Character {character_data.name} submitted for review",
             status="pending",
             id=str(pending_character.id),
+            duplicates=duplicates,
         )
     except Exception as e:
         await db.rollback()
@@ -418,6 +1266,7 @@ async def submit_character(
 
 
 @app.post("/maker", response_model=SubmitResponse)
+@query_budget(3)
 async def submit_maker(maker_data: Maker, db: AsyncSession = Depends(get_db)):
     """提交 Maker 資料，進入待審核狀態"""
     try:
@@ -469,201 +1318,335 @@ async def submit_maker(maker_data: Maker, db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/kigers", response_model=list[KigerListItemResponse])
+@query_budget(1)
 async def get_all_kigers(
     Req: Annotated[ReqRange, Depends(req_range)],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    fields: FieldsParam = None,
+    is_active: Annotated[Optional[bool], Query(alias="isActive")] = None,
+    position: Annotated[Optional[str], Query(description="依定位篩選")] = None,
 ):
     """取得所有 Kiger 資料"""
-    cache_key = "all_kigers"
+    projection = KIGER_LIST_FIELDS.parse(fields)
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(
+            snapshot.page(
+                "kiger",
+                Req.start,
+                Req.end,
+                projection,
+                isActive=is_active,
+                position=position,
+            )
+        )
+    conditions = filter_conditions(
+        (DBKiger.is_active, is_active), (DBKiger.position, position)
+    )
+    cache_key = projection_cache_key(
+        filtered_cache_key("all_kigers", isActive=is_active, position=position),
+        projection,
+    )
 
     has_range = Req.start is not None or Req.end is not None
     cached = get_cache(cache_key)
     if cached:
-        return cached[Req.start : Req.end] if has_range else cached
-
-    result = await db.execute(select(DBKiger))
-    kigers = result.scalars().all()
+        return projected_response(
+            cached[Req.start : Req.end] if has_range else cached, projection
+        )
 
-    kigers_list = [
-        KigerListItemResponse(
-            id=kiger.id,
-            name=kiger.name,
-            bio=kiger.bio,
-            profileImage=kiger.profile_image,
-            position=kiger.position,
-            isActive=kiger.is_active,
-            socialMedia=kiger.social_media,
-            createdAt=kiger.created_at.isoformat() + "Z" if kiger.created_at else None,
-            updatedAt=kiger.updated_at.isoformat() + "Z" if kiger.updated_at else None,
+    if projection:
+        result = await db.execute(
+            select(*KIGER_LIST_FIELDS.columns(projection)).where(*conditions)
         )
-        for kiger in kigers
-    ]
+        kigers_list = [KIGER_LIST_FIELDS.build(row, projection) for row in result]
+    else:
+        result = await db.execute(KIGER_LIST_QUERY.where(*conditions))
+        kigers_list = kiger_list_items(result)
 
-    set_cache(cache_key, [k.model_dump() for k in kigers_list])
+    fill_cache(db, cache_key, kigers_list)
 
-    return kigers_list[Req.start : Req.end] if has_range else kigers_list
+    return projected_response(
+        kigers_list[Req.start : Req.end] if has_range else kigers_list, projection
+    )
 
 
-@app.get("/kiger/{kiger_id}", response_model=KigerDetailResponse)
-async def get_kiger(kiger_id: str, db: AsyncSession = Depends(get_db)):
-    """取得單一 Kiger 資料"""
-    cache_key = f"kiger:{kiger_id}"
+async def kiger_detail(
+    db: AsyncSession, kiger_id: str, projection: Optional[tuple[str, ...]]
+):
+    """單筆詳情（含 fields 投影），結果依投影分別快取"""
+    cache_key = projection_cache_key(f"kiger:{kiger_id}", projection)
 
     cached = get_cache(cache_key)
     if cached:
         return cached
 
-    result = await db.execute(select(DBKiger).where(DBKiger.id == kiger_id))
-    kiger = result.scalar_one_or_none()
-
-    if not kiger:
+    if projection:
+        result = await db.execute(
+            select(*KIGER_DETAIL_FIELDS.columns(projection)).where(
+                DBKiger.id == kiger_id
+            )
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Kiger not found")
+        kiger_data = KIGER_DETAIL_FIELDS.build(row, projection)
+        if "Characters" in projection:
+            refs = await kiger_character_refs(db, [kiger_id])
+            kiger_data["Characters"] = [
+                ref.model_dump() for ref in refs.get(kiger_id, [])
+            ]
+        fill_cache(db, cache_key, kiger_data)
+        return kiger_data
+
+    kiger_response = (await load_kiger_details(db, [kiger_id])).get(kiger_id)
+
+    if not kiger_response:
         raise HTTPException(status_code=404, detail="Kiger not found")
 
-    characters_result = await db.execute(
-        select(KigerCharacter)
-        .where(KigerCharacter.kiger_id == kiger_id)
-        .options(
-            selectinload(KigerCharacter.character),
-            selectinload(KigerCharacter.maker),
-        )
-    )
-    kiger_characters = characters_result.scalars().all()
+    fill_cache(db, cache_key, kiger_response.model_dump())
 
-    characters_list = [
-        CharacterReferenceResponse(
-            characterId=kc.character_id,
-            characterName=kc.character.name,
-            makerId=kc.maker_id,
-            makerName=kc.maker.name if kc.maker else "",
-            images=kc.images or [],
+    return kiger_response
+
+
+@app.get("/kiger/{kiger_id}", response_model=KigerDetailResponse)
+@query_budget(8)
+async def get_kiger(
+    kiger_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    fields: FieldsParam = None,
+    expand: ExpandParam = None,
+):
+    """取得單一 Kiger 資料"""
+    projection = KIGER_DETAIL_FIELDS.parse(fields)
+    expansion = parse_names(expand, KIGER_EXPANSIONS, "expand")
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_detail(snapshot, "kiger", kiger_id, projection, expansion)
+    kiger = await kiger_detail(db, kiger_id, projection)
+    if expansion:
+        return await expanded_response(
+            db,
+            kiger,
+            f"kiger:{kiger_id}",
+            expansion,
+            KigerCharacter.kiger_id == kiger_id,
         )
-        for kc in kiger_characters
-    ]
+    return projected_response(kiger, projection)
+
+
+@app.get("/search", response_model=list[SearchResultResponse])
+@query_budget(3)
+async def search(
+    q: Annotated[str, Query(min_length=1, max_length=100, description="搜尋字串")],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    types: Annotated[
+        Optional[str],
+        Query(alias="type", description="以逗號分隔的資料類型：kiger,character,maker"),
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """搜尋 Kiger、角色與商家的名稱與原文名稱"""
+    kinds = parse_names(types, KINDS, "type")
+    await search_index.ensure_built(db)
+    return search_index.search(q, set(kinds) if kinds else None, limit)
+
+
+@app.get("/facets", response_model=FacetsResponse)
+@query_budget(2)
+async def get_facets(db: Annotated[AsyncSession, Depends(get_read_db)]):
+    """各來源的角色數與各商家的 Kiger 數（讀取預先計算的計數）"""
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(snapshot.facets)
+    cached = get_cache("facets")
+    if cached:
+        return cached
 
-    kiger_response = KigerDetailResponse(
-        id=kiger.id,
-        name=kiger.name,
-        bio=kiger.bio,
-        profileImage=kiger.profile_image,
-        position=kiger.position,
-        isActive=kiger.is_active,
-        socialMedia=kiger.social_media,
-        Characters=characters_list,
-        createdAt=kiger.created_at.isoformat() + "Z" if kiger.created_at else None,
-        updatedAt=kiger.updated_at.isoformat() + "Z" if kiger.updated_at else None,
-    )
+    facets = await load_facets(db)
+    fill_cache(db, "facets", facets)
+    return facets
 
-    set_cache(cache_key, kiger_response.model_dump())
 
-    return kiger_response
+@app.get("/autocomplete", response_model=list[AutocompleteResponse])
+@query_budget(4)
+async def autocomplete(
+    q: Annotated[str, Query(min_length=1, max_length=50, description="名稱開頭")],
+    types: Annotated[
+        Optional[str],
+        Query(alias="type", description="以逗號分隔的資料類型：character,maker"),
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=AUTOCOMPLETE_MAX_LIMIT)] = 10,
+):
+    """角色與商家名稱的輸入提示，依使用的 Kiger 數量排序"""
+    kinds = parse_names(types, AUTOCOMPLETE_KINDS, "type")
+    await autocomplete_index.ensure_built()
+    return autocomplete_index.complete(q, kinds, limit)
+
+
+@app.get("/kigers/batch", response_model=KigerBatchResponse)
+@query_budget(4)
+async def get_kigers_batch(
+    ids: Annotated[str, Query(description="以逗號分隔的 Kiger ID")],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
+    """一次取得多個 Kiger 資料"""
+    item_ids = batch_ids(split_ids(ids))
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(snapshot.batch("kiger", item_ids))
+    return await batch_details(db, "kiger", item_ids, load_kiger_details)
 
 
 @app.get("/characters", response_model=list[CharacterListItemResponse])
+@query_budget(1)
 async def get_all_characters(
     Req: Annotated[ReqRange, Depends(req_range)],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    fields: FieldsParam = None,
+    source_id: Annotated[Optional[int], Query(alias="sourceId")] = None,
+    character_type: Annotated[
+        Optional[str], Query(alias="type", description="依角色類型篩選")
+    ] = None,
 ):
     """取得所有 Character 資料"""
-    cache_key = "all_characters"
+    projection = CHARACTER_LIST_FIELDS.parse(fields)
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(
+            snapshot.page(
+                "character",
+                Req.start,
+                Req.end,
+                projection,
+                sourceId=source_id,
+                type=character_type,
+            )
+        )
+    conditions = filter_conditions(
+        (DBCharacter.source_id, source_id), (DBCharacter.type, character_type)
+    )
+    cache_key = projection_cache_key(
+        filtered_cache_key("all_characters", sourceId=source_id, type=character_type),
+        projection,
+    )
 
     has_range = Req.start is not None or Req.end is not None
     cached = get_cache(cache_key)
     if cached:
-        return cached[Req.start : Req.end] if has_range else cached
-
-    result = await db.execute(
-        select(DBCharacter).options(selectinload(DBCharacter.source))
-    )
-    characters = result.scalars().all()
+        return projected_response(
+            cached[Req.start : Req.end] if has_range else cached, projection
+        )
 
-    characters_list = [
-        CharacterListItemResponse(
-            id=character.id,
-            name=character.name,
-            originalName=character.original_name,
-            type=character.type,
-            officialImage=character.official_image,
-            source=SourceResponse(
-                title=character.source.title,
-                company=character.source.company,
-                releaseYear=character.source.release_year,
-            )
-            if character.source
-            else None,
+    if projection:
+        result = await db.execute(
+            character_projection_query(projection).where(*conditions)
         )
-        for character in characters
-    ]
+        characters_list = [
+            CHARACTER_LIST_FIELDS.build(row, projection) for row in result
+        ]
+    else:
+        result = await db.execute(CHARACTER_LIST_QUERY.where(*conditions))
+        characters_list = character_list_items(result)
 
-    set_cache(cache_key, [c.model_dump() for c in characters_list])
+    fill_cache(db, cache_key, characters_list)
 
-    return characters_list[Req.start : Req.end] if has_range else characters_list
+    return projected_response(
+        characters_list[Req.start : Req.end] if has_range else characters_list,
+        projection,
+    )
 
 
-@app.get("/character/{character_id}", response_model=CharacterResponse)
-async def get_character(character_id: int, db: AsyncSession = Depends(get_db)):
-    """取得單一 Character 資料"""
-    cache_key = f"character:{character_id}"
+async def character_detail(
+    db: AsyncSession, character_id: int, projection: Optional[tuple[str, ...]]
+):
+    """單筆詳情（含 fields 投影），結果依投影分別快取"""
+    cache_key = projection_cache_key(f"character:{character_id}", projection)
 
     cached = get_cache(cache_key)
     if cached:
         return cached
 
-    result = await db.execute(
-        select(DBCharacter)
-        .where(DBCharacter.id == character_id)
-        .options(
-            selectinload(DBCharacter.source),
-            selectinload(DBCharacter.kiger_relations).selectinload(
-                KigerCharacter.kiger
-            ),
-            selectinload(DBCharacter.kiger_relations).selectinload(
-                KigerCharacter.character
-            ),
-            selectinload(DBCharacter.kiger_relations).selectinload(
-                KigerCharacter.maker
-            ),
+    if projection:
+        result = await db.execute(
+            character_projection_query(projection).where(DBCharacter.id == character_id)
         )
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Character not found")
+        character_data = CHARACTER_DETAIL_FIELDS.build(row, projection)
+        if "kigers" in projection:
+            character_data["kigers"] = [
+                item.model_dump()
+                for item in await load_kiger_character_data(
+                    db, KigerCharacter.character_id == character_id
+                )
+            ]
+        fill_cache(db, cache_key, character_data)
+        return character_data
+
+    character_response = (await load_character_details(db, [character_id])).get(
+        character_id
     )
-    character = result.scalar_one_or_none()
 
-    if not character:
+    if not character_response:
         raise HTTPException(status_code=404, detail="Character not found")
 
-    character_response = CharacterResponse(
-        id=character.id,
-        name=character.name,
-        originalName=character.original_name,
-        type=character.type,
-        officialImage=character.official_image,
-        source=SourceResponse(
-            title=character.source.title,
-            company=character.source.company,
-            releaseYear=character.source.release_year,
-        )
-        if character.source
-        else None,
-        kigers=[
-            KigerCharacterDataResponse(
-                kigerid=character.kiger.id,
-                kigername=character.kiger.name,
-                characterId=character.character.id,
-                characterName=character.character.name,
-                makerId=character.maker.id if character.maker else None,
-                makerName=character.maker.name if character.maker else "",
-                images=character.images if character.images else [],
-            )
-            for character in character.kiger_relations
-        ],
-    )
-
-    set_cache(cache_key, character_response.model_dump())
+    fill_cache(db, cache_key, character_response.model_dump())
 
     return character_response
 
 
+@app.get("/characters/batch", response_model=CharacterBatchResponse)
+@query_budget(6)
+async def get_characters_batch(
+    ids: Annotated[str, Query(description="以逗號分隔的 Character ID")],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
+    """一次取得多個 Character 資料"""
+    item_ids = batch_ids(split_ids(ids, int))
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(snapshot.batch("character", item_ids))
+    return await batch_details(db, "character", item_ids, load_character_details)
+
+
+@app.get("/character/{character_id}", response_model=CharacterResponse)
+@query_budget(10)
+async def get_character(
+    character_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    fields: FieldsParam = None,
+    expand: ExpandParam = None,
+):
+    """取得單一 Character 資料"""
+    projection = CHARACTER_DETAIL_FIELDS.parse(fields)
+    expansion = parse_names(expand, CHARACTER_EXPANSIONS, "expand")
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_detail(
+            snapshot, "character", character_id, projection, expansion
+        )
+    character = await character_detail(db, character_id, projection)
+    if expansion:
+        return await expanded_response(
+            db,
+            character,
+            f"character:{character_id}",
+            expansion,
+            KigerCharacter.character_id == character_id,
+            [character_id],
+        )
+    return projected_response(character, projection)
+
+
 @app.get("/sources", response_model=list[SourceResponseAPI])
-async def get_all_sources(db: AsyncSession = Depends(get_db)):
+@query_budget(1)
+async def get_all_sources(db: AsyncSession = Depends(get_read_db)):
     """取得所有 Source 資料"""
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(snapshot.sources)
     cache_key = "all_sources"
 
     cached = get_cache(cache_key)
@@ -683,100 +1666,164 @@ async def get_all_sources(db: AsyncSession = Depends(get_db)):
         for source in sources
     ]
 
-    set_cache(cache_key, [s.model_dump() for s in sources_list])
+    fill_cache(db, cache_key, [s.model_dump() for s in sources_list])
 
     return sources_list
 
 
 @app.get("/makers", response_model=list[MakerListItemResponse])
+@query_budget(1)
 async def get_all_makers(
     Req: Annotated[ReqRange, Depends(req_range)],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    fields: FieldsParam = None,
 ):
     """取得所有 Maker 資料"""
-    cache_key = "all_makers"
+    projection = MAKER_LIST_FIELDS.parse(fields)
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(snapshot.page("maker", Req.start, Req.end, projection))
+    cache_key = projection_cache_key("all_makers", projection)
 
     has_range = Req.start is not None or Req.end is not None
     cached = get_cache(cache_key)
     if cached:
-        return cached[Req.start : Req.end] if has_range else cached
-
-    result = await db.execute(select(DBMaker))
-    makers = result.scalars().all()
-
-    makers_list = [
-        MakerListItemResponse(
-            id=maker.id,
-            name=maker.name,
-            originalName=maker.original_name,
-            Avatar=maker.avatar,
-            socialMedia=maker.social_media,
+        return projected_response(
+            cached[Req.start : Req.end] if has_range else cached, projection
         )
-        for maker in makers
-    ]
 
-    set_cache(cache_key, [m.model_dump() for m in makers_list])
+    if projection:
+        result = await db.execute(select(*MAKER_LIST_FIELDS.columns(projection)))
+        makers_list = [MAKER_LIST_FIELDS.build(row, projection) for row in result]
+    else:
+        result = await db.execute(MAKER_LIST_QUERY)
+        makers_list = maker_list_items(result)
 
-    return makers_list[Req.start : Req.end] if has_range else makers_list
+    fill_cache(db, cache_key, makers_list)
 
+    return projected_response(
+        makers_list[Req.start : Req.end] if has_range else makers_list, projection
+    )
 
-@app.get("/maker/{maker_id}", response_model=MakerResponse)
-async def get_maker(maker_id: int, db: AsyncSession = Depends(get_db)):
-    cache_key = f"maker:{maker_id}"
+
+async def maker_detail(
+    db: AsyncSession, maker_id: int, projection: Optional[tuple[str, ...]]
+):
+    """單筆詳情（含 fields 投影），結果依投影分別快取"""
+    cache_key = projection_cache_key(f"maker:{maker_id}", projection)
 
     # 檢查快取
     cached = get_cache(cache_key)
     if cached:
         return cached
 
-    result = await db.execute(
-        select(DBMaker)
-        .where(DBMaker.id == maker_id)
-        .options(
-            selectinload(DBMaker.kiger_characters).selectinload(KigerCharacter.kiger),
-            selectinload(DBMaker.kiger_characters).selectinload(
-                KigerCharacter.character
-            ),
-            selectinload(DBMaker.kiger_characters).selectinload(KigerCharacter.maker),
+    if projection:
+        result = await db.execute(
+            select(*MAKER_DETAIL_FIELDS.columns(projection)).where(
+                DBMaker.id == maker_id
+            )
         )
-    )
-    maker = result.scalar_one_or_none()
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Maker not found")
+        maker_data = MAKER_DETAIL_FIELDS.build(row, projection)
+        if "kigers" in projection:
+            maker_data["kigers"] = [
+                item.model_dump()
+                for item in await load_kiger_character_data(
+                    db, KigerCharacter.maker_id == maker_id
+                )
+            ]
+        fill_cache(db, cache_key, maker_data)
+        return maker_data
 
-    if not maker:
-        raise HTTPException(status_code=404, detail="Maker not found")
+    maker_response = (await load_maker_details(db, [maker_id])).get(maker_id)
 
-    maker_response = MakerResponse(
-        id=maker.id,
-        name=maker.name,
-        originalName=maker.original_name,
-        Avatar=maker.avatar,
-        socialMedia=maker.social_media,
-        kigers=[
-            KigerCharacterDataResponse(
-                kigerid=kc.kiger.id,
-                kigername=kc.kiger.name,
-                characterId=kc.character.id,
-                characterName=kc.character.name,
-                makerId=kc.maker.id if kc.maker else None,
-                makerName=kc.maker.name if kc.maker else "",
-                images=kc.images if kc.images else [],
-            )
-            for kc in maker.kiger_characters
-        ],
-    )
+    if not maker_response:
+        raise HTTPException(status_code=404, detail="Maker not found")
 
-    set_cache(cache_key, maker_response.model_dump())
+    fill_cache(db, cache_key, maker_response.model_dump())
 
     return maker_response
 
 
+@app.get("/makers/batch", response_model=MakerBatchResponse)
+@query_budget(5)
+async def get_makers_batch(
+    ids: Annotated[str, Query(description="以逗號分隔的 Maker ID")],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
+    """一次取得多個 Maker 資料"""
+    item_ids = batch_ids(split_ids(ids, int))
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(snapshot.batch("maker", item_ids))
+    return await batch_details(db, "maker", item_ids, load_maker_details)
+
+
+@app.post("/batch", response_model=BatchResponse)
+@query_budget(15)
+async def get_batch(
+    request: BatchRequest, db: Annotated[AsyncSession, Depends(get_read_db)]
+):
+    """一次取得多種資料，每種資料的快取未命中各以一次批次查詢取得"""
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_response(
+            {
+                "kigers": snapshot.batch("kiger", batch_ids(request.kigers)),
+                "characters": snapshot.batch(
+                    "character", batch_ids(request.characters)
+                ),
+                "makers": snapshot.batch("maker", batch_ids(request.makers)),
+            }
+        )
+    response = {}
+    for name, prefix, ids, load in (
+        ("kigers", "kiger", request.kigers, load_kiger_details),
+        ("characters", "character", request.characters, load_character_details),
+        ("makers", "maker", request.makers, load_maker_details),
+    ):
+        # 沒有 ids 的類型不查詢，但與快照相同地回傳空的結果
+        response[name] = await batch_details(db, prefix, batch_ids(ids), load)
+    return response
+
+
+@app.get("/maker/{maker_id}", response_model=MakerResponse)
+@query_budget(9)
+async def get_maker(
+    maker_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    fields: FieldsParam = None,
+    expand: ExpandParam = None,
+):
+    projection = MAKER_DETAIL_FIELDS.parse(fields)
+    expansion = parse_names(expand, MAKER_EXPANSIONS, "expand")
+    snapshot = await read_snapshot()
+    if snapshot is not None:
+        return snapshot_detail(snapshot, "maker", maker_id, projection, expansion)
+    maker = await maker_detail(db, maker_id, projection)
+    if expansion:
+        return await expanded_response(
+            db,
+            maker,
+            f"maker:{maker_id}",
+            expansion,
+            KigerCharacter.maker_id == maker_id,
+        )
+    return projected_response(maker, projection)
+
+
 class LoginRequest(BaseModel):
     username: str
     password: str
 
 
 @app.post("/admin/login", response_model=LoginResponse)
-async def admin_login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
+@query_budget(1)
+async def admin_login(
+    request: LoginRequest, db: AsyncSession = Depends(get_primary_read_db)
+):
     admin = await authenticate_admin(db, request.username, request.password)
 
     if not admin:
@@ -799,7 +1846,8 @@ async def admin_login(request: LoginRequest, db: AsyncSession = Depends(get_db))
     response_model=list[PendingKigerResponse],
     dependencies=[Depends(get_current_admin)],
 )
-async def get_pending_kigers(db: AsyncSession = Depends(get_db)):
+@query_budget(2)
+async def get_pending_kigers(db: AsyncSession = Depends(get_primary_read_db)):
     result = await db.execute(
         select(PendingKiger)
         .where(PendingKiger.status == "pending")
@@ -831,7 +1879,8 @@ async def get_pending_kigers(db: AsyncSession = Depends(get_db)):
     response_model=list[PendingCharacterResponse],
     dependencies=[Depends(get_current_admin)],
 )
-async def get_pending_characters(db: AsyncSession = Depends(get_db)):
+@query_budget(2)
+async def get_pending_characters(db: AsyncSession = Depends(get_primary_read_db)):
     result = await db.execute(
         select(PendingCharacter)
         .where(PendingCharacter.status == "pending")
@@ -860,7 +1909,8 @@ async def get_pending_characters(db: AsyncSession = Depends(get_db)):
     response_model=list[PendingMakerResponse],
     dependencies=[Depends(get_current_admin)],
 )
-async def get_pending_makers(db: AsyncSession = Depends(get_db)):
+@query_budget(2)
+async def get_pending_makers(db: AsyncSession = Depends(get_primary_read_db)):
     result = await db.execute(
         select(PendingMaker)
         .where(PendingMaker.status == "pending")
@@ -887,11 +1937,51 @@ class ReviewRequest(BaseModel):
     action: str  # "approve" or "reject"
 
 
+async def approve_auto_created_characters(db: AsyncSession, ids: list[int]) -> None:
+    """審核通過投稿 Kiger 時自動建立的 PendingCharacter，已發布的同名角色不再建立"""
+    pc_result = await db.execute(
+        select(PendingCharacter)
+        .where(PendingCharacter.id.in_(ids), PendingCharacter.status == "pending")
+        .order_by(PendingCharacter.id)
+    )
+    pending_chars = pc_result.scalars().all()
+
+    published_names: set[str] = set()
+    if pending_chars:
+        published_result = await db.execute(
+            select(DBCharacter.original_name).where(
+                DBCharacter.original_name.in_(
+                    {pc.original_name for pc in pending_chars}
+                )
+            )
+        )
+        published_names.update(published_result.scalars())
+
+    new_chars: dict[str, dict] = {}
+    for pc in pending_chars:
+        if pc.original_name not in published_names:
+            new_chars.setdefault(
+                pc.original_name,
+                {
+                    "original_name": pc.original_name,
+                    "name": pc.name,
+                    "type": pc.type,
+                    "official_image": pc.official_image,
+                    "source": pc.source,
+                },
+            )
+        pc.status = "approved"
+        pc.reviewed_at = datetime.utcnow()
+    if new_chars:
+        await create_characters(db, list(new_chars.values()))
+
+
 @app.post(
     "/admin/review/kiger/{kiger_id}",
     response_model=ReviewResponse,
-    dependencies=[Depends(get_current_admin)],
+    dependencies=[Depends(get_current_admin), Depends(stick_after_commit)],
 )
+@query_budget(21)
 async def review_kiger(
     kiger_id: str, request: ReviewRequest, db: AsyncSession = Depends(get_db)
 ):
@@ -938,97 +2028,110 @@ async def review_kiger(
 
         # 連帶審核通過自動建立的 PendingCharacter
         if pending.auto_created_characters:
-            for pc_id in pending.auto_created_characters:
-                pc_result = await db.execute(
-                    select(PendingCharacter).where(
-                        PendingCharacter.id == pc_id,
-                        PendingCharacter.status == "pending",
-                    )
-                )
-                pc = pc_result.scalar_one_or_none()
-                if not pc:
-                    continue
-
-                existing_char = await db.execute(
-                    select(DBCharacter).where(
-                        DBCharacter.original_name == pc.original_name
-                    )
-                )
-                if not existing_char.scalar_one_or_none():
-                    source_id = None
-                    if pc.source:
-                        source = await get_or_create_source(db, pc.source)
-                        source_id = source.id
-                    new_char = DBCharacter(
-                        original_name=pc.original_name,
-                        name=pc.name,
-                        type=pc.type,
-                        official_image=pc.official_image,
-                        source_id=source_id,
-                    )
-                    db.add(new_char)
-                pc.status = "approved"
-                pc.reviewed_at = datetime.utcnow()
-            invalidate_cache_by_prefix("character:")
-            delete_cache("all_characters")
-            await db.flush()
+            await approve_auto_created_characters(db, pending.auto_created_characters)
+            invalidate_cache_by_prefix(
+                "character:", "all_characters", "expand:", "facets"
+            )
 
         should_update_characters = pending.changed_fields is None or "characters" in (
             pending.changed_fields or []
         )
         if pending.characters and should_update_characters:
+            previous_makers = await db.scalars(
+                select(KigerCharacter.maker_id).where(
+                    KigerCharacter.kiger_id == target_id
+                )
+            )
+            previous_makers = set(previous_makers)
             await db.execute(
                 delete(KigerCharacter).where(KigerCharacter.kiger_id == target_id)
             )
+            await bump_published(db)
+            ref_ids = {
+                int(char_ref["characterId"])
+                for char_ref in pending.characters
+                if char_ref.get("characterId")
+            }
+            ref_names = {
+                (char_ref.get("characterData") or {}).get("originalName", "")
+                for char_ref in pending.characters
+            }
+            ref_names.discard("")
+            known_ids: set[int] = set()
+            ids_by_name: dict[str, int] = {}
+            if ref_ids or ref_names:
+                chars_result = await db.execute(
+                    select(DBCharacter.id, DBCharacter.original_name).where(
+                        DBCharacter.id.in_(ref_ids)
+                        | DBCharacter.original_name.in_(ref_names)
+                    )
+                )
+                for row in chars_result:
+                    known_ids.add(row.id)
+                    ids_by_name[row.original_name] = row.id
+
+            # 先決定每個引用對應的角色，缺少的角色一次建立
+            resolved: list[tuple[dict, Optional[int], str]] = []
+            new_chars: dict[str, dict] = {}
             for char_ref in pending.characters:
                 char_id = char_ref.get("characterId")
                 char_data = char_ref.get("characterData", {})
-                db_char = None
-                if char_id:
-                    char_result = await db.execute(
-                        select(DBCharacter).where(DBCharacter.id == int(char_id))
-                    )
-                    db_char = char_result.scalar_one_or_none()
-                if not db_char and char_data:
+                character_id = (
+                    int(char_id) if char_id and int(char_id) in known_ids else None
+                )
+                if character_id is None and char_data:
                     original_name = char_data.get("originalName", "")
                     if original_name:
-                        existing_result = await db.execute(
-                            select(DBCharacter).where(
-                                DBCharacter.original_name == original_name
-                            )
-                        )
-                        db_char = existing_result.scalar_one_or_none()
-                    if not db_char:
-                        source_id = None
-                        source_dict = char_data.get("source")
-                        if source_dict:
-                            source = await get_or_create_source(db, source_dict)
-                            source_id = source.id
-                        db_char = DBCharacter(
-                            original_name=original_name,
-                            name=char_data.get("name", original_name),
-                            type=char_data.get("type", "other"),
-                            official_image=char_data.get("officialImage"),
-                            source_id=source_id,
+                        character_id = ids_by_name.get(original_name)
+                    if character_id is None:
+                        new_chars.setdefault(
+                            original_name,
+                            {
+                                "original_name": original_name,
+                                "name": char_data.get("name", original_name),
+                                "type": char_data.get("type", "other"),
+                                "official_image": char_data.get("officialImage"),
+                                "source": char_data.get("source"),
+                            },
                         )
-                        db.add(db_char)
-                        await db.flush()
-                if not db_char:
-                    continue
-                kiger_char = KigerCharacter(
-                    kiger_id=target_id,
-                    character_id=db_char.id,
-                    maker_id=char_ref.get("makerId"),
-                    images=char_ref.get("images", []),
+                        resolved.append((char_ref, None, original_name))
+                        continue
+                if character_id is not None:
+                    resolved.append((char_ref, character_id, ""))
+
+            if new_chars:
+                ids_by_name.update(
+                    await create_characters(db, list(new_chars.values()))
+                )
+
+            if resolved:
+                await db.execute(
+                    insert(KigerCharacter),
+                    [
+                        {
+                            "kiger_id": target_id,
+                            "character_id": character_id
+                            if character_id is not None
+                            else ids_by_name[new_name],
+                            "maker_id": char_ref.get("makerId"),
+                            "images": char_ref.get("images", []),
+                        }
+                        for char_ref, character_id, new_name in resolved
+                    ],
                 )
-                db.add(kiger_char)
+            await refresh_facets(
+                db,
+                kiger_makers=previous_makers
+                | {char_ref.get("makerId") for char_ref, _, _ in resolved},
+            )
 
         pending.status = "approved"
         pending.reviewed_at = datetime.utcnow()
-        invalidate_cache_by_prefix("kiger:")
-        delete_cache("all_kigers")
+        invalidate_cache_by_prefix("kiger:", "all_kigers", "expand:", "facets")
 
         await db.commit()
+        autocomplete_index.schedule_rebuild()
+        await read_model.rebuild_after_write(db)
 
         return ReviewResponse(
             message=f"Kiger {kiger_id} approved and published", status="approved"
@@ -1048,8 +2151,9 @@ async def review_kiger(
 @app.post(
     "/admin/review/character/{character_id}",
     response_model=ReviewResponse,
-    dependencies=[Depends(get_current_admin)],
+    dependencies=[Depends(get_current_admin), Depends(stick_after_commit)],
 )
+@query_budget(10)
 async def review_character(
     character_id: int, request: ReviewRequest, db: AsyncSession = Depends(get_db)
 ):
@@ -1074,7 +2178,9 @@ async def review_character(
         if pending.source:
             source_obj = await get_or_create_source(db, pending.source)
 
+        changed_sources = {source_obj.id if source_obj else None}
         if existing:
+            changed_sources.add(existing.source_id)
             if pending.changed_fields is None:
                 existing.name = pending.name
                 existing.type = pending.type
@@ -1096,12 +2202,14 @@ async def review_character(
                 source_id=source_obj.id if source_obj else None,
             )
             db.add(new_character)
+        await refresh_facets(db, character_sources=changed_sources)
         pending.status = "approved"
         pending.reviewed_at = datetime.utcnow()
-        invalidate_cache_by_prefix("character:")
-        delete_cache("all_characters")
+        invalidate_cache_by_prefix("character:", "all_characters", "expand:", "facets")
 
         await db.commit()
+        autocomplete_index.schedule_rebuild()
+        await read_model.rebuild_after_write(db)
 
         return ReviewResponse(
             message=f"Character {character_id} approved and published",
@@ -1124,8 +2232,9 @@ async def review_character(
 @app.post(
     "/admin/review/maker/{maker_id}",
     response_model=ReviewResponse,
-    dependencies=[Depends(get_current_admin)],
+    dependencies=[Depends(get_current_admin), Depends(stick_after_commit)],
 )
+@query_budget(6)
 async def review_maker(
     maker_id: int, request: ReviewRequest, db: AsyncSession = Depends(get_db)
 ):
@@ -1165,10 +2274,11 @@ async def review_maker(
         pending.reviewed_at = datetime.utcnow()
 
         # 清除相關快取
-        invalidate_cache_by_prefix("maker:")
-        delete_cache("all_makers")
+        invalidate_cache_by_prefix("maker:", "all_makers", "expand:")
 
         await db.commit()
+        autocomplete_index.schedule_rebuild()
+        await read_model.rebuild_after_write(db)
 
         return ReviewResponse(
             message=f"Maker {maker_id} approved and published", status="approved"
@@ -1188,8 +2298,9 @@ async def review_maker(
 @app.put(
     "/admin/kiger/{kiger_id}",
     response_model=KigerDetailResponse,
-    dependencies=[Depends(get_current_admin)],
+    dependencies=[Depends(get_current_admin), Depends(stick_after_commit)],
 )
+@query_budget(11)
 async def update_kiger(
     kiger_id: str, kiger_data: Kiger, db: AsyncSession = Depends(get_db)
 ):
@@ -1212,21 +2323,37 @@ async def update_kiger(
         existing_kiger.updated_at = datetime.utcnow()
 
         if "Characters" in kiger_dict and kiger_dict["Characters"]:
+            previous_makers = await db.scalars(
+                select(KigerCharacter.maker_id).where(
+                    KigerCharacter.kiger_id == kiger_id
+                )
+            )
+            previous_makers = set(previous_makers)
             await db.execute(
                 delete(KigerCharacter).where(KigerCharacter.kiger_id == kiger_id)
             )
-            for char_ref in kiger_dict["Characters"]:
-                char_id = char_ref.get("characterId")
-                kiger_char = KigerCharacter(
-                    kiger_id=kiger_id,
-                    character_id=int(char_id) if char_id else None,
-                    maker_id=char_ref.get("makerId"),
-                    images=char_ref.get("images", []),
-                )
-                db.add(kiger_char)
+            await bump_published(db)
+            await db.execute(
+                insert(KigerCharacter),
+                [
+                    {
+                        "kiger_id": kiger_id,
+                        "character_id": int(char_ref["characterId"])
+                        if char_ref.get("characterId")
+                        else None,
+                        "maker_id": char_ref.get("makerId"),
+                        "images": char_ref.get("images", []),
+                    }
+                    for char_ref in kiger_dict["Characters"]
+                ],
+            )
+            await refresh_facets(
+                db,
+                kiger_makers=previous_makers
+                | {char_ref.get("makerId") for char_ref in kiger_dict["Characters"]},
+            )
 
-        invalidate_cache_by_prefix("kiger:")
-        delete_cache("all_kigers")
+        invalidate_cache_by_prefix("kiger:", "all_kigers", "expand:", "facets")
 
         await db.commit()
 
@@ -1250,6 +2377,9 @@ async def update_kiger(
             )
             for kc in kiger_characters
         ]
+        # 角色的使用人數可能改變
+        autocomplete_index.schedule_rebuild()
+        await read_model.rebuild_after_write(db)
 
         return KigerDetailResponse(
             id=existing_kiger.id,
@@ -1278,10 +2408,13 @@ async def update_kiger(
 @app.put(
     "/admin/character/{character_id}",
     response_model=CharacterListItemResponse,
-    dependencies=[Depends(get_current_admin)],
+    dependencies=[Depends(get_current_admin), Depends(stick_after_commit)],
 )
+@query_budget(10)
 async def update_character(
-    character_id: int, character_data: Character, db: AsyncSession = Depends(get_db)
+    character_id: int,
+    character_data: Character,
+    db: AsyncSession = Depends(get_db),
 ):
     """管理員直接修改 Character 資料"""
     try:
@@ -1299,6 +2432,7 @@ async def update_character(
         existing_character.original_name = character_dict["originalName"]
         existing_character.type = character_dict["type"]
         existing_character.official_image = character_dict.get("officialImage", "")
+        previous_source = existing_character.source_id
         source_dict = character_dict.get("source")
         if source_dict:
             source_obj = await get_or_create_source(db, source_dict)
@@ -1306,12 +2440,16 @@ async def update_character(
         else:
             existing_character.source_id = None
         existing_character.updated_at = datetime.utcnow()
+        await refresh_facets(
+            db, character_sources={previous_source, existing_character.source_id}
+        )
 
-        invalidate_cache_by_prefix("character:")
-        delete_cache("all_characters")
+        invalidate_cache_by_prefix("character:", "all_characters", "expand:", "facets")
 
         await db.commit()
         await db.refresh(existing_character, ["source"])
+        autocomplete_index.schedule_rebuild()
+        await read_model.rebuild_after_write(db)
 
         return CharacterListItemResponse(
             id=existing_character.id,
@@ -1340,8 +2478,9 @@ async def update_character(
 @app.put(
     "/admin/maker/{maker_id}",
     response_model=MakerListItemResponse,
-    dependencies=[Depends(get_current_admin)],
+    dependencies=[Depends(get_current_admin), Depends(stick_after_commit)],
 )
+@query_budget(4)
 async def update_maker(
     maker_id: int, maker_data: Maker, db: AsyncSession = Depends(get_db)
 ):
@@ -1361,10 +2500,11 @@ async def update_maker(
         existing_maker.social_media = maker_dict.get("socialMedia")
         existing_maker.updated_at = datetime.utcnow()
 
-        invalidate_cache_by_prefix("maker:")
-        delete_cache("all_makers")
+        invalidate_cache_by_prefix("maker:", "all_makers", "expand:")
 
         await db.commit()
+        autocomplete_index.schedule_rebuild()
+        await read_model.rebuild_after_write(db)
 
         return MakerListItemResponse(
             id=existing_maker.id,
@@ -1384,9 +2524,63 @@ async def update_maker(
 @app.post("/debug/clear_cache", dependencies=[Depends(get_current_admin)])
 async def clear_cache():
     try:
-        delete_cache("all_characters")
-        delete_cache("all_kigers")
-        delete_cache("all_makers")
+        invalidate_cache_by_prefix(
+            "all_characters", "all_kigers", "all_makers", "expand:", "facets"
+        )
+        await read_model.rebuild_after_write()
         return {"message": "Cache cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear cache: {str(e)}")
+
+
+@app.get(
+    "/admin/slow-queries",
+    response_model=list[SlowQueryResponse],
+    dependencies=[Depends(get_current_admin)],
+)
+async def get_slow_queries():
+    """取得最近的慢查詢紀錄（新到舊）"""
+    await slow_query_recorder.wait()
+    return slow_query_recorder.list()
+
+
+@app.delete(
+    "/admin/slow-queries",
+    response_model=MessageResponse,
+    dependencies=[Depends(get_current_admin)],
+)
+async def clear_slow_queries():
+    slow_query_recorder.clear()
+    return MessageResponse(message="Slow query log cleared")
+
+
+@app.get(
+    "/admin/profiles",
+    response_model=list[ProfileSummaryResponse],
+    dependencies=[Depends(get_current_admin)],
+)
+async def get_profiles():
+    """取得最近的請求 profile 摘要（新到舊）"""
+    return profile_store.list()
+
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(get_current_admin)])
+async def get_profile(
+    profile_id: str,
+    format: Annotated[str, Query(pattern="^(json|folded)$")] = "json",
+):
+    """下載完整 profile；format=folded 可直接交給 flamegraph 工具"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(
+            profile["folded"],
+            headers={
+                "Content-Disposition": f'attachment; filename="{profile_id}.folded"'
+            },
+        )
+    return JSONResponse(
+        profile,
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.json"'},
+    )
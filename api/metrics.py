@@ -0,0 +1,537 @@
+import asyncio
+import json
+import os
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from . import file_lock
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_registry: list["_Metric"] = []
+# render_metrics 前呼叫，用來更新只在讀取時才有意義的 gauge；回傳 False 表示移除
+_collectors: list[Callable[[], bool]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(labelnames, values, strict=False)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self, state: Optional[dict] = None) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(self.state() if state is None else state),
+        ]
+
+    def _samples(self, state: dict) -> list[str]:
+        raise NotImplementedError
+
+    def state(self) -> dict:
+        """目前的數值，key 為 label 值的 tuple；供合併多個 worker 的指標"""
+        raise NotImplementedError
+
+    def merge(self, state: dict, other: dict) -> None:
+        """把另一個 worker 的 state 加進 state"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self, state: dict) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(state.items())
+        ]
+
+    def state(self) -> dict:
+        return dict(self._values)
+
+    def merge(self, state: dict, other: dict) -> None:
+        for key, value in other.items():
+            state[key] = state.get(key, 0.0) + value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+        bucket_counts = series[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                bucket_counts[index] += 1
+                break
+        series[1] += 1
+        series[2] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0
+
+    def _samples(self, state: dict) -> list[str]:
+        lines = []
+        for key, (bucket_counts, count, total) in sorted(state.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts, strict=True):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def state(self) -> dict:
+        return {
+            key: [list(bucket_counts), count, total]
+            for key, (bucket_counts, count, total) in self._series.items()
+        }
+
+    def merge(self, state: dict, other: dict) -> None:
+        for key, (bucket_counts, count, total) in other.items():
+            series = state.setdefault(key, [[0] * len(self.buckets), 0, 0.0])
+            series[0] = [a + b for a, b in zip(series[0], bucket_counts, strict=True)]
+            series[1] += count
+            series[2] += total
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of SQL statements executed per request",
+    ("route",),
+    buckets=COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL statements per request",
+    ("route",),
+)
+READ_MODEL_REBUILD = Histogram(
+    "read_model_rebuild_seconds",
+    "Time spent loading the in-process read model snapshot",
+)
+AUTOCOMPLETE_REBUILD = Histogram(
+    "autocomplete_rebuild_seconds",
+    "Time spent loading the /autocomplete index",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by key family and result",
+    ("family", "result"),
+)
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total",
+    "Cache entries evicted by key family and reason",
+    ("family", "reason"),
+)
+CACHE_ENTRIES = Gauge("cache_entries", "Current number of cache entries")
+POOL_CONNECT = Histogram(
+    "db_pool_connect_seconds",
+    "Time spent getting a connection from the pool, including opening new ones",
+    ("pool",),
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ("pool",),
+)
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size", ("pool",))
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently in use", ("pool",)
+)
+POOL_IDLE = Gauge("db_pool_idle", "Open connections waiting in the pool", ("pool",))
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections opened beyond the pool size", ("pool",)
+)
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds",
+    "Latency of outbound crawler and Gemini calls",
+    ("target", "outcome"),
+)
+
+
+@dataclass
+class RequestStats:
+    path: Optional[str] = None
+    queries: int = 0
+    db_time: float = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def begin_request(path: Optional[str] = None) -> RequestStats:
+    stats = RequestStats(path=path)
+    _request_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def observe_request(
+    method: str, route: str, status: int, elapsed: float, stats: RequestStats
+) -> None:
+    REQUEST_LATENCY.observe(elapsed, method=method, route=route, status=status)
+    REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+    REQUEST_DB_TIME.observe(stats.db_time, route=route)
+
+
+def cache_key_family(key: str) -> str:
+    # 投影快取（all_kigers|fields=...）與原本的 key 歸在同一類
+    return key.split("|", 1)[0].split(":", 1)[0]
+
+
+@contextmanager
+def track_outbound(target: str) -> Iterator[None]:
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        OUTBOUND_LATENCY.observe(
+            time.perf_counter() - start, target=target, outcome=outcome
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute", named=True)
+def _before_cursor_execute(conn, **_kw):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute", named=True)
+def _after_cursor_execute(conn, **kw):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    # 供其他 after_cursor_execute 監聽器（例如慢查詢紀錄）使用
+    conn.info["query_duration"] = duration
+    stats = _request_stats.get()
+    # 例如 SQLite 的 BEGIN IMMEDIATE，其他資料庫由 DBAPI 隱含送出，不算一次查詢
+    if kw["context"].execution_options.get("transaction_control"):
+        return
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += duration
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    conn = context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def instrument_pool(engine, name: str) -> None:
+    """讓連線池記錄取得連線所花的時間（包含建立新連線）、逾時次數與目前的連線數"""
+    pool = engine.sync_engine.pool
+    base = type(pool)
+    if getattr(base, "_timed", False):
+        return
+
+    class TimedPool(base):
+        _timed = True
+
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except PoolTimeoutError:
+                POOL_TIMEOUTS.inc(pool=name)
+                raise
+            finally:
+                POOL_CONNECT.observe(time.perf_counter() - start, pool=name)
+
+    TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{base.__name__}"
+    # recreate() 會沿用 __class__，dispose 之後仍保有計時
+    pool.__class__ = TimedPool
+
+    # dispose 會換掉 pool 物件，每次都從 engine 取得目前的 pool
+    sync_engine = weakref.ref(engine.sync_engine)
+
+    def collect() -> bool:
+        current = sync_engine()
+        if current is None:
+            return False
+        pool = current.pool
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(pool.size(), pool=name)
+            POOL_CHECKED_OUT.set(pool.checkedout(), pool=name)
+            POOL_IDLE.set(pool.checkedin(), pool=name)
+            # 連線數未達 pool size 前 overflow() 為負數
+            POOL_OVERFLOW.set(max(pool.overflow(), 0), pool=name)
+        return True
+
+    add_collector(collect)
+
+
+# 多個 worker 時，每個 worker 定期把自己的指標寫入這個目錄，/metrics 合併所有 worker
+# 的數值，不論請求由哪個 worker 處理都回傳整個服務的統計。run.py --prod 會自動設定
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+# 已結束的 worker 的 counter 與 histogram 合併到這個檔案，gauge 則捨棄
+ARCHIVE_FILE = "archive.json"
+
+
+def add_collector(collect: Callable[[], bool]) -> None:
+    """collect 在每次輸出或寫入指標前呼叫，回傳 False 時移除"""
+    _collectors.append(collect)
+
+
+def _collect() -> dict[str, dict]:
+    _collectors[:] = [collect for collect in _collectors if collect()]
+    return {metric.name: metric.state() for metric in _registry}
+
+
+def _dump_states(states: dict[str, dict]) -> str:
+    return json.dumps(
+        {
+            name: [[list(key), value] for key, value in state.items()]
+            for name, state in states.items()
+        }
+    )
+
+
+def _load_states(path: str) -> dict[str, dict]:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {
+        name: {tuple(key): value for key, value in items}
+        for name, items in data.items()
+    }
+
+
+def _write_states(path: str, states: dict[str, dict]) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(_dump_states(states))
+    os.replace(temp_path, path)
+
+
+def _merge_states(into: dict[str, dict], other: dict[str, dict], gauges=True) -> None:
+    for metric in _registry:
+        if metric.name in other and (gauges or not isinstance(metric, Gauge)):
+            metric.merge(into.setdefault(metric.name, {}), other[metric.name])
+
+
+class WorkerMetrics:
+    """把這個 worker 的指標寫入 METRICS_DIR/<id>.json，並持有 <id>.lock 的檔案鎖。
+
+    讀取其他 worker 的檔案時，鎖已釋放代表該 worker 已結束（包括被 SIGKILL
+    或當掉），它的 counter 與 histogram 併入 archive.json 後刪除檔案
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.id = f"{os.getpid()}-{time.time_ns()}"
+        self.path = os.path.join(directory, f"{self.id}.json")
+        os.makedirs(directory, exist_ok=True)
+        # 先取得鎖再寫入檔案，其他 worker 看到檔案時鎖一定已經存在
+        self.lock_fd = file_lock.acquire(self._lock_path(self.path))
+        self._task: Optional[asyncio.Task] = None
+        self.flush()
+
+    @staticmethod
+    def _lock_path(path: str) -> str:
+        return path.removesuffix(".json") + ".lock"
+
+    def flush(self) -> None:
+        _write_states(self.path, _collect())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+            # 數值在事件迴圈上取得，寫檔在執行緒中進行
+            await asyncio.to_thread(_write_states, self.path, _collect())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """正常結束（例如達到 max_requests）時直接把最後的數值併入 archive"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # 目錄鎖可能要等其他 worker 讀完，不在事件迴圈上等待
+        await asyncio.to_thread(self._remove, _collect())
+
+    def _remove(self, states: dict[str, dict]) -> None:
+        with file_lock.file_lock(os.path.join(self.directory, ".lock")):
+            self._archive(self.path, states)
+        os.close(self.lock_fd)
+        os.remove(self._lock_path(self.path))
+
+    def _archive(self, path: str, states: dict[str, dict]) -> None:
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        archive = _load_states(archive_path)
+        _merge_states(archive, states, gauges=False)
+        _write_states(archive_path, archive)
+        os.remove(path)
+
+    def merged_states(self, states: Optional[dict] = None) -> dict[str, dict]:
+        """這個 worker 目前的數值（states）加上其他 worker 最近一次寫入的數值
+
+        會等待目錄鎖並讀寫檔案，在事件迴圈上時以 asyncio.to_thread 呼叫
+        """
+        if states is None:
+            states = _collect()
+        with file_lock.file_lock(os.path.join(self.directory, ".lock")):
+            for name in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, name)
+                if not name.endswith(".json") or path == self.path:
+                    continue
+                if name == ARCHIVE_FILE:
+                    _merge_states(states, _load_states(path), gauges=False)
+                elif file_lock.is_held(self._lock_path(path)):
+                    _merge_states(states, _load_states(path))
+                else:
+                    dead = _load_states(path)
+                    _merge_states(states, dead, gauges=False)
+                    self._archive(path, dead)
+                    os.remove(self._lock_path(path))
+        return states
+
+
+worker_metrics: Optional[WorkerMetrics] = None
+
+
+def start_worker_metrics() -> None:
+    """在 worker 啟動後（fork 之後）呼叫；未設定 METRICS_DIR 時只回報這個 worker"""
+    global worker_metrics
+    if METRICS_DIR and file_lock.supported() and worker_metrics is None:
+        worker_metrics = WorkerMetrics(METRICS_DIR)
+        worker_metrics.start()
+
+
+async def stop_worker_metrics() -> None:
+    global worker_metrics
+    if worker_metrics is not None:
+        await worker_metrics.close()
+        worker_metrics = None
+
+
+async def render_metrics() -> str:
+    # collector 與各指標的數值只在事件迴圈上讀取，合併其他 worker 的檔案則在執行緒中
+    states = _collect()
+    if worker_metrics is not None:
+        states = await asyncio.to_thread(worker_metrics.merged_states, states)
+    return (
+        "\n".join(
+            line
+            for metric in _registry
+            for line in metric.render(states.get(metric.name, {}))
+        )
+        + "\n"
+    )
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from . import file_lock
+
+logger = logging.getLogger(__name__)
+
+# 不放在 Base.metadata 中，避免 create_all 與 drop_all 影響版本紀錄
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+SCHEMA_LOCK_NAME = "kigurumi_schema"
+# MySQL 等待其他 worker 完成 migration 的秒數
+SCHEMA_LOCK_TIMEOUT = 600
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection, MetaData], None]
+
+
+def create_indexes(*names: tuple[str, str]) -> Callable[[Connection, MetaData], None]:
+    """建立 (資料表, 索引名稱) 中尚不存在的索引，定義以 models 中的 Index 為準"""
+
+    def apply(connection: Connection, metadata: MetaData) -> None:
+        inspector = inspect(connection)
+        for table_name, index_name in names:
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            if index_name in existing:
+                continue
+            (index,) = (
+                index
+                for index in metadata.tables[table_name].indexes
+                if index.name == index_name
+            )
+            logger.info("creating index %s on %s", index_name, table_name)
+            index.create(connection)
+
+    return apply
+
+
+def create_tables(*names: str) -> Callable[[Connection, MetaData], None]:
+    """建立尚不存在的資料表，定義以 models 為準"""
+
+    def apply(connection: Connection, metadata: MetaData) -> None:
+        inspector = inspect(connection)
+        for name in names:
+            if inspector.has_table(name):
+                continue
+            logger.info("creating table %s", name)
+            metadata.tables[name].create(connection)
+
+    return apply
+
+
+# 依版本排序。MySQL 的 DDL 會自動 commit，無法與版本紀錄放在同一個 transaction，
+# 因此每個 migration 都必須可以重複執行（例如只建立不存在的索引）
+MIGRATIONS = [
+    Migration(
+        1,
+        "foreign key, filter and pending status indexes",
+        create_indexes(
+            ("kiger_characters", "ix_kiger_characters_kiger_id"),
+            ("kiger_characters", "ix_kiger_characters_character_id"),
+            ("kiger_characters", "ix_kiger_characters_maker_id"),
+            ("characters", "ix_characters_source_id"),
+            ("characters", "ix_characters_type"),
+            ("kigers", "ix_kigers_is_active"),
+            ("kigers", "ix_kigers_position"),
+            ("pending_kigers", "ix_pending_kigers_status_submitted_at"),
+            ("pending_characters", "ix_pending_characters_status_submitted_at"),
+            ("pending_makers", "ix_pending_makers_status_submitted_at"),
+        ),
+    ),
+    Migration(2, "public data version", create_tables("data_version")),
+]
+# 新增資料表、欄位或索引時都要加上新的 migration，
+# 否則版本已是最新的資料庫啟動時不會再執行 create_all
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def applied_versions(conn: AsyncConnection) -> set[int]:
+    await conn.run_sync(schema_metadata.create_all)
+    result = await conn.execute(select(schema_version.c.version))
+    return set(result.scalars())
+
+
+async def migrate(conn: AsyncConnection, metadata: MetaData) -> list[int]:
+    """依序套用尚未套用的 migration，回傳這次套用的版本"""
+    applied = await applied_versions(conn)
+    newly_applied = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        logger.info("applying migration %d: %s", migration.version, migration.name)
+        await conn.run_sync(migration.apply, metadata)
+        await conn.execute(
+            insert(schema_version).values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.utcnow(),
+            )
+        )
+        newly_applied.append(migration.version)
+    return newly_applied
+
+
+async def current_version(conn: AsyncConnection) -> Optional[int]:
+    """以單一查詢取得已套用的最新版本，版本表不存在時回傳 None"""
+    try:
+        return await conn.scalar(select(func.max(schema_version.c.version)))
+    except DBAPIError:
+        return None
+
+
+async def create_schema(engine: AsyncEngine, metadata: MetaData) -> list[int]:
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        # create_all 不會替既有的資料表加上新的索引
+        return await migrate(conn, metadata)
+
+
+@asynccontextmanager
+async def schema_lock(engine: AsyncEngine) -> AsyncIterator[None]:
+    """跨程序的鎖，多個 worker 同時啟動時依序建立資料表、套用 migration 與初始資料。
+
+    MySQL 的 DDL 會自動 commit，以 GET_LOCK 排隊；SQLite 的 DDL 不一定在
+    BEGIN IMMEDIATE 中，且建立索引可能超過 busy_timeout，改鎖資料庫旁的檔案
+    """
+    if engine.dialect.name in ("mysql", "mariadb"):
+        async with engine.connect() as conn:
+            acquired = await conn.scalar(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": SCHEMA_LOCK_NAME, "timeout": SCHEMA_LOCK_TIMEOUT},
+            )
+            if acquired != 1:
+                raise TimeoutError(f"could not acquire {SCHEMA_LOCK_NAME} lock")
+            try:
+                yield
+            finally:
+                await conn.scalar(
+                    text("SELECT RELEASE_LOCK(:name)"), {"name": SCHEMA_LOCK_NAME}
+                )
+        return
+    database = engine.url.database
+    if (
+        engine.dialect.name != "sqlite"
+        or not database
+        or database == ":memory:"
+        or not file_lock.supported()
+    ):
+        # 記憶體資料庫只屬於這個程序，不需要鎖
+        yield
+        return
+    # 同一個程序內的另一個 engine 也可能持有鎖，在 thread 中等待以免卡住 event loop
+    async with file_lock.async_file_lock(f"{database}.schema-lock"):
+        yield
+
+
+async def schema_is_current(engine: AsyncEngine) -> bool:
+    async with engine.connect() as conn:
+        version = await current_version(conn)
+    if version is not None and version > LATEST_VERSION:
+        logger.warning(
+            "database schema version %d is newer than %d", version, LATEST_VERSION
+        )
+    return version is not None and version >= LATEST_VERSION
+
+
+async def ensure_schema(engine: AsyncEngine, metadata: MetaData) -> bool:
+    """版本已是最新時只查詢一次，不反射資料表；回傳是否執行了建立與 migration"""
+    if await schema_is_current(engine):
+        return False
+    async with schema_lock(engine):
+        # 等待鎖的期間其他 worker 可能已經完成
+        if await schema_is_current(engine):
+            return False
+        try:
+            await create_schema(engine, metadata)
+        except IntegrityError:
+            # 沒有檔案鎖可用時（例如 Windows），其他 worker 可能已先寫入相同的版本紀錄
+            async with engine.connect() as conn:
+                if await current_version(conn) != LATEST_VERSION:
+                    raise
+    return True
@@ -83,6 +83,14 @@ class CrawlImageRequest(BaseModel):
     image_url: str = Field(..., description="要識別的圖片 URL")
 
 
+class BatchRequest(BaseModel):
+    """一次取得多種資料的請求"""
+
+    kigers: List[str] = Field(default_factory=list, description="Kiger ID 列表")
+    characters: List[int] = Field(default_factory=list, description="角色 ID 列表")
+    makers: List[int] = Field(default_factory=list, description="商家 ID 列表")
+
+
 class UpdateDataRequest(BaseModel):
     data_type: str = Field(..., description="kiger, character, or maker")
     data: dict
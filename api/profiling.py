@@ -0,0 +1,307 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_BUFFER = int(os.getenv("PROFILE_BUFFER", "20"))
+MAX_STACK_DEPTH = 64
+
+CATEGORIES = ("pydantic", "orm_hydration", "event_loop_wait", "other")
+
+Frame = tuple[str, str, int]
+
+
+def _short_filename(filename: str) -> str:
+    if "site-packages" in filename:
+        return filename.rsplit("site-packages", 1)[-1].lstrip(os.sep)
+    cwd = os.getcwd()
+    if filename.startswith(cwd):
+        return os.path.relpath(filename, cwd)
+    return filename
+
+
+def _normalize(filename: str) -> str:
+    return filename.replace(os.sep, "/")
+
+
+def classify(stack: tuple[Frame, ...]) -> str:
+    """依請求本身執行中的呼叫堆疊（根到葉）判斷樣本屬於哪一類耗時"""
+    for filename, name, _ in reversed(stack):
+        path = _normalize(filename)
+        if (
+            "/pydantic/" in path
+            or "/pydantic_core/" in path
+            or path.endswith("fastapi/_compat.py")
+            or name == "serialize_response"
+        ):
+            return "pydantic"
+        if path.endswith("sqlalchemy/orm/loading.py"):
+            return "orm_hydration"
+    return "other"
+
+
+class SamplingProfiler:
+    """以背景執行緒定期抓取目標執行緒的呼叫堆疊
+
+    呼叫過 track() 後只記錄這些 coroutine 執行中的堆疊；目標執行緒正在執行
+    其他工作（或閒置）的樣本計為 event_loop_wait，也就是請求在等待 DB、
+    網路 I/O 或其他請求讓出事件迴圈的時間，與事件迴圈的實作無關
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILE_INTERVAL_MS / 1000,
+        thread_id: Optional[int] = None,
+    ):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.samples: Counter[tuple[Frame, ...]] = Counter()
+        self.waiting = 0
+        self.coroutines: Optional[list] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+
+    def track(self, coro) -> None:
+        if self._stop.is_set():
+            # 請求結束後才建立的 task 不屬於這次取樣
+            return
+        if self.coroutines is None:
+            self.coroutines = []
+        self.coroutines.append(coro)
+
+    def _task_frames(self) -> Optional[set[int]]:
+        if self.coroutines is None:
+            return None
+        frames = (getattr(coro, "cr_frame", None) for coro in tuple(self.coroutines))
+        return {id(frame) for frame in frames if frame is not None}
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._start
+        if self.coroutines:
+            # 不再持有請求的 coroutine
+            self.coroutines.clear()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            roots = self._task_frames()
+            stack = []
+            # 由葉往根走到追蹤中 task 的 coroutine 為止，不記錄事件迴圈本身
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                if roots is not None and id(frame) in roots:
+                    break
+                frame = frame.f_back
+            if roots is not None and frame is None:
+                self.waiting += 1
+                continue
+            del frame
+            self.samples[tuple(reversed(stack[:MAX_STACK_DEPTH]))] += 1
+
+    def breakdown(self) -> dict[str, float]:
+        total = sum(self.samples.values()) + self.waiting
+        ms_per_sample = self.duration * 1000 / total if total else 0.0
+        counts = dict.fromkeys(CATEGORIES, 0)
+        for stack, count in self.samples.items():
+            counts[classify(stack)] += count
+        counts["event_loop_wait"] += self.waiting
+        return {
+            category: round(count * ms_per_sample, 3)
+            for category, count in counts.items()
+        }
+
+    def call_tree(self) -> dict:
+        root: dict = {"name": "<root>", "samples": 0, "children": {}}
+        for stack, count in self.samples.items():
+            root["samples"] += count
+            node = root
+            for filename, name, line in stack:
+                label = f"{name} ({_short_filename(filename)}:{line})"
+                node = node["children"].setdefault(
+                    label, {"name": label, "samples": 0, "children": {}}
+                )
+                node["samples"] += count
+        return _freeze(root)
+
+    def folded(self) -> str:
+        """輸出 flamegraph 工具使用的 folded stack 格式"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = ";".join(
+                f"{name} ({_short_filename(filename)}:{line})"
+                for filename, name, line in stack
+            )
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _freeze(node: dict) -> dict:
+    children = sorted(node["children"].values(), key=lambda n: -n["samples"])
+    return {
+        "name": node["name"],
+        "samples": node["samples"],
+        "children": [_freeze(child) for child in children],
+    }
+
+
+class RequestProfile:
+    """單一請求的取樣結果，外加 DB 查詢次數與時間"""
+
+    def __init__(
+        self, method: str, path: str, interval: float = PROFILE_INTERVAL_MS / 1000
+    ):
+        self.id = uuid4().hex
+        self.method = method
+        self.path = path
+        self.timestamp = datetime.utcnow().isoformat() + "Z"
+        self.queries = 0
+        self.db_time = 0.0
+        self.finished = False
+        self.profiler = SamplingProfiler(interval=interval)
+
+    def to_dict(self, status: int) -> dict:
+        profiler = self.profiler
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "timestamp": self.timestamp,
+            "durationMs": round(profiler.duration * 1000, 3),
+            "intervalMs": profiler.interval * 1000,
+            "samples": sum(profiler.samples.values()) + profiler.waiting,
+            "breakdown": profiler.breakdown(),
+            "db": {"queries": self.queries, "waitMs": round(self.db_time * 1000, 3)},
+            "tree": profiler.call_tree(),
+            "folded": profiler.folded(),
+        }
+
+
+_active_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "active_profile", default=None
+)
+
+
+def _track_request_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    """請求期間建立的 task（例如 middleware 的 call_next）也算是該請求的工作
+
+    只在有 profile 進行中時安裝 task factory，最後一個 profile 結束後還原
+    """
+    current = loop.get_task_factory()
+    if getattr(current, "tracks_profiles", False):
+        current.active += 1
+        return
+    previous = current
+
+    def task_factory(loop, coro, **kwargs):
+        if previous is None:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        else:
+            task = previous(loop, coro, **kwargs)
+        context = kwargs.get("context")
+        profile = (
+            _active_profile.get() if context is None else context.get(_active_profile)
+        )
+        if profile is not None and not profile.finished:
+            profile.profiler.track(coro)
+        return task
+
+    task_factory.tracks_profiles = True
+    task_factory.previous = previous
+    task_factory.active = 1
+    loop.set_task_factory(task_factory)
+
+
+def _untrack_request_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    factory = loop.get_task_factory()
+    if not getattr(factory, "tracks_profiles", False):
+        return
+    factory.active -= 1
+    if factory.active <= 0:
+        loop.set_task_factory(factory.previous)
+
+
+def start_profile(method: str, path: str) -> RequestProfile:
+    """只取樣目前的 task 與它之後建立的 task，不計入同時處理的其他請求"""
+    profile = RequestProfile(method, path)
+    _active_profile.set(profile)
+    _track_request_tasks(asyncio.get_running_loop())
+    profile.profiler.track(asyncio.current_task().get_coro())
+    profile.profiler.start()
+    return profile
+
+
+def finish_profile(profile: RequestProfile, status: int) -> dict:
+    # 請求期間建立、仍在執行的 task 也帶著這個 profile，結束後不再累計
+    profile.finished = True
+    profile.profiler.stop()
+    _untrack_request_tasks(asyncio.get_running_loop())
+    _active_profile.set(None)
+    result = profile.to_dict(status)
+    profile_store.add(result)
+    return result
+
+
+class ProfileStore:
+    """保留最近的 profile 供下載"""
+
+    def __init__(self, maxlen: int = PROFILE_BUFFER):
+        self.maxlen = maxlen
+        self.profiles: OrderedDict[str, dict] = OrderedDict()
+
+    def add(self, profile: dict) -> None:
+        self.profiles[profile["id"]] = profile
+        while len(self.profiles) > self.maxlen:
+            self.profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self.profiles.get(profile_id)
+
+    def list(self) -> list[dict]:
+        return [
+            {
+                key: value
+                for key, value in profile.items()
+                if key not in ("tree", "folded")
+            }
+            for profile in reversed(self.profiles.values())
+        ]
+
+    def clear(self) -> None:
+        self.profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+@event.listens_for(Engine, "after_cursor_execute", named=True)
+def _record_profile_query(conn, **_kw):
+    profile = _active_profile.get()
+    if profile is not None and not profile.finished:
+        profile.queries += 1
+        profile.db_time += conn.info.get("query_duration", 0.0)
@@ -0,0 +1,69 @@
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# 欄位名稱 -> (需要查詢的 SQL 欄位, 從 row 取值的函式)
+# 關聯欄位沒有 SQL 欄位，取值函式為 None，由呼叫端另外查詢
+FieldSpec = tuple[tuple, Optional[Callable[[Any], Any]]]
+
+
+def isoformat(value) -> Optional[str]:
+    return value.isoformat() + "Z" if value else None
+
+
+def parse_names(
+    raw: Optional[str], allowed: Iterable[str], param: str
+) -> Optional[tuple[str, ...]]:
+    """解析以逗號分隔的名稱列表，回傳排序去重後的 tuple；未指定時回傳 None"""
+    if raw is None:
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}",
+        )
+    return tuple(sorted(requested))
+
+
+class Projection:
+    """?fields= 可選的欄位，以及對應要查詢的 SQL 欄位"""
+
+    def __init__(self, key_column, fields: dict[str, FieldSpec]):
+        self.key_column = key_column
+        self.fields = fields
+
+    def parse(self, raw: Optional[str]) -> Optional[tuple[str, ...]]:
+        """解析 fields 參數，回傳排序後的欄位（作為快取 key）；未指定時回傳 None"""
+        return parse_names(raw, self.fields.keys(), "fields")
+
+    def columns(self, fields: Iterable[str]) -> list:
+        """查詢所需的 SQL 欄位，一定包含主鍵以判斷資料是否存在"""
+        columns = [self.key_column]
+        for name in fields:
+            for column in self.fields[name][0]:
+                if not any(column is existing for existing in columns):
+                    columns.append(column)
+        return columns
+
+    def build(self, row, fields: tuple[str, ...]) -> dict:
+        """依宣告順序輸出有 SQL 欄位的欄位，關聯欄位由呼叫端補上"""
+        return {
+            name: getter(row)
+            for name, (_, getter) in self.fields.items()
+            if getter is not None and name in fields
+        }
+
+
+def projection_cache_key(base: str, fields: Optional[tuple[str, ...]]) -> str:
+    # 投影的 key 以原本的 key 為前綴，失效時用同一個前綴即可一併清除
+    return base if not fields else f"{base}|fields={','.join(fields)}"
+
+
+def projected_response(content, fields: Optional[tuple[str, ...]]):
+    """有投影時直接回傳 JSON，略過 response_model 對缺少欄位的驗證"""
+    return JSONResponse(content) if fields else content
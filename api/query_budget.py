@@ -0,0 +1,60 @@
+import logging
+import os
+from typing import Callable, Optional
+
+from .metrics import RequestStats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_BUDGET = int(os.getenv("QUERY_BUDGET_DEFAULT", "20"))
+
+_listeners: list[Callable[[dict], None]] = []
+
+
+def query_budget(limit: int):
+    """宣告路由每次請求最多可執行的 SQL 數量"""
+
+    def decorator(func):
+        func.__query_budget__ = limit
+        return func
+
+    return decorator
+
+
+def route_query_budget(route) -> Optional[int]:
+    if route is None:
+        return None
+    return getattr(route.endpoint, "__query_budget__", DEFAULT_QUERY_BUDGET)
+
+
+def add_budget_listener(listener: Callable[[dict], None]) -> None:
+    _listeners.append(listener)
+
+
+def remove_budget_listener(listener: Callable[[dict], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def check_query_budget(method: str, route, stats: RequestStats) -> Optional[dict]:
+    budget = route_query_budget(route)
+    if budget is None or stats.queries <= budget:
+        return None
+
+    violation = {
+        "method": method,
+        "route": route.path,
+        "path": stats.path,
+        "queries": stats.queries,
+        "budget": budget,
+    }
+    logger.warning(
+        "%s %s executed %d queries (budget %d)",
+        method,
+        stats.path,
+        stats.queries,
+        budget,
+    )
+    for listener in list(_listeners):
+        listener(violation)
+    return violation
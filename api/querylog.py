@@ -0,0 +1,142 @@
+import asyncio
+import os
+import random
+from collections import deque
+from contextvars import Context
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .metrics import current_request_stats
+
+EXPLAIN_PREFIX = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "mysql": "EXPLAIN ",
+    "mariadb": "EXPLAIN ",
+    "postgresql": "EXPLAIN ",
+}
+
+
+class SlowQueryRecorder:
+    """記錄超過門檻的 SQL，並附上 EXPLAIN 結果
+
+    EXPLAIN 不在原本的連線上執行（那時還在請求的 transaction 中），
+    而是排入佇列，由背景 task 另外取得連線執行後填入紀錄。
+    以 explain_with 登記的寫入 engine 改用對應的唯讀 engine，
+    不佔用寫入的連線池，SQLite 上也不會以 BEGIN IMMEDIATE 取得寫入鎖
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        sample_rate: float = 0.1,
+        maxlen: int = 100,
+        explain: bool = True,
+    ):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain = explain
+        self.entries: deque[dict] = deque(maxlen=maxlen)
+        self.pending: deque[tuple] = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.explain_engines: dict[Engine, AsyncEngine] = {}
+
+    def explain_with(self, engine: AsyncEngine, read_engine: AsyncEngine) -> None:
+        """在 engine 上執行的查詢改以 read_engine 執行 EXPLAIN"""
+        self.explain_engines[engine.sync_engine] = read_engine
+
+    def should_record(self, duration_ms: float) -> bool:
+        if duration_ms < self.threshold_ms:
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(
+        self,
+        conn,
+        statement: str,
+        parameters,
+        duration_ms: float,
+        executemany: bool,
+    ) -> None:
+        stats = current_request_stats()
+        entry = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "durationMs": round(duration_ms, 3),
+            "statement": statement,
+            "parameters": repr(parameters)[:500],
+            "path": stats.path if stats else None,
+            "explain": None,
+        }
+        self.entries.append(entry)
+        if self.explain and not executemany:
+            self.queue_explain(entry, conn.engine, statement, parameters)
+
+    def queue_explain(self, entry: dict, engine: Engine, statement: str, parameters):
+        prefix = EXPLAIN_PREFIX.get(engine.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith("SELECT"):
+            return
+        if not engine.dialect.is_async:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.pending.append((entry, engine, prefix + statement, parameters))
+        if self.task is None or self.task.done():
+            # 不沿用請求的 context，EXPLAIN 不計入該請求的查詢數
+            self.task = loop.create_task(self.explain_pending(), context=Context())
+
+    async def explain_pending(self) -> None:
+        while self.pending:
+            entry, engine, statement, parameters = self.pending.popleft()
+            explain_engine = self.explain_engines.get(engine) or AsyncEngine(engine)
+            entry["explain"] = await capture_explain(
+                explain_engine, statement, parameters
+            )
+
+    async def wait(self) -> None:
+        """等待佇列中的 EXPLAIN 完成"""
+        if self.task is not None:
+            await self.task
+
+    def list(self) -> list[dict]:
+        return list(reversed(self.entries))
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.pending.clear()
+
+
+async def capture_explain(
+    engine: AsyncEngine, statement: str, parameters
+) -> Optional[list[str]]:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                statement, parameters, execution_options={"slow_query_log": False}
+            )
+            return [" | ".join(str(col) for col in row) for row in result]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+slow_query_recorder = SlowQueryRecorder(
+    threshold_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+    sample_rate=float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "0.1")),
+    maxlen=int(os.getenv("SLOW_QUERY_BUFFER", "100")),
+    explain=os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes"),
+)
+
+
+@event.listens_for(Engine, "after_cursor_execute", named=True)
+def _record_slow_query(conn, statement, parameters, executemany, **kw):
+    if not kw["context"].execution_options.get("slow_query_log", True):
+        return
+    duration_ms = conn.info.get("query_duration", 0.0) * 1000
+    if slow_query_recorder.should_record(duration_ms):
+        slow_query_recorder.record(
+            conn, statement, parameters, duration_ms, executemany
+        )
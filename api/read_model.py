@@ -0,0 +1,606 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Iterable, Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import file_lock
+from .database import current_data_version
+from .metrics import READ_MODEL_REBUILD
+from .snapshot_file import (
+    NONE,
+    MappedFile,
+    RawJSON,
+    SnapshotFileWriter,
+    dump_json,
+    join_json,
+    read_header,
+)
+
+logger = logging.getLogger(__name__)
+
+READ_MODEL_ENABLED = os.getenv("READ_MODEL", "").lower() in ("1", "true", "yes")
+# 其他 worker 的審核不會通知這個程序，超過此秒數後在背景比對資料版本，不同時重建
+READ_MODEL_MAX_AGE = float(os.getenv("READ_MODEL_MAX_AGE", "30"))
+# 寫入的請求最多等待重建多久才回應，讓之後的讀取看得到這次寫入；逾時則在背景繼續
+READ_MODEL_WRITE_WAIT = float(os.getenv("READ_MODEL_WRITE_WAIT", "5"))
+# 重建失敗後等待多久再重試
+READ_MODEL_RETRY_SECONDS = float(os.getenv("READ_MODEL_RETRY_SECONDS", "5"))
+# 審核後等待多久才重建，期間的其他審核合併為一次
+READ_MODEL_REBUILD_DELAY = float(os.getenv("READ_MODEL_REBUILD_DELAY", "0"))
+# 設定後快照寫入此檔案，所有 worker 以 mmap 共用
+READ_MODEL_PATH = os.getenv("READ_MODEL_PATH", "")
+# 每隔多久檢查一次檔案是否已被其他 worker 替換
+READ_MODEL_CHECK_SECONDS = float(os.getenv("READ_MODEL_CHECK_SECONDS", "1"))
+
+
+KINDS = ("kiger", "character", "maker")
+
+
+def project(item: dict, fields: Optional[tuple[str, ...]]) -> dict:
+    return item if not fields else {k: v for k, v in item.items() if k in fields}
+
+
+def decode_images(raw: Optional[str]) -> list:
+    # images 以原始 JSON 字串載入，組合詳情時才解析
+    return (json.loads(raw) or []) if raw else []
+
+
+def group(pairs: Iterable[tuple]) -> dict:
+    groups: dict = {}
+    for key, value in pairs:
+        groups.setdefault(key, []).append(value)
+    return groups
+
+
+class Snapshot:
+    """整份公開資料與索引；建立後不再修改，重建時整個替換
+
+    輸入為各列表端點的項目（已是回應格式），relations 為 kiger_characters 的資料列
+    （images 為未解析的 JSON 字串）
+    """
+
+    def __init__(
+        self,
+        kigers: list[dict],
+        characters: list[dict],
+        character_sources: dict[int, Optional[int]],
+        makers: list[dict],
+        sources: list[dict],
+        relations: list,
+        facets: dict,
+    ):
+        self.lists = {"kiger": kigers, "character": characters, "maker": makers}
+        self.items = {
+            kind: {item["id"]: item for item in items}
+            for kind, items in self.lists.items()
+        }
+        self.order = {
+            kind: {item["id"]: i for i, item in enumerate(items)}
+            for kind, items in self.lists.items()
+        }
+        self.sources = sources
+        self.source_items = {source["id"]: source for source in sources}
+        self.character_sources = character_sources
+        self.facets = facets
+        # 載入前讀取的 data_version，由 ReadModel 設定
+        self.data_version: Optional[int] = None
+
+        # 分次查詢之間可能有寫入，略過指向不存在資料的關聯
+        kiger_items, character_items = self.items["kiger"], self.items["character"]
+        relations = [
+            row
+            for row in relations
+            if row.kiger_id in kiger_items and row.character_id in character_items
+        ]
+        # character→kigers、maker→kigers 等關聯索引
+        self.relations = {
+            "kiger": group((row.kiger_id, row) for row in relations),
+            "character": group((row.character_id, row) for row in relations),
+            "maker": group(
+                (row.maker_id, row) for row in relations if row.maker_id is not None
+            ),
+        }
+        # 列表篩選用的索引：篩選參數名稱 -> 值 -> 項目
+        self.filters = {
+            "kiger": {
+                "isActive": group((item["isActive"], item) for item in kigers),
+                "position": group((item["position"], item) for item in kigers),
+            },
+            "character": {
+                "sourceId": group(
+                    (character_sources.get(item["id"]), item) for item in characters
+                ),
+                "type": group((item["type"], item) for item in characters),
+            },
+        }
+        # 詳情在建立時全部組合，之後不再修改快照
+        self.details = {
+            kind: {item["id"]: self.compose(kind, item) for item in items}
+            for kind, items in self.lists.items()
+        }
+
+    def maker_name(self, maker_id: Optional[int]) -> str:
+        maker = self.items["maker"].get(maker_id)
+        return maker["name"] if maker else ""
+
+    def character_ref(self, row) -> dict:
+        """CharacterReferenceResponse 格式"""
+        return {
+            "characterId": row.character_id,
+            "characterName": self.items["character"][row.character_id]["name"],
+            "makerId": row.maker_id,
+            "makerName": self.maker_name(row.maker_id),
+            "images": decode_images(row.images),
+        }
+
+    def kiger_data(self, rows) -> list[dict]:
+        """KigerCharacterDataResponse 格式"""
+        return [
+            {
+                "kigerid": row.kiger_id,
+                "kigername": self.items["kiger"][row.kiger_id]["name"],
+                "characterId": row.character_id,
+                "characterName": self.items["character"][row.character_id]["name"],
+                "makerId": (
+                    row.maker_id if row.maker_id in self.items["maker"] else None
+                ),
+                "makerName": self.maker_name(row.maker_id),
+                "images": decode_images(row.images),
+            }
+            for row in rows
+        ]
+
+    def page(
+        self,
+        kind: str,
+        start: Optional[int],
+        end: Optional[int],
+        fields: Optional[tuple[str, ...]],
+        **filters,
+    ) -> list[dict]:
+        """列表端點：先以索引篩選，再取範圍並投影"""
+        items = self.lists[kind]
+        for name, value in filters.items():
+            if value is None:
+                continue
+            matched = self.filters[kind][name].get(value, [])
+            if items is self.lists[kind]:
+                items = matched
+            else:
+                ids = {item["id"] for item in matched}
+                items = [item for item in items if item["id"] in ids]
+        return [project(item, fields) for item in items[start:end]]
+
+    def compose(self, kind: str, item: dict) -> dict:
+        rows = self.relations[kind].get(item["id"], [])
+        if kind == "kiger":
+            return {**item, "Characters": [self.character_ref(r) for r in rows]}
+        return {**item, "kigers": self.kiger_data(rows)}
+
+    def detail(self, kind: str, item_id) -> Optional[dict]:
+        return self.details[kind].get(item_id)
+
+    def detail_content(self, kind: str, item_id) -> Optional[dict]:
+        """未投影的詳情回應內容"""
+        return self.detail(kind, item_id)
+
+    def batch(self, kind: str, ids: list) -> dict:
+        details = {item_id: self.detail(kind, item_id) for item_id in ids}
+        return {
+            "data": [detail for detail in details.values() if detail is not None],
+            "missing": [
+                item_id for item_id, detail in details.items() if detail is None
+            ],
+        }
+
+    def included(self, kind: str, item_id, expansion: tuple[str, ...]) -> dict:
+        """與 load_included 相同：依關聯找出相關資料"""
+        rows = self.relations[kind].get(item_id, [])
+        character_ids = {row.character_id for row in rows}
+        if kind == "character" and item_id in self.items["character"]:
+            character_ids.add(item_id)
+
+        included = {}
+        if "kigers" in expansion:
+            included["kigers"] = self.in_order("kiger", {row.kiger_id for row in rows})
+        if "characters" in expansion:
+            included["characters"] = self.in_order("character", character_ids)
+        if "makers" in expansion:
+            included["makers"] = self.in_order("maker", {row.maker_id for row in rows})
+        if "sources" in expansion:
+            source_ids = {self.character_sources.get(i) for i in character_ids}
+            included["sources"] = [
+                self.source_items[source_id]
+                for source_id in sorted(source_ids & self.source_items.keys())
+            ]
+        return included
+
+    def in_order(self, kind: str, ids: set) -> list[dict]:
+        """依列表端點的順序輸出"""
+        order = self.order[kind]
+        found = sorted((i for i in ids if i in order), key=order.__getitem__)
+        return [self.items[kind][i] for i in found]
+
+
+def write_shared_snapshot(path: str, snapshot: Snapshot) -> "SharedSnapshot":
+    """把快照寫成單一檔案
+
+    列表項目與詳情各自編碼成 JSON；id、篩選與關聯索引寫成以列序號表示的整數陣列，
+    讀取時直接在 mmap 上查詢
+    """
+    rows = snapshot.order
+    source_rows = {source["id"]: i for i, source in enumerate(snapshot.sources)}
+    relations = [
+        row
+        for rows_of_kiger in snapshot.relations["kiger"].values()
+        for row in rows_of_kiger
+    ]
+    triples = [
+        (
+            rows["kiger"][row.kiger_id],
+            rows["character"][row.character_id],
+            rows["maker"].get(row.maker_id, NONE),
+        )
+        for row in relations
+    ]
+    writer = SnapshotFileWriter(path)
+    try:
+        index = {"kinds": {}, "sources": {}}
+        for kind, items in snapshot.lists.items():
+            records = []
+            for item in items:
+                records += writer.write(item)
+                records += writer.write(snapshot.detail(kind, item["id"]))
+            # 第 i 個關聯所屬的列
+            column = KINDS.index(kind)
+            related: list[list[int]] = [[] for _ in items]
+            for i, triple in enumerate(triples):
+                if triple[column] != NONE:
+                    related[triple[column]].append(i)
+            filters = {}
+            for name, groups in snapshot.filters.get(kind, {}).items():
+                filters[name] = {
+                    "keys": writer.write_keys([dump_json(value) for value in groups]),
+                    **writer.write_groups(
+                        [
+                            [rows[kind][item["id"]] for item in members]
+                            for members in groups.values()
+                        ]
+                    ),
+                }
+            index["kinds"][kind] = {
+                # 每列為 [列表項目位移, 長度, 詳情位移, 長度]
+                "records": writer.write_array(records),
+                "keys": writer.write_keys([dump_json(item["id"]) for item in items]),
+                "relations": writer.write_groups(related),
+                "filters": filters,
+            }
+        index["relations"] = writer.write_array(v for t in triples for v in t)
+        index["characterSources"] = writer.write_array(
+            source_rows.get(snapshot.character_sources.get(item["id"]), NONE)
+            for item in snapshot.lists["character"]
+        )
+        source_records = []
+        for source in snapshot.sources:
+            source_records += writer.write(source)
+        index["sources"] = {
+            "records": writer.write_array(source_records),
+            "all": writer.write(snapshot.sources),
+        }
+        index["facets"] = writer.write(snapshot.facets)
+        writer.commit(index, snapshot.data_version or 0)
+    except BaseException:
+        writer.abort()
+        raise
+    return SharedSnapshot(path)
+
+
+class SharedSnapshot:
+    """與 Snapshot 相同的查詢，但資料與索引都留在 mmap 的檔案中
+
+    程序內只保留各陣列的 memoryview，不隨資料量增加；未投影的回應直接輸出檔案中的 JSON
+    """
+
+    def __init__(self, path: str):
+        self.file = MappedFile(path)
+        self.header = self.file.header
+        self.data_version = self.header.data_version
+        index = self.file.index
+        kinds = index["kinds"]
+        self.records = {k: self.file.array(v["records"]) for k, v in kinds.items()}
+        self.keys = {k: self.file.keys(v["keys"]) for k, v in kinds.items()}
+        self.related = {k: self.file.groups(v["relations"]) for k, v in kinds.items()}
+        self.filters = {
+            kind: {
+                name: (self.file.keys(ref["keys"]), self.file.groups(ref))
+                for name, ref in value["filters"].items()
+            }
+            for kind, value in kinds.items()
+        }
+        self.relations = self.file.array(index["relations"])
+        self.character_sources = self.file.array(index["characterSources"])
+        self.source_records = self.file.array(index["sources"]["records"])
+        self.sources = RawJSON(self.file.raw(index["sources"]["all"]))
+        self.facets = RawJSON(self.file.raw(index["facets"]))
+
+    def row(self, kind: str, item_id) -> Optional[int]:
+        return self.keys[kind].find(dump_json(item_id))
+
+    def item_raw(self, kind: str, row: int) -> bytes:
+        return self.file.raw(self.records[kind][row * 4 : row * 4 + 2])
+
+    def detail_raw(self, kind: str, row: int) -> bytes:
+        return self.file.raw(self.records[kind][row * 4 + 2 : row * 4 + 4])
+
+    def page(
+        self,
+        kind: str,
+        start: Optional[int],
+        end: Optional[int],
+        fields: Optional[tuple[str, ...]],
+        **filters,
+    ):
+        """列表端點：以篩選索引取得列序號，再取範圍並投影"""
+        rows = range(len(self.records[kind]) // 4)
+        for name, value in filters.items():
+            if value is None:
+                continue
+            keys, groups = self.filters[kind][name]
+            position = keys.find(dump_json(value))
+            matched = groups[position] if position is not None else []
+            if isinstance(rows, range):
+                rows = matched
+            else:
+                matched = set(matched)
+                rows = [row for row in rows if row in matched]
+        rows = rows[start:end]
+        if not fields:
+            return join_json(self.item_raw(kind, row) for row in rows)
+        return [project(json.loads(self.item_raw(kind, row)), fields) for row in rows]
+
+    def detail_content(self, kind: str, item_id) -> Optional[RawJSON]:
+        row = self.row(kind, item_id)
+        return None if row is None else RawJSON(self.detail_raw(kind, row))
+
+    def detail(self, kind: str, item_id) -> Optional[dict]:
+        row = self.row(kind, item_id)
+        return None if row is None else json.loads(self.detail_raw(kind, row))
+
+    def batch(self, kind: str, ids: list) -> RawJSON:
+        rows = {item_id: self.row(kind, item_id) for item_id in ids}
+        data = join_json(
+            self.detail_raw(kind, row) for row in rows.values() if row is not None
+        )
+        missing = [item_id for item_id, row in rows.items() if row is None]
+        return RawJSON(dump_json({"data": data, "missing": missing}))
+
+    def included(self, kind: str, item_id, expansion: tuple[str, ...]) -> dict:
+        """與 Snapshot.included 相同；列序號即為列表端點的順序"""
+        row = self.row(kind, item_id)
+        triples = (
+            []
+            if row is None
+            else [self.relations[i * 3 : i * 3 + 3] for i in self.related[kind][row]]
+        )
+        character_rows = {triple[1] for triple in triples}
+        if kind == "character" and row is not None:
+            character_rows.add(row)
+
+        included = {}
+        if "kigers" in expansion:
+            included["kigers"] = self.in_order("kiger", {t[0] for t in triples})
+        if "characters" in expansion:
+            included["characters"] = self.in_order("character", character_rows)
+        if "makers" in expansion:
+            included["makers"] = self.in_order("maker", {t[2] for t in triples})
+        if "sources" in expansion:
+            source_rows = {self.character_sources[row] for row in character_rows}
+            included["sources"] = [
+                json.loads(self.file.raw(self.source_records[i * 2 : i * 2 + 2]))
+                for i in sorted(source_rows - {NONE})
+            ]
+        return included
+
+    def in_order(self, kind: str, rows: set) -> list[dict]:
+        return [json.loads(self.item_raw(kind, row)) for row in sorted(rows - {NONE})]
+
+
+def shared_snapshot_path() -> str:
+    """共用檔案需要 flock 協調各 worker 的重建；Windows 上改用程序內快照"""
+    if READ_MODEL_PATH and not file_lock.supported():
+        logger.warning("READ_MODEL_PATH is ignored: file locks are not supported")
+        return ""
+    return READ_MODEL_PATH
+
+
+def isolated(coroutine: Awaitable):
+    """另開 context 執行，重建的查詢不計入觸發重建的請求，另以 metric 記錄"""
+    return asyncio.create_task(coroutine, context=contextvars.Context())
+
+
+class ReadModel:
+    """公開讀取端點的程序內快照：第一次讀取時建立，審核或更新後在背景重建並整個替換
+
+    設定 path 時快照寫入共用檔案，其他 worker 發現 generation 改變後重新 map。
+    快照記錄載入時的 data_version，超過 READ_MODEL_MAX_AGE 後與資料庫比對，
+    不同時重建；共用檔案在第一次讀取時也會先比對，不沿用過期的檔案
+    """
+
+    # 是否依 READ_MODEL_PATH 寫入共用檔案
+    shared = True
+    rebuild_metric = READ_MODEL_REBUILD
+
+    def __init__(
+        self,
+        load: Callable[[AsyncSession], Awaitable[Snapshot]],
+        open_session: Callable,
+    ):
+        """open_session 為回傳 AsyncSession 的 async context manager，供背景重建使用"""
+        self.load = load
+        self.open_session = open_session
+        self.reset()
+
+    def reset(self) -> None:
+        self.enabled = READ_MODEL_ENABLED
+        self.snapshot: Optional[Union[Snapshot, SharedSnapshot]] = None
+        self.built_at = 0.0
+        self.max_age = READ_MODEL_MAX_AGE
+        self.delay = READ_MODEL_REBUILD_DELAY
+        self.retry_delay = READ_MODEL_RETRY_SECONDS
+        self.write_wait = READ_MODEL_WRITE_WAIT
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.requested = False
+        self.force = False
+        self.path = shared_snapshot_path() if self.shared else ""
+        self.check_interval = READ_MODEL_CHECK_SECONDS
+        self.checked_at = 0.0
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.built_at > self.max_age
+
+    def published(self) -> bool:
+        """是否已有快照；共用檔案時包含其他 worker 建立的檔案"""
+        return (
+            self.snapshot is not None or bool(self.path) and os.path.exists(self.path)
+        )
+
+    async def reload(self) -> None:
+        """其他 worker 替換了快照檔時重新 map，不查詢資料庫"""
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        header = read_header(self.path)
+        if header is None or getattr(self.snapshot, "header", None) == header:
+            return
+        try:
+            self.snapshot = await asyncio.to_thread(SharedSnapshot, self.path)
+        except (OSError, ValueError):
+            logger.exception("failed to map read model snapshot %s", self.path)
+
+    async def ensure_built(self) -> Union[Snapshot, SharedSnapshot]:
+        """只有還沒有快照時才在請求中查詢資料庫；之後的重建都在背景進行。
+
+        建立時使用 open_session（主資料庫），不使用請求的 session，以免從
+        尚未追上的副本建立快照
+        """
+        if self.path and self.snapshot is not None:
+            await self.reload()
+        if self.snapshot is None:
+            async with self.lock:
+                if self.snapshot is None:
+                    # 共用檔案可能是舊部署或匯入前留下的，版本相同時才沿用
+                    async with self.open_session() as db:
+                        await self.rebuild(db, force=False)
+        elif self.stale() and not self.rebuilding():
+            # 其他 worker 的寫入不會通知這個程序，重建檔案的 worker 也可能
+            # 在完成前被 max_requests 重啟
+            self.schedule_rebuild(force=False)
+        return self.snapshot
+
+    def rebuilding(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def rebuild(self, db: AsyncSession, force: bool = True) -> None:
+        """force=False 時，快照（共用檔案時為檔案標頭）的 data_version
+
+        與資料庫相同就沿用，不重新載入
+        """
+        started = time.monotonic()
+        if force or not await self.up_to_date(db):
+            if self.path:
+                # 同時只有一個 worker 重建檔案，依序重建的檔案不會被較舊的覆蓋；
+                # 取得鎖後再比對一次，等待期間其他 worker 可能已經重建
+                async with file_lock.async_file_lock(f"{self.path}.lock"):
+                    if force or not await self.up_to_date(db):
+                        await self.load_snapshot(db)
+            else:
+                await self.load_snapshot(db)
+        self.built_at = started
+
+    async def up_to_date(self, db: AsyncSession) -> bool:
+        version = await isolated(current_data_version(db))
+        if not self.path:
+            return self.snapshot is not None and self.snapshot.data_version == version
+        header = read_header(self.path)
+        if header is None or header.data_version != version:
+            return False
+        if getattr(self.snapshot, "header", None) != header:
+            try:
+                self.snapshot = await asyncio.to_thread(SharedSnapshot, self.path)
+            except (OSError, ValueError):
+                logger.exception("failed to map read model snapshot %s", self.path)
+                return False
+        return True
+
+    async def load_snapshot(self, db: AsyncSession) -> None:
+        started = time.monotonic()
+        snapshot = await isolated(self.load_versioned(db))
+        if self.path:
+            snapshot = await asyncio.to_thread(
+                write_shared_snapshot, self.path, snapshot
+            )
+        self.snapshot = snapshot
+        self.rebuild_metric.observe(time.monotonic() - started)
+
+    async def load_versioned(self, db: AsyncSession) -> Snapshot:
+        # 先讀取版本再載入：期間有寫入時記錄的是較舊的版本，下次比對時會再重建
+        version = await current_data_version(db)
+        snapshot = await self.load(db)
+        snapshot.data_version = version
+        return snapshot
+
+    def schedule_rebuild(self, force: bool = True) -> None:
+        """寫入 commit 後呼叫，在背景重建；完成前的讀取繼續使用舊快照"""
+        if not self.published():
+            # 尚未有人讀取過，等第一次讀取時再建立
+            return
+        self.requested = True
+        self.force = self.force or force
+        if not self.rebuilding():
+            self.task = asyncio.create_task(self.rebuild_later())
+
+    async def rebuild_after_write(self, db: Optional[AsyncSession] = None) -> None:
+        """寫入 commit 後呼叫：排程重建並等待完成，最多等待 write_wait 秒
+
+        回應送出時這個 worker 的快照（共用檔案時為檔案）已包含這次寫入。
+        傳入寫入的 session 時，commit 沒有改變公開資料就不重建也不等待
+        """
+        if db is not None and not db.info.pop("published_committed", False):
+            return
+        self.schedule_rebuild()
+        if not self.rebuilding() or self.write_wait <= 0:
+            return
+        try:
+            # shield：請求被取消或逾時時，背景重建仍繼續
+            await asyncio.wait_for(asyncio.shield(self.task), self.write_wait)
+        except TimeoutError:
+            logger.warning(
+                "read model rebuild still running after %s seconds", self.write_wait
+            )
+
+    async def rebuild_later(self) -> None:
+        # 重建期間又有新的寫入時再重建一次，失敗時等待 retry_delay 後重試
+        while self.requested:
+            await asyncio.sleep(self.delay)
+            self.requested = False
+            force, self.force = self.force, False
+            try:
+                async with self.lock:
+                    async with self.open_session() as db:
+                        await self.rebuild(db, force)
+            except Exception:
+                logger.exception("read model rebuild failed")
+                self.requested = True
+                self.force = self.force or force
+                await asyncio.sleep(self.retry_delay)
+
+    async def wait(self) -> None:
+        if self.task is not None:
+            await self.task
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -9,12 +9,24 @@ class MessageResponse(BaseModel):
     message: str
 
 
+class DuplicateResponse(BaseModel):
+    """可能重複的已發布或待審核角色"""
+
+    type: str
+    id: int
+    name: str
+    originalName: str
+    similarity: float
+    submitted: str
+
+
 class SubmitResponse(BaseModel):
     """提交資料的回應"""
 
     message: str
     status: str
     id: str
+    duplicates: List[DuplicateResponse] = []
 
 
 class KigerListItemResponse(BaseModel):
@@ -239,6 +251,44 @@ class MakerListResponse(BaseModel):
     total: int = 0
 
 
+class KigerBatchResponse(BaseModel):
+    """Kiger 批次查詢回應"""
+
+    data: List[KigerDetailResponse] = Field(default_factory=list)
+    missing: List[str] = Field(default_factory=list)
+
+
+class CharacterBatchResponse(BaseModel):
+    """Character 批次查詢回應"""
+
+    data: List[CharacterResponse] = Field(default_factory=list)
+    missing: List[int] = Field(default_factory=list)
+
+
+class MakerBatchResponse(BaseModel):
+    """Maker 批次查詢回應"""
+
+    data: List[MakerResponse] = Field(default_factory=list)
+    missing: List[int] = Field(default_factory=list)
+
+
+class BatchResponse(BaseModel):
+    """混合批次查詢回應"""
+
+    kigers: KigerBatchResponse = Field(default_factory=KigerBatchResponse)
+    characters: CharacterBatchResponse = Field(default_factory=CharacterBatchResponse)
+    makers: MakerBatchResponse = Field(default_factory=MakerBatchResponse)
+
+
+class SearchResultResponse(BaseModel):
+    """搜尋結果"""
+
+    type: str
+    id: Union[int, str]
+    name: str
+    originalName: Optional[str] = None
+
+
 class PendingKigerListResponse(BaseModel):
     """待審核 Kiger 列表回應"""
 
@@ -258,3 +308,61 @@ class PendingMakerListResponse(BaseModel):
 
     data: List[PendingMakerResponse] = Field(default_factory=list)
     total: int = 0
+
+
+class SlowQueryResponse(BaseModel):
+    """慢查詢紀錄回應"""
+
+    timestamp: str
+    durationMs: float
+    statement: str
+    parameters: str
+    path: Optional[str] = None
+    explain: Optional[List[str]] = None
+
+
+class ProfileDbResponse(BaseModel):
+    """Profile 中的 DB 統計"""
+
+    queries: int
+    waitMs: float
+
+
+class ProfileSummaryResponse(BaseModel):
+    """請求 profile 摘要"""
+
+    id: str
+    method: str
+    path: str
+    status: int
+    timestamp: str
+    durationMs: float
+    intervalMs: float
+    samples: int
+    breakdown: Dict[str, float]
+    db: ProfileDbResponse
+
+
+class AutocompleteResponse(BaseModel):
+    """自動完成建議"""
+
+    type: str
+    id: int
+    name: str
+    originalName: Optional[str] = None
+    kigerCount: int
+
+
+class FacetItemResponse(BaseModel):
+    """分類與其數量"""
+
+    id: int
+    name: str
+    count: int
+
+
+class FacetsResponse(BaseModel):
+    """各來源的角色數與各商家的 Kiger 數"""
+
+    characterSources: List[FacetItemResponse]
+    kigerMakers: List[FacetItemResponse]
@@ -0,0 +1,294 @@
+import os
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+from cachetools import LRUCache
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import Character, Kiger, Maker
+from .live_index import LiveIndex
+
+# 每個 worker 只收得到自己送出的變更，超過此秒數會從資料庫重建一次
+SEARCH_REBUILD_SECONDS = float(os.getenv("SEARCH_REBUILD_SECONDS", "300"))
+# 快取多少個查詢詞排序後的 postings
+SEARCH_RANKED_CACHE = int(os.getenv("SEARCH_RANKED_CACHE", "4096"))
+# 多個查詢詞的交集不超過此數量時直接排序，否則依最短的 postings 順序走訪
+SMALL_MATCH_SET = 1024
+
+KINDS = ("kiger", "character", "maker")
+KIND_ORDER = {kind: i for i, kind in enumerate(KINDS)}
+MODEL_KINDS = {Kiger: "kiger", Character: "character", Maker: "maker"}
+
+# 平假名、片假名、CJK 統一漢字（含擴充 A 與相容字）、韓文音節
+CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+CJK_RUN = re.compile(f"[{CJK}]+")
+WORD = re.compile(rf"[^\W_{CJK}]+")
+
+Key = tuple[str, Union[str, int]]
+
+
+def normalize(text: Optional[str]) -> str:
+    """全形/半形統一並忽略大小寫"""
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+def index_terms(text: str) -> tuple[set[str], set[str]]:
+    """索引用：CJK 取單字與雙字 n-gram，其他文字取單字"""
+    grams = set()
+    for run in CJK_RUN.findall(text):
+        grams.update(run)
+        grams.update(run[i : i + 2] for i in range(len(run) - 1))
+    return grams, set(WORD.findall(text))
+
+
+def query_terms(text: str) -> tuple[set[str], list[str]]:
+    """查詢用：CJK 只需雙字 n-gram（單一字時用單字），英文單字視為前綴"""
+    grams = set()
+    for run in CJK_RUN.findall(text):
+        if len(run) == 1:
+            grams.add(run)
+        else:
+            grams.update(run[i : i + 2] for i in range(len(run) - 1))
+    return grams, WORD.findall(text)
+
+
+@dataclass(frozen=True)
+class Entry:
+    kind: str
+    id: Union[str, int]
+    name: str
+    original_name: Optional[str]
+    normalized: tuple[str, ...]
+    grams: frozenset
+    words: frozenset
+
+    def to_dict(self) -> dict:
+        return {
+            "type": self.kind,
+            "id": self.id,
+            "name": self.name,
+            "originalName": self.original_name,
+        }
+
+
+def make_entry(kind: str, id, name: str, original_name: Optional[str] = None) -> Entry:
+    normalized = tuple(normalize(text) for text in (name, original_name) if text)
+    grams, words = set(), set()
+    for text in normalized:
+        text_grams, text_words = index_terms(text)
+        grams |= text_grams
+        words |= text_words
+    return Entry(
+        kind, id, name, original_name, normalized, frozenset(grams), frozenset(words)
+    )
+
+
+class InvertedIndex:
+    """n-gram 與單字的倒排索引；英文前綴以排序後的單字表二分搜尋
+
+    查詢時依「完全相同 > 開頭相同 > 包含 > 只有 n-gram/單字符合」排序，
+    同一級再依名稱長度、資料類型、id 排序。每個查詢詞的 postings 會依後者
+    預先排序並快取，查詢只需走訪最少的那個直到湊滿 limit 筆。
+    """
+
+    def __init__(self):
+        self.entries: dict[Key, Entry] = {}
+        self.order: dict[Key, tuple] = {}
+        self.exact: dict[str, set[Key]] = {}
+        self.grams: dict[str, set[Key]] = {}
+        self.words: dict[str, set[Key]] = {}
+        self.sorted_words: list[str] = []
+        # (詞類, 詞) -> (排序後的 key, key 集合)；postings 異動時清除
+        self.ranked = LRUCache(maxsize=SEARCH_RANKED_CACHE)
+
+    @classmethod
+    def build(cls, entries: Iterable[Entry]) -> "InvertedIndex":
+        index = cls()
+        for entry in entries:
+            index.insert(entry)
+        index.sorted_words = sorted(index.words)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry: Entry) -> None:
+        self.remove((entry.kind, entry.id))
+        for word in self.insert(entry):
+            insort(self.sorted_words, word)
+
+    def insert(self, entry: Entry) -> list[str]:
+        """寫入 postings，回傳新出現的單字"""
+        key = (entry.kind, entry.id)
+        self.entries[key] = entry
+        self.order[key] = (len(entry.name), KIND_ORDER[entry.kind], str(entry.id))
+        for text in entry.normalized:
+            self.exact.setdefault(text, set()).add(key)
+        for gram in entry.grams:
+            self.grams.setdefault(gram, set()).add(key)
+            self.ranked.pop(("gram", gram), None)
+        new_words = []
+        for word in entry.words:
+            if word not in self.words:
+                self.words[word] = set()
+                new_words.append(word)
+            self.words[word].add(key)
+            self.forget_prefixes(word)
+        return new_words
+
+    def remove(self, key: Key) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        del self.order[key]
+        for text in entry.normalized:
+            discard(self.exact, text, key)
+        for gram in entry.grams:
+            discard(self.grams, gram, key)
+            self.ranked.pop(("gram", gram), None)
+        for word in entry.words:
+            if discard(self.words, word, key):
+                del self.sorted_words[bisect_left(self.sorted_words, word)]
+            self.forget_prefixes(word)
+
+    def forget_prefixes(self, word: str) -> None:
+        for end in range(1, len(word) + 1):
+            self.ranked.pop(("prefix", word[:end]), None)
+
+    def postings(self, kind: str, term: str) -> Optional[tuple[list[Key], set[Key]]]:
+        cached = self.ranked.get((kind, term))
+        if cached is not None:
+            return cached
+        if kind == "gram":
+            keys = self.grams.get(term)
+        else:
+            start = bisect_left(self.sorted_words, term)
+            end = bisect_left(self.sorted_words, term + "\U0010ffff", start)
+            keys = set().union(*(self.words[w] for w in self.sorted_words[start:end]))
+        if not keys:
+            return None
+        cached = (sorted(keys, key=self.order.__getitem__), keys)
+        self.ranked[(kind, term)] = cached
+        return cached
+
+    def match(self, terms: list[tuple[str, str]]):
+        """回傳 (走訪順序, 符合所有查詢詞的 key 集合)；任一詞沒有結果時回傳 None"""
+        postings = []
+        for kind, term in terms:
+            found = self.postings(kind, term)
+            if found is None:
+                return None
+            postings.append(found)
+        postings.sort(key=lambda found: len(found[1]))
+        driver, candidates = postings[0]
+        if len(postings) > 1:
+            candidates = candidates.intersection(*(keys for _, keys in postings[1:]))
+            if len(candidates) <= SMALL_MATCH_SET:
+                driver = sorted(candidates, key=self.order.__getitem__)
+        return driver, candidates
+
+    def search(
+        self, query: str, kinds: Optional[set[str]] = None, limit: int = 20
+    ) -> list[Entry]:
+        normalized = normalize(query)
+        grams, words = query_terms(normalized)
+        terms = [("gram", gram) for gram in grams]
+        terms += [("prefix", word) for word in words]
+        if not terms:
+            return []
+
+        matched = self.match(terms)
+        if matched is None:
+            return []
+        driver, candidates = matched
+
+        exact = {
+            key
+            for key in self.exact.get(normalized, ())
+            if kinds is None or key[0] in kinds
+        }
+        results = sorted(exact, key=self.order.__getitem__)
+        starts, contains, matches = [], [], []
+        for key in driver:
+            skip = kinds is not None and key[0] not in kinds
+            if skip or key in exact or key not in candidates:
+                continue
+            texts = self.entries[key].normalized
+            if any(text.startswith(normalized) for text in texts):
+                starts.append(key)
+                # 之後的結果排序都不會超過已找到的這些
+                if len(results) + len(starts) >= limit:
+                    break
+            elif any(normalized in text for text in texts):
+                if len(contains) < limit:
+                    contains.append(key)
+            elif len(matches) < limit:
+                matches.append(key)
+
+        results += starts + contains + matches
+        return [self.entries[key] for key in results[:limit]]
+
+
+def discard(postings: dict[str, set[Key]], term: str, key: Key) -> bool:
+    """從 postings 移除 key，集合變空時刪除並回傳 True"""
+    keys = postings[term]
+    keys.discard(key)
+    if keys:
+        return False
+    del postings[term]
+    return True
+
+
+class SearchIndex(LiveIndex):
+    """程序內的搜尋索引：第一次查詢時從資料庫建立，之後依 commit 的變更更新"""
+
+    model_kinds = MODEL_KINDS
+
+    async def load(self, db: AsyncSession) -> InvertedIndex:
+        entries = []
+        for kind, query in (
+            ("kiger", select(Kiger.id, Kiger.name)),
+            (
+                "character",
+                select(Character.id, Character.name, Character.original_name),
+            ),
+            ("maker", select(Maker.id, Maker.name, Maker.original_name)),
+        ):
+            result = await db.execute(query)
+            entries.extend(make_entry(kind, *row) for row in result)
+        return InvertedIndex.build(entries)
+
+    def entry(self, key: Key, values: tuple) -> Entry:
+        return make_entry(*key, *values)
+
+    def values(self, _kind: str, obj) -> tuple:
+        return obj.name, getattr(obj, "original_name", None)
+
+    def search(self, query: str, kinds=None, limit: int = 20) -> list[dict]:
+        if self.index is None:
+            return []
+        return [entry.to_dict() for entry in self.index.search(query, kinds, limit)]
+
+
+search_index = SearchIndex("search_changes", SEARCH_REBUILD_SECONDS)
+
+
+def record_change(
+    session: Union[Session, AsyncSession],
+    kind: str,
+    id,
+    name: Optional[str] = None,
+    original_name: Optional[str] = None,
+) -> None:
+    """記錄待 commit 後更新索引的變更；name 為 None 表示刪除。
+
+    ORM 物件的新增、修改與刪除會自動記錄，只有 Core insert 需要呼叫此函式。
+    """
+    values = None if name is None else (name, original_name)
+    search_index.record(session, (kind, id), values)
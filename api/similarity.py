@@ -0,0 +1,219 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import Character, PendingCharacter
+from .live_index import LiveIndex
+from .search import normalize
+
+# 與 SEARCH_REBUILD_SECONDS 相同，超過此秒數從資料庫重建
+SIMILARITY_REBUILD_SECONDS = float(os.getenv("SIMILARITY_REBUILD_SECONDS", "300"))
+# 與 PostgreSQL pg_trgm 的 similarity_threshold 預設值相同
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.3"))
+DUPLICATE_LIMIT = 5
+
+KINDS = ("character", "pendingCharacter")
+KIND_ORDER = {kind: i for i, kind in enumerate(KINDS)}
+MODEL_KINDS = {Character: "character", PendingCharacter: "pendingCharacter"}
+
+WORD = re.compile(r"[^\W_]+")
+# 片假名轉平假名（ァ-ヶ）
+KATAKANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+Key = tuple[str, int]
+# 同一筆資料的名稱與原文名稱分開計算相似度
+Doc = tuple[Key, int]
+
+
+def fold(text: Optional[str]) -> str:
+    """全形/半形、大小寫與平/片假名統一"""
+    return normalize(text).translate(KATAKANA)
+
+
+def trigrams(text: Optional[str]) -> frozenset:
+    """與 pg_trgm 相同：每個單字前補兩個空白、後補一個空白再取三字"""
+    grams = set()
+    for word in WORD.findall(fold(text)):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    kind: str
+    id: int
+    name: str
+    original_name: str
+
+    def to_dict(self, similarity: float) -> dict:
+        return {
+            "type": self.kind,
+            "id": self.id,
+            "name": self.name,
+            "originalName": self.original_name,
+            "similarity": round(similarity, 3),
+        }
+
+
+class TrigramIndex:
+    """trigram 的倒排索引，相似度為 trigram 集合的 Jaccard 係數
+
+    依 prefix filter：trigram 依建立時的出現次數由少到多排序，Jaccard 達門檻 t
+    的兩個集合，各自最少見的 len - ceil(t * len) + 1 個 trigram 必有交集。
+    因此每筆資料只把這些 trigram 寫入 postings，查詢也只走訪這些，
+    最常見的單字開頭 trigram（如 "  k"）大多不需走訪。
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, frequency=None):
+        self.threshold = threshold
+        # 建立後不再變動，確保新增與查詢使用相同的排序
+        self.frequency: dict[str, int] = frequency or {}
+        self.candidates: dict[Key, Candidate] = {}
+        self.docs: dict[Doc, frozenset] = {}
+        self.postings: dict[str, set[Doc]] = {}
+
+    @classmethod
+    def build(
+        cls, candidates: Iterable[Candidate], threshold: float = SIMILARITY_THRESHOLD
+    ) -> "TrigramIndex":
+        candidates = list(candidates)
+        frequency = Counter()
+        for candidate in candidates:
+            frequency.update(trigrams(candidate.name))
+            frequency.update(trigrams(candidate.original_name))
+        index = cls(threshold, frequency)
+        for candidate in candidates:
+            index.add(candidate)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def prefix(self, grams: frozenset) -> list[str]:
+        required = max(1, math.ceil(self.threshold * len(grams)))
+        rarest = sorted(grams, key=lambda gram: (self.frequency.get(gram, 0), gram))
+        return rarest[: len(grams) - required + 1]
+
+    def add(self, candidate: Candidate) -> None:
+        key = (candidate.kind, candidate.id)
+        self.remove(key)
+        self.candidates[key] = candidate
+        for slot, text in enumerate((candidate.name, candidate.original_name)):
+            grams = trigrams(text)
+            if not grams:
+                continue
+            self.docs[(key, slot)] = grams
+            for gram in self.prefix(grams):
+                self.postings.setdefault(gram, set()).add((key, slot))
+
+    def remove(self, key: Key) -> None:
+        if self.candidates.pop(key, None) is None:
+            return
+        for slot in (0, 1):
+            grams = self.docs.pop((key, slot), None)
+            if grams is None:
+                continue
+            for gram in self.prefix(grams):
+                docs = self.postings[gram]
+                docs.discard((key, slot))
+                if not docs:
+                    del self.postings[gram]
+
+    def similar(self, texts: Iterable[str]) -> dict[Key, float]:
+        """回傳與任一查詢字串相似度達門檻的資料及其最高相似度"""
+        best: dict[Key, float] = {}
+        for grams in {trigrams(text) for text in texts}:
+            if not grams:
+                continue
+            postings = [self.postings.get(gram, ()) for gram in self.prefix(grams)]
+            # 長度相差太多時 Jaccard 不可能達到門檻
+            shortest = self.threshold * len(grams)
+            longest = len(grams) / self.threshold
+            for doc in set().union(*postings):
+                doc_grams = self.docs[doc]
+                if not shortest <= len(doc_grams) <= longest:
+                    continue
+                shared = len(grams & doc_grams)
+                similarity = shared / (len(grams) + len(doc_grams) - shared)
+                key = doc[0]
+                if similarity >= self.threshold and similarity > best.get(key, 0):
+                    best[key] = similarity
+        return best
+
+
+class SimilarityIndex(LiveIndex):
+    """已發布角色與待審核角色的相似度索引：第一次使用時建立，之後依 commit 的變更更新"""
+
+    model_kinds = MODEL_KINDS
+
+    async def load(self, db: AsyncSession) -> TrigramIndex:
+        candidates = []
+        for kind, model, condition in (
+            ("character", Character, true()),
+            (
+                "pendingCharacter",
+                PendingCharacter,
+                PendingCharacter.status == "pending",
+            ),
+        ):
+            result = await db.execute(
+                select(model.id, model.name, model.original_name).where(condition)
+            )
+            candidates.extend(Candidate(kind, *row) for row in result)
+        return TrigramIndex.build(candidates)
+
+    def entry(self, key: Key, values: tuple) -> Candidate:
+        return Candidate(*key, *values)
+
+    def values(self, kind: str, obj) -> Optional[tuple]:
+        # 審核完成的待審核角色不再列為重複候選
+        if kind == "pendingCharacter" and obj.status != "pending":
+            return None
+        return obj.name, obj.original_name
+
+    def duplicates(
+        self, original_name: str, name: Optional[str] = None, limit=DUPLICATE_LIMIT
+    ) -> list[dict]:
+        """可能重複的角色，依相似度排序；原文名稱完全相同的已發布角色視為修改而非重複"""
+        if self.index is None:
+            return []
+        texts = [text for text in (original_name, name) if text]
+        matches = [
+            (key, similarity)
+            for key, similarity in self.index.similar(texts).items()
+            if key[0] != "character"
+            or self.index.candidates[key].original_name != original_name
+        ]
+        matches.sort(
+            key=lambda match: (-match[1], KIND_ORDER[match[0][0]], match[0][1])
+        )
+        return [
+            self.index.candidates[key].to_dict(similarity)
+            for key, similarity in matches[:limit]
+        ]
+
+
+similarity_index = SimilarityIndex("similarity_changes", SIMILARITY_REBUILD_SECONDS)
+
+
+def record_candidate(
+    session: Union[Session, AsyncSession],
+    kind: str,
+    id: int,
+    name: Optional[str] = None,
+    original_name: Optional[str] = None,
+) -> None:
+    """記錄待 commit 後更新索引的變更；name 為 None 表示移除。
+
+    ORM 物件的新增、修改與刪除會自動記錄，只有 Core insert 需要呼叫此函式。
+    """
+    values = None if name is None else (name, original_name)
+    similarity_index.record(session, (kind, id), values)
@@ -0,0 +1,196 @@
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from dataclasses import astuple, dataclass
+from typing import Iterable, Optional
+
+MAGIC = b"KIGSNAP3"
+# magic、generation（寫入時間，奈秒）、建立時的資料版本、索引的位移與長度
+HEADER = struct.Struct("<8sQQQQ")
+# 陣列皆為 8 bytes 的有號整數，-1 表示不存在
+TYPECODE = "q"
+NONE = -1
+
+
+class RawJSON:
+    """已編碼的 JSON，回應時直接輸出不再解析"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def dump_json(value) -> bytes:
+    """與 JSONResponse 相同的編碼；dict 中的 RawJSON 直接嵌入"""
+    if isinstance(value, RawJSON):
+        return value.data
+    if isinstance(value, dict) and any(isinstance(v, RawJSON) for v in value.values()):
+        return (
+            b"{"
+            + b",".join(dump_json(k) + b":" + dump_json(v) for k, v in value.items())
+            + b"}"
+        )
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def join_json(parts: Iterable[bytes]) -> RawJSON:
+    return RawJSON(b"[" + b",".join(parts) + b"]")
+
+
+@dataclass(frozen=True)
+class Header:
+    generation: int
+    data_version: int
+    index_offset: int
+    index_length: int
+
+
+def read_header(path: str) -> Optional[Header]:
+    """讀取目前檔案的標頭；檔案不存在或格式不符時回傳 None"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, *fields = HEADER.unpack(data)
+    return Header(*fields) if magic == MAGIC else None
+
+
+class SnapshotFileWriter:
+    """先寫入暫存檔，commit 時補上標頭並以 os.replace 替換
+
+    讀取端不會看到寫到一半的檔案。索引以 JSON 保存，只記錄各陣列的位置，
+    大小與資料量無關
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.temp_path, "wb")
+        self.file.write(bytes(HEADER.size))
+
+    def write_bytes(self, data: bytes) -> list[int]:
+        """回傳 [位移, 長度]"""
+        offset = self.file.tell()
+        self.file.write(data)
+        return [offset, len(data)]
+
+    def write(self, value) -> list[int]:
+        """寫入一筆 JSON"""
+        return self.write_bytes(dump_json(value))
+
+    def write_array(self, values: Iterable[int]) -> list[int]:
+        """寫入整數陣列，回傳 [位移, 元素數]"""
+        self.file.write(bytes(-self.file.tell() % 8))
+        data = array(TYPECODE, values)
+        offset, _ = self.write_bytes(data.tobytes())
+        return [offset, len(data)]
+
+    def write_keys(self, keys: list[bytes]) -> dict:
+        """寫入可二分搜尋的 key 表，find 回傳 key 在 keys 中的位置"""
+        bounds = [0]
+        for key in keys:
+            bounds.append(bounds[-1] + len(key))
+        return {
+            "blob": self.write_bytes(b"".join(keys))[0],
+            "bounds": self.write_array(bounds),
+            "sorted": self.write_array(
+                sorted(range(len(keys)), key=keys.__getitem__)
+            ),
+        }
+
+    def write_groups(self, groups: list[list[int]]) -> dict:
+        """寫入分組的整數列表，第 i 組為 members[starts[i]:starts[i + 1]]"""
+        starts = [0]
+        for members in groups:
+            starts.append(starts[-1] + len(members))
+        return {
+            "starts": self.write_array(starts),
+            "members": self.write_array(m for members in groups for m in members),
+        }
+
+    def commit(self, index: dict, data_version: int) -> Header:
+        index_offset, index_length = self.write(index)
+        # 以寫入時間作為 generation，不需要跨程序讀取再遞增；讀取端只比較是否相同
+        header = Header(time.time_ns(), data_version, index_offset, index_length)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, *astuple(header)))
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+        return header
+
+    def abort(self) -> None:
+        self.file.close()
+        os.unlink(self.temp_path)
+
+
+class MappedFile:
+    """以唯讀 mmap 開啟快照檔，各 worker 共用同一份 page cache
+
+    陣列以 memoryview 直接讀取檔案內容，不複製到程序的記憶體中。
+    檔案被替換後，已開啟的 mapping 仍指向舊檔案，直到不再被參照
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *fields = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        self.header = Header(*fields)
+        self.view = memoryview(self.map)
+        self.index = self.load([self.header.index_offset, self.header.index_length])
+
+    def raw(self, ref) -> bytes:
+        offset, length = ref
+        return self.map[offset : offset + length]
+
+    def load(self, ref):
+        return json.loads(self.raw(ref))
+
+    def array(self, ref: list[int]) -> memoryview:
+        offset, count = ref
+        return self.view[offset : offset + count * 8].cast(TYPECODE)
+
+    def keys(self, ref: dict) -> "KeyIndex":
+        return KeyIndex(self, ref)
+
+    def groups(self, ref: dict) -> "Groups":
+        return Groups(self.array(ref["starts"]), self.array(ref["members"]))
+
+
+class KeyIndex:
+    def __init__(self, file: MappedFile, ref: dict):
+        self.map = file.map
+        self.blob = ref["blob"]
+        self.bounds = file.array(ref["bounds"])
+        self.sorted = file.array(ref["sorted"])
+
+    def key(self, position: int) -> bytes:
+        return self.map[
+            self.blob + self.bounds[position] : self.blob + self.bounds[position + 1]
+        ]
+
+    def find(self, key: bytes) -> Optional[int]:
+        i = bisect_left(self.sorted, key, key=self.key)
+        if i < len(self.sorted) and self.key(self.sorted[i]) == key:
+            return self.sorted[i]
+        return None
+
+
+class Groups:
+    def __init__(self, starts: memoryview, members: memoryview):
+        self.starts = starts
+        self.members = members
+
+    def __getitem__(self, i: int) -> memoryview:
+        return self.members[self.starts[i] : self.starts[i + 1]]
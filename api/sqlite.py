@@ -0,0 +1,53 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# 單機部署時以 SQLite 取代 MySQL：資料量小、以讀取為主
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def pragmas() -> list[str]:
+    return [
+        # 讀取不會被寫入擋住；WAL 下 NORMAL 只在 checkpoint 時 fsync，
+        # 斷電時最多遺失最後幾個 transaction，不會損毀資料庫
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        # 負數代表 KiB，每個連線各自一份
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    ]
+
+
+def configure_sqlite(engine: AsyncEngine, writer: bool) -> None:
+    """每個新連線套用 PRAGMA；寫入用的 engine 改以 BEGIN IMMEDIATE 開始 transaction"""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+        if writer:
+            # 由 SQLAlchemy 的 begin 事件發出 BEGIN，而不是 sqlite3 模組自己的 BEGIN
+            dbapi_connection.isolation_level = None
+
+    if not writer:
+        return
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin_immediate(conn):
+        # 一開始就取得寫入鎖。預設的 BEGIN 要到第一次寫入才升級，
+        # 此時遇到其他寫入者會直接失敗，不會依 busy_timeout 等待
+        conn.exec_driver_sql(
+            "BEGIN IMMEDIATE", execution_options={"transaction_control": True}
+        )
@@ -1,9 +1,138 @@
+import argparse
+import importlib.util
+import os
+import shutil
+import tempfile
+
 import uvicorn
 from dotenv import load_dotenv
 
 load_dotenv()
 
-if __name__ == "__main__":
+APP = "api.main:app"
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def production_options() -> dict:
+    """正式環境的啟動參數，皆可用環境變數覆寫"""
+    return {
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", "8000")),
+        "workers": int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "max_requests": int(os.getenv("MAX_REQUESTS", "10000")),
+        "max_requests_jitter": int(os.getenv("MAX_REQUESTS_JITTER", "1000")),
+        "keepalive": int(os.getenv("KEEPALIVE_TIMEOUT", "5")),
+        "backlog": int(os.getenv("BACKLOG", "2048")),
+        "log_level": os.getenv("LOG_LEVEL", "info"),
+    }
+
+
+def post_fork(_server, _worker) -> None:
+    """preload 時 master 已建立 engine，worker 各自重新建立連線"""
+    from api.database import dispose_inherited_pools
+
+    dispose_inherited_pools()
+
+
+def run_gunicorn(options: dict) -> None:
+    """使用 gunicorn 管理 worker，fork 前先載入 app"""
+    from gunicorn.app.base import BaseApplication
+    from uvicorn_worker import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": options["loop"], "http": options["http"]}
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{options['host']}:{options['port']}")
+            self.cfg.set("workers", options["workers"])
+            self.cfg.set("worker_class", Worker)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_fork", post_fork)
+            self.cfg.set("max_requests", options["max_requests"])
+            self.cfg.set("max_requests_jitter", options["max_requests_jitter"])
+            self.cfg.set("keepalive", options["keepalive"])
+            self.cfg.set("backlog", options["backlog"])
+            self.cfg.set("loglevel", options["log_level"])
+
+        def load(self):
+            from api.main import app
+
+            return app
+
+    Application().run()
+
+
+def run_uvicorn(options: dict) -> None:
+    """沒有 gunicorn 時改用 uvicorn 內建的多 worker 模式（無法 preload）"""
     uvicorn.run(
-        "api.main:app", host="127.0.0.1", port=8001, reload=True, log_level="info"
+        APP,
+        host=options["host"],
+        port=options["port"],
+        workers=options["workers"],
+        loop=options["loop"],
+        http=options["http"],
+        limit_max_requests=options["max_requests"] or None,
+        timeout_keep_alive=options["keepalive"],
+        backlog=options["backlog"],
+        log_level=options["log_level"],
+    )
+
+
+def choose_launcher():
+    """安裝了 poetry 的 server 群組（gunicorn、uvicorn-worker）時使用 gunicorn"""
+    if _installed("gunicorn") and _installed("uvicorn_worker"):
+        return run_gunicorn
+    return run_uvicorn
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Kigurumi Data API server")
+    parser.add_argument(
+        "--prod", action="store_true", help="以正式環境模式啟動（多 worker）"
     )
+    parser.add_argument("--host", help="覆寫 HOST")
+    parser.add_argument("--port", type=int, help="覆寫 PORT")
+    parser.add_argument("--workers", type=int, help="覆寫 WEB_CONCURRENCY")
+    args = parser.parse_args()
+
+    if not args.prod:
+        uvicorn.run(
+            APP,
+            host=args.host or "127.0.0.1",
+            port=args.port or 8001,
+            reload=True,
+            log_level="info",
+        )
+        return
+
+    options = production_options()
+    if args.host:
+        options["host"] = args.host
+    if args.port:
+        options["port"] = args.port
+    if args.workers:
+        options["workers"] = args.workers
+
+    if os.getenv("METRICS_DIR"):
+        choose_launcher()(options)
+        return
+    # 多個 worker 透過這個目錄合併 /metrics 的數值。gunicorn 的 worker 由 fork
+    # 產生，結束時同樣會離開這個函式，因此只由啟動的 master 刪除目錄
+    metrics_dir = tempfile.mkdtemp(prefix="kigurumi-metrics-")
+    os.environ["METRICS_DIR"] = metrics_dir
+    master_pid = os.getpid()
+    try:
+        choose_launcher()(options)
+    finally:
+        if os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
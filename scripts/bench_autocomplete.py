@@ -0,0 +1,86 @@
+"""自動完成索引的建立時間與查詢延遲
+
+用法：
+    python scripts/bench_autocomplete.py
+    python scripts/bench_autocomplete.py --entities 100000 --queries 2000
+
+以隨機產生的中日文名稱與英文原文名稱建立 api.autocomplete 的快照（不需資料庫），
+依前綴長度輸出 p50 / p99 / 最大延遲。
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.autocomplete import KINDS, Snapshot, Suggestion  # noqa: E402
+from scripts.bench_search import cjk_name, latin_name, percentile  # noqa: E402
+
+
+def make_suggestions(count: int, rng: random.Random) -> list[Suggestion]:
+    return [
+        Suggestion(
+            KINDS[i % len(KINDS)],
+            i,
+            cjk_name(rng),
+            latin_name(rng),
+            # 少數熱門角色，大多數只有零到數位 Kiger
+            int(rng.paretovariate(1.5)) - 1,
+        )
+        for i in range(count)
+    ]
+
+
+def query_sets(snapshot: Snapshot, count: int, rng: random.Random) -> dict:
+    sample = [rng.choice(snapshot.suggestions) for _ in range(count)]
+    return {
+        "cjk 1 char": [s.name[:1] for s in sample],
+        "cjk 2 chars": [s.name[:2] for s in sample],
+        "latin 1 char": [s.original_name[:1] for s in sample],
+        "latin 3 chars": [s.original_name[:3] for s in sample],
+        "latin full": [s.original_name for s in sample],
+        "no match": ["zzzz"] * count,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    suggestions = make_suggestions(args.entities, rng)
+    start = time.perf_counter()
+    snapshot = Snapshot(suggestions)
+    print(
+        f"built {len(snapshot):,} entities in {time.perf_counter() - start:.2f}s "
+        f"({len(snapshot.keys):,} keys)"
+    )
+
+    print(f"\n{'query':<14} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'hits':>8}")
+    for name, queries in query_sets(snapshot, args.queries, rng).items():
+        # 先各查一次，短前綴的結果會進入快取
+        for query in queries:
+            snapshot.complete(query, limit=args.limit)
+        timings = []
+        hits = 0
+        for query in queries:
+            begin = time.perf_counter()
+            hits += len(snapshot.complete(query, limit=args.limit))
+            timings.append((time.perf_counter() - begin) * 1e6)
+        timings.sort()
+        print(
+            f"{name:<14} {percentile(timings, 0.5):>10.1f} "
+            f"{percentile(timings, 0.99):>10.1f} {timings[-1]:>10.1f} "
+            f"{hits / len(queries):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
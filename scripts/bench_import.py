@@ -0,0 +1,77 @@
+"""量測 worker 載入 api.main 的匯入時間與記憶體
+
+用法：
+    python scripts/bench_import.py
+    python scripts/bench_import.py --runs 10
+
+每次以新的 python 程序（-X importtime）分別執行
+「只匯入 api.main」（crawler 延遲載入）與「匯入 api.main 後再匯入 crawler」
+（等同第一次呼叫 /crawl/* 後，或改為延遲載入之前的狀態），
+輸出 api.main、crawler 與兩者合計的累計匯入時間中位數，以及程序的最大 RSS。
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$")
+SCENARIOS = {
+    "lazy": "import api.main",
+    "eager": "import api.main; import crawler",
+}
+PRINT_RSS = (
+    "; import resource; "
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)"
+)
+
+
+def run_once(code: str) -> tuple[dict[str, int], int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; {code}{PRINT_RSS}"],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = result.stderr.strip().splitlines()
+    cumulative = {}
+    for line in lines[:-1]:
+        match = IMPORTTIME.match(line)
+        if match:
+            cumulative[match.group(2)] = int(match.group(1))
+    return cumulative, int(lines[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'scenario':<10} {'api.main ms':>12} {'crawler ms':>12} "
+        f"{'total ms':>10} {'max RSS MB':>12}"
+    )
+    for name, code in SCENARIOS.items():
+        api_main, crawler, rss = [], [], []
+        for _ in range(args.runs):
+            cumulative, max_rss = run_once(code)
+            api_main.append(cumulative["api.main"] / 1000)
+            crawler.append(cumulative.get("crawler", 0) / 1000)
+            # Linux 的 ru_maxrss 單位為 KB
+            rss.append(max_rss / 1024)
+        total = [a + c for a, c in zip(api_main, crawler, strict=True)]
+        print(
+            f"{name:<10} {statistics.median(api_main):>12.1f} "
+            f"{statistics.median(crawler):>12.1f} {statistics.median(total):>10.1f} "
+            f"{statistics.median(rss):>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
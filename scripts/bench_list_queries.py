@@ -0,0 +1,201 @@
+"""比較列表端點的 ORM 查詢與只選取欄位的 Core 查詢
+
+用法：
+    python scripts/bench_list_queries.py --kigers 10000
+    python scripts/bench_list_queries.py --database-url sqlite+aiosqlite:///bench.db
+
+在暫存 SQLite 資料庫（或 --database-url 指定且已有資料的資料庫）上，
+分別以舊的「載入完整 ORM 物件 → pydantic model → model_dump」流程
+與目前 api.main 使用的欄位查詢流程產生 `/kigers`、`/characters`、`/makers` 的快取內容，
+輸出每 10k 筆的耗時與 tracemalloc 量到的記憶體峰值。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def orm_paths():
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from api.database import Character, Kiger, Maker
+    from api.schemas import (
+        CharacterListItemResponse,
+        KigerListItemResponse,
+        MakerListItemResponse,
+        SourceResponse,
+    )
+
+    async def kigers(db):
+        result = await db.execute(select(Kiger))
+        return [
+            KigerListItemResponse(
+                id=kiger.id,
+                name=kiger.name,
+                bio=kiger.bio,
+                profileImage=kiger.profile_image,
+                position=kiger.position,
+                isActive=kiger.is_active,
+                socialMedia=kiger.social_media,
+                createdAt=(
+                    kiger.created_at.isoformat() + "Z" if kiger.created_at else None
+                ),
+                updatedAt=(
+                    kiger.updated_at.isoformat() + "Z" if kiger.updated_at else None
+                ),
+            ).model_dump()
+            for kiger in result.scalars().all()
+        ]
+
+    async def characters(db):
+        result = await db.execute(
+            select(Character).options(selectinload(Character.source))
+        )
+        return [
+            CharacterListItemResponse(
+                id=character.id,
+                name=character.name,
+                originalName=character.original_name,
+                type=character.type,
+                officialImage=character.official_image,
+                source=(
+                    SourceResponse(
+                        title=character.source.title,
+                        company=character.source.company,
+                        releaseYear=character.source.release_year,
+                    )
+                    if character.source
+                    else None
+                ),
+            ).model_dump()
+            for character in result.scalars().all()
+        ]
+
+    async def makers(db):
+        result = await db.execute(select(Maker))
+        return [
+            MakerListItemResponse(
+                id=maker.id,
+                name=maker.name,
+                originalName=maker.original_name,
+                Avatar=maker.avatar,
+                socialMedia=maker.social_media,
+            ).model_dump()
+            for maker in result.scalars().all()
+        ]
+
+    return {"kigers": kigers, "characters": characters, "makers": makers}
+
+
+def core_paths():
+    from api import main
+
+    async def kigers(db):
+        return main.kiger_list_items(await db.execute(main.KIGER_LIST_QUERY))
+
+    async def characters(db):
+        return main.character_list_items(await db.execute(main.CHARACTER_LIST_QUERY))
+
+    async def makers(db):
+        return main.maker_list_items(await db.execute(main.MAKER_LIST_QUERY))
+
+    return {"kigers": kigers, "characters": characters, "makers": makers}
+
+
+async def measure(session_maker, func, repeat: int) -> tuple[float, int, int]:
+    """回傳 (最快耗時秒數, 記憶體峰值 bytes, 筆數)"""
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        async with session_maker() as db:
+            start = time.perf_counter()
+            rows = len(await func(db))
+            best = min(best, time.perf_counter() - start)
+
+    async with session_maker() as db:
+        tracemalloc.start()
+        result = await func(db)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del result
+    return best, peak, rows
+
+
+async def run(args) -> None:
+    from api.database import async_session_maker, engine
+
+    orm, core = orm_paths(), core_paths()
+    print(
+        f"{'list':<12} {'path':<6} {'rows':>8} {'ms/10k':>10} {'MiB/10k':>10} "
+        f"{'speedup':>8} {'memory':>8}"
+    )
+    for name in orm:
+        orm_time, orm_peak, rows = await measure(
+            async_session_maker, orm[name], args.repeat
+        )
+        core_time, core_peak, _ = await measure(
+            async_session_maker, core[name], args.repeat
+        )
+        scale = 10_000 / rows if rows else 0.0
+        for label, elapsed, peak in (
+            ("orm", orm_time, orm_peak),
+            ("core", core_time, core_peak),
+        ):
+            print(
+                f"{name:<12} {label:<6} {rows:>8} {elapsed * 1000 * scale:>10.2f} "
+                f"{peak / 2**20 * scale:>10.2f}",
+                end="",
+            )
+            if label == "core":
+                print(
+                    f" {orm_time / core_time:>7.1f}x {core_peak / orm_peak:>7.0%}",
+                    end="",
+                )
+            print()
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="使用已有資料的資料庫")
+    parser.add_argument("--kigers", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = (
+            args.database_url or f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"
+        )
+        if not args.database_url:
+            import generate_dataset
+
+            dataset_args = generate_dataset.build_parser().parse_args(
+                [
+                    "--database-url",
+                    os.environ["DATABASE_URL"],
+                    "--kigers",
+                    str(args.kigers),
+                    "--characters",
+                    str(args.kigers),
+                    "--makers",
+                    str(args.kigers),
+                    "--pending",
+                    "0",
+                    "--relations",
+                    "1",
+                ]
+            )
+            asyncio.run(generate_dataset.generate(dataset_args))
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""搜尋索引的建立時間與查詢延遲
+
+用法：
+    python scripts/bench_search.py
+    python scripts/bench_search.py --entities 100000 --queries 2000
+
+以隨機產生的中日文名稱與英文原文名稱建立 api.search 的倒排索引（不需資料庫），
+依查詢類型輸出 p50 / p99 / 最大延遲。
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.search import KINDS, InvertedIndex, make_entry  # noqa: E402
+
+# 常見於角色名的漢字與假名
+CJK_CHARS = (
+    "初音未來鏡音凜連巡流歌愛麗絲小鳥遊六花櫻島麻衣雪之下雪乃明日香綾波零"
+    "皮卡丘喵喵伊布胖丁可達鴨妙蛙種子火恐龍傑尼龜阿尼亞福傑芙蓮費倫辛美爾"
+    "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよ"
+    "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨ"
+)
+SYLLABLES = ("ka", "ri", "na", "mi", "ku", "ru", "to", "sa", "yo", "ne", "chi", "ha")
+
+
+def cjk_name(rng: random.Random) -> str:
+    return "".join(rng.choices(CJK_CHARS, k=rng.randint(2, 6)))
+
+
+def latin_name(rng: random.Random) -> str:
+    words = [
+        "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        for _ in range(rng.randint(1, 3))
+    ]
+    return " ".join(word.capitalize() for word in words)
+
+
+def make_entries(count: int, rng: random.Random) -> list:
+    entries = []
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        original_name = None if kind == "kiger" else latin_name(rng)
+        entries.append(make_entry(kind, i, cjk_name(rng), original_name))
+    return entries
+
+
+def query_sets(index: InvertedIndex, count: int, rng: random.Random) -> dict:
+    entries = list(index.entries.values())
+    sample = [rng.choice(entries) for _ in range(count)]
+    with_original = [entry for entry in sample if entry.original_name]
+    return {
+        "cjk 1 char": [rng.choice(entry.name) for entry in sample],
+        "cjk 2 chars": [entry.name[:2] for entry in sample],
+        "cjk full": [entry.name for entry in sample],
+        "latin prefix": [entry.original_name[:3] for entry in with_original],
+        "latin full": [entry.original_name for entry in with_original],
+        "no match": ["zzzz"] * count,
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = make_entries(args.entities, rng)
+    start = time.perf_counter()
+    index = InvertedIndex.build(entries)
+    print(
+        f"built {len(index):,} entities in {time.perf_counter() - start:.2f}s "
+        f"({len(index.grams):,} n-grams, {len(index.words):,} words)"
+    )
+
+    print(f"\n{'query':<14} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'hits':>8}")
+    for name, queries in query_sets(index, args.queries, rng).items():
+        # 先各查一次，排除第一次排序 postings 的成本
+        for query in queries:
+            index.search(query, limit=args.limit)
+        timings = []
+        hits = 0
+        for query in queries:
+            begin = time.perf_counter()
+            hits += len(index.search(query, limit=args.limit))
+            timings.append((time.perf_counter() - begin) * 1e6)
+        timings.sort()
+        print(
+            f"{name:<14} {percentile(timings, 0.5):>10.1f} "
+            f"{percentile(timings, 0.99):>10.1f} {timings[-1]:>10.1f} "
+            f"{hits / len(queries):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""列表序列化與快取熱路徑的微基準測試
+
+用法：
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --rows 1000,10000 --filter kigers
+    python scripts/bench_serialization.py --save-baseline bench-results/serial.json
+    python scripts/bench_serialization.py --baseline bench-results/serial.json \\
+        --threshold 0.2
+
+測量 `/kigers`、`/characters`、`/makers` 每個階段：
+- rows：列表查詢的 row 直接轉成快取與回應使用的 dict（不經 ORM 物件與 pydantic model）
+- project：?fields= 投影時由 row 建立 dict 並以 JSONResponse 輸出
+- cache_set / cache_get：寫入與讀取 api.cache
+- revalidate：快取命中時 FastAPI 以 response_model 重新驗證
+- serialize：輸出 JSON
+以及 `invalidate_cache_by_prefix` 在大量 key 下的耗時。
+
+每項取多輪中最快的一輪計算單次耗時；指定 --baseline 時，
+任何一項比基準慢超過 --threshold（比例）即以非零狀態結束。
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import api.cache
+from api.cache import (
+    MeteredTTLCache,
+    get_cache,
+    invalidate_cache_by_prefix,
+    set_cache,
+)
+from api.main import (
+    CHARACTER_LIST_FIELDS,
+    CHARACTER_LIST_QUERY,
+    KIGER_LIST_FIELDS,
+    KIGER_LIST_QUERY,
+    MAKER_LIST_FIELDS,
+    MAKER_LIST_QUERY,
+    character_list_items,
+    kiger_list_items,
+    maker_list_items,
+)
+from api.schemas import (
+    CharacterListItemResponse,
+    KigerListItemResponse,
+    MakerListItemResponse,
+)
+
+BASE_TIME = datetime(2024, 1, 1)
+
+# 與列表查詢回傳的 row 欄位相同
+KigerRow = namedtuple("KigerRow", KIGER_LIST_QUERY.selected_columns.keys())
+CharacterRow = namedtuple("CharacterRow", CHARACTER_LIST_QUERY.selected_columns.keys())
+MakerRow = namedtuple("MakerRow", MAKER_LIST_QUERY.selected_columns.keys())
+
+
+def make_kigers(count: int, rng: random.Random) -> list[KigerRow]:
+    return [
+        KigerRow(
+            id=f"kiger-{i:07d}",
+            name=f"Kiger {i}",
+            bio="x" * rng.randrange(200),
+            profile_image=f"https://images.example.com/kigers/{i}.jpg",
+            position="Taipei",
+            is_active=True,
+            social_media={"twitter": f"https://x.com/kiger{i}"},
+            created_at=BASE_TIME,
+            updated_at=BASE_TIME,
+        )
+        for i in range(count)
+    ]
+
+
+def make_characters(count: int, rng: random.Random) -> list[CharacterRow]:
+    sources = [
+        (f"Source {i}", "Studio", 2000 + i % 25) for i in range(max(1, count // 25))
+    ]
+    return [
+        CharacterRow(
+            i,
+            f"Character {i}",
+            f"character-{i:06d}",
+            "game",
+            f"https://images.example.com/characters/{i}.png",
+            *(rng.choice(sources) if rng.random() < 0.95 else (None, None, None)),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_makers(count: int, rng: random.Random) -> list[MakerRow]:
+    return [
+        MakerRow(
+            id=i,
+            name=f"Maker {i}",
+            original_name=f"maker-{i:05d}",
+            avatar=f"https://images.example.com/makers/{i}.png",
+            social_media=(
+                {"twitter": f"https://x.com/maker{i}"} if rng.random() < 0.7 else None
+            ),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+LISTS = {
+    "kigers": (make_kigers, kiger_list_items, KigerListItemResponse),
+    "characters": (make_characters, character_list_items, CharacterListItemResponse),
+    "makers": (make_makers, maker_list_items, MakerListItemResponse),
+}
+
+# project 階段使用的投影與欄位
+PROJECTIONS = {
+    "kigers": (KIGER_LIST_FIELDS, ("id", "name", "profileImage")),
+    "characters": (CHARACTER_LIST_FIELDS, ("id", "name", "source")),
+    "makers": (MAKER_LIST_FIELDS, ("id", "name", "Avatar")),
+}
+
+
+Benchmark = tuple[Callable[[], object], Optional[Callable[[], object]]]
+
+
+def timed(func: Callable[[], object], setup, number: int) -> float:
+    if setup is None:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+    elapsed = 0.0
+    for _ in range(number):
+        setup()
+        start = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def measure(benchmark: Benchmark, repeat: int, min_time: float) -> float:
+    """自動決定每輪執行次數，回傳多輪中最快的單次耗時（秒），setup 不計時"""
+    func, setup = benchmark
+    number = 1
+    while (elapsed := timed(func, setup, number)) < min_time:
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, timed(func, setup, number) / number)
+    return best
+
+
+def list_benchmarks(name: str, rows: int) -> dict[str, Benchmark]:
+    make_rows, build, model = LISTS[name]
+    projection, fields = PROJECTIONS[name]
+    db_rows = make_rows(rows, random.Random(rows))
+    adapter = TypeAdapter(list[model])
+    dumped = build(db_rows)
+    cache_key = f"all_{name}"
+    set_cache(cache_key, dumped)
+    validated = adapter.validate_python(dumped)
+
+    return {
+        f"{name}.rows[{rows}]": (lambda: build(db_rows), None),
+        f"{name}.project[{rows}]": (
+            lambda: (
+                JSONResponse([projection.build(row, fields) for row in db_rows]).body
+            ),
+            None,
+        ),
+        f"{name}.cache_set[{rows}]": (lambda: set_cache(cache_key, dumped), None),
+        f"{name}.cache_get[{rows}]": (lambda: get_cache(cache_key), None),
+        f"{name}.revalidate[{rows}]": (lambda: adapter.validate_python(dumped), None),
+        f"{name}.serialize[{rows}]": (
+            lambda: json.dumps(adapter.dump_python(validated, mode="json")),
+            None,
+        ),
+    }
+
+
+def list_cases(rows: int) -> dict[str, Benchmark]:
+    benchmarks = {}
+    for name in LISTS:
+        benchmarks.update(list_benchmarks(name, rows))
+    return benchmarks
+
+
+def invalidation_benchmarks(keys: int) -> dict[str, Benchmark]:
+    """快取中有 keys 筆 kiger: 與 keys 筆 character:，失效其中一種前綴"""
+
+    def fill():
+        for i in range(keys):
+            set_cache(f"kiger:{i}", i)
+            set_cache(f"character:{i}", i)
+
+    fill()
+    return {
+        # 沒有符合的 key，只有掃描成本；需排在會清掉 key 的項目之前
+        f"cache.invalidate_prefix_miss[{keys}]": (
+            lambda: invalidate_cache_by_prefix("maker:"),
+            None,
+        ),
+        f"cache.invalidate_prefix[{keys}]": (
+            lambda: invalidate_cache_by_prefix("kiger:"),
+            fill,
+        ),
+    }
+
+
+def run_benchmarks(args) -> dict[str, float]:
+    original_cache = api.cache.cache
+    results: dict[str, float] = {}
+    try:
+        cases = [(rows, list_cases) for rows in args.rows]
+        cases += [(keys, invalidation_benchmarks) for keys in args.cache_keys]
+        for size, make_benchmarks in cases:
+            # 每組使用足夠大的新快取，避免量測到容量淘汰
+            api.cache.cache = MeteredTTLCache(maxsize=size * 4 + 100, ttl=86400)
+            for name, benchmark in make_benchmarks(size).items():
+                if args.filter and args.filter not in name:
+                    continue
+                results[name] = measure(benchmark, args.repeat, args.min_time)
+                print(f"{name:<48} {format_seconds(results[name]):>12}")
+    finally:
+        api.cache.cache = original_cache
+    return results
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], threshold: float):
+    regressions = []
+    print(f"\n{'benchmark':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        change = current / previous - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<48} {format_seconds(previous):>12} "
+            f"{format_seconds(current):>12} {change:>+7.1%}{flag}"
+        )
+    return regressions
+
+
+def int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int_list, default=[100, 1000, 10000])
+    parser.add_argument("--cache-keys", type=int_list, default=[1000, 10000, 50000])
+    parser.add_argument("--filter", help="只執行名稱包含此字串的項目")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="每輪最少秒數")
+    parser.add_argument("--baseline", type=Path, help="比較用的基準 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--save-baseline", type=Path, help="將結果存為基準 JSON")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(results, indent=2))
+        print(f"\n基準已儲存至 {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.threshold
+        )
+        if regressions:
+            print(f"\n{len(regressions)} 項超過 {args.threshold:.0%} 門檻")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""比較 Dockerfile 預設啟動方式與 `run.py --prod` 的吞吐量
+
+用法：
+    python scripts/bench_server.py --duration 10 --concurrency 64
+
+會在暫存目錄建立 SQLite 資料庫並填入測試資料，依序啟動兩種伺服器設定，
+以 scripts/loadtest.py 的 read 流量組合施壓後輸出每秒請求數與延遲。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from loadtest import Context, prepare_database, run_load, start_server, stop_server
+
+
+async def hammer(base_url: str, ctx: Context, duration: float, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        return await run_load(client, "read", ctx, duration, concurrency)
+
+
+def run_case(name: str, command: list[str], env: dict, ctx: Context, args) -> dict:
+    process, base_url = start_server(command, env)
+    try:
+        # 先暖機讓快取與連線池就緒
+        asyncio.run(hammer(base_url, ctx, 2, args.concurrency))
+        result = asyncio.run(hammer(base_url, ctx, args.duration, args.concurrency))
+    finally:
+        stop_server(process)
+    total = result["total"]
+    print(
+        f"{name:<10} {total['rps']:>10.1f} req/s  "
+        f"p50 {total['p50_ms']:>7.2f} ms  p99 {total['p99_ms']:>7.2f} ms  "
+        f"errors {total['errors']}"
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--kigers", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"
+        os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+        sizes = asyncio.run(prepare_database(env["DATABASE_URL"], args))
+        ctx = Context(
+            kigers=sizes["kigers"],
+            characters=sizes["characters"],
+            makers=sizes["makers"],
+        )
+
+        print(f"workers={args.workers} concurrency={args.concurrency}")
+        run_case(
+            "baseline",
+            [sys.executable, "-m", "uvicorn", "api.main:app", "--port", "{port}"],
+            env,
+            ctx,
+            args,
+        )
+        run_case(
+            "prod",
+            [
+                sys.executable,
+                "run.py",
+                "--prod",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                "{port}",
+                "--workers",
+                str(args.workers),
+            ],
+            env,
+            ctx,
+            args,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""重複角色偵測（trigram 相似度索引）的建立時間與查詢延遲
+
+用法：
+    python scripts/bench_similarity.py
+    python scripts/bench_similarity.py --characters 20000 --queries 2000
+
+以隨機產生的中日文名稱與英文原文名稱建立 api.similarity 的索引（不需資料庫），
+以提交時會做的查詢（原文名稱與名稱一起比對）輸出 p50 / p99 / 最大延遲。
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.similarity import Candidate, TrigramIndex  # noqa: E402
+from scripts.bench_search import cjk_name, percentile  # noqa: E402
+
+CONSONANTS = "bcdfghjklmnprstvwyz"
+VOWELS = "aeiou"
+
+
+def latin_name(rng: random.Random) -> str:
+    words = [
+        "".join(
+            rng.choice(CONSONANTS) + rng.choice(VOWELS)
+            for _ in range(rng.randint(2, 4))
+        )
+        for _ in range(rng.randint(1, 2))
+    ]
+    return " ".join(word.capitalize() for word in words)
+
+
+def query_sets(candidates: list, count: int, rng: random.Random) -> dict:
+    sample = [rng.choice(candidates) for _ in range(count)]
+    return {
+        "same": [(c.original_name, c.name) for c in sample],
+        "case/space": [(f" {c.original_name.upper()} ", "") for c in sample],
+        "typo": [(c.original_name[:-1] + "x", c.name[:-1]) for c in sample],
+        "new": [(latin_name(rng), cjk_name(rng)) for _ in sample],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--characters", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    candidates = [
+        Candidate("character", i, cjk_name(rng), latin_name(rng))
+        for i in range(args.characters)
+    ]
+    start = time.perf_counter()
+    index = TrigramIndex.build(candidates)
+    print(
+        f"built {len(index):,} characters in {time.perf_counter() - start:.2f}s "
+        f"({len(index.postings):,} trigrams)"
+    )
+
+    print(f"\n{'query':<12} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'hits':>8}")
+    for name, queries in query_sets(candidates, args.queries, rng).items():
+        timings = []
+        hits = 0
+        for texts in queries:
+            begin = time.perf_counter()
+            hits += len(index.similar(texts))
+            timings.append((time.perf_counter() - begin) * 1e6)
+        timings.sort()
+        print(
+            f"{name:<12} {percentile(timings, 0.5):>10.1f} "
+            f"{percentile(timings, 0.99):>10.1f} {timings[-1]:>10.1f} "
+            f"{hits / len(queries):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""比較 worker 啟動時每次執行 create_all 與先檢查結構版本的耗時
+
+用法：
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --starts 50 --database-url mysql+aiomysql://...
+
+在暫存 SQLite 資料庫（或 --database-url 指定的資料庫）上先建立一次資料表，
+再模擬多次 worker 冷啟動（每次建立新的 engine 與連線），分別量測
+「create_all + migration」與 api.migrations.ensure_schema
+（版本相同時只查詢一次）的耗時。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from api.database import Base  # noqa: E402
+from api.migrations import create_schema, ensure_schema  # noqa: E402
+from scripts.bench_search import percentile  # noqa: E402
+
+
+async def measure(database_url: str, starts: int, startup) -> list[float]:
+    timings = []
+    for _ in range(starts):
+        engine = create_async_engine(database_url)
+        begin = time.perf_counter()
+        await startup(engine, Base.metadata)
+        timings.append((time.perf_counter() - begin) * 1000)
+        await engine.dispose()
+    return sorted(timings)
+
+
+async def run(database_url: str, starts: int) -> None:
+    engine = create_async_engine(database_url)
+    await create_schema(engine, Base.metadata)
+    await engine.dispose()
+
+    print(f"{'startup':<16} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, startup in (
+        ("create_all", create_schema),
+        ("version check", ensure_schema),
+    ):
+        timings = await measure(database_url, starts, startup)
+        print(
+            f"{name:<16} {percentile(timings, 0.5):>10.2f} "
+            f"{percentile(timings, 0.99):>10.2f} {timings[-1]:>10.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--starts", type=int, default=20)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    if args.database_url:
+        asyncio.run(run(args.database_url, args.starts))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        asyncio.run(run(f"sqlite+aiosqlite:///{path}", args.starts))
+
+
+if __name__ == "__main__":
+    main()
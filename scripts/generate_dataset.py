@@ -0,0 +1,389 @@
+"""產生可重現的大量測試資料，用於不同資料量下的效能測試
+
+用法：
+    python scripts/generate_dataset.py --scale 100k --reset
+    python scripts/generate_dataset.py --kigers 5000 --seed 7 \\
+        --database-url sqlite+aiosqlite:///bench.db --reset
+
+資料分佈：
+- 角色與商家的熱門程度呈 Zipf 分佈，少數角色/商家擁有大量關聯
+- 每位 Kiger 平均約 10 個角色，`--scale 100k` 約產生 100 萬筆 kiger_characters
+- 每筆關聯的圖片數量呈長尾分佈，最多 `--max-images` 張
+- 另外產生一批待審核 Kiger，可用於測試 review_kiger
+
+相同的 seed 與參數一定產生相同的資料。
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.database import (
+    Base,
+    Character,
+    Kiger,
+    KigerCharacter,
+    Maker,
+    PendingKiger,
+    Source,
+    bump_data_version,
+)
+from api.facets import rebuild_facets
+
+SCALES = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+CHARACTER_TYPES = ["game", "anime", "vtuber", "original", "other"]
+COMPANIES = [f"Studio {i}" for i in range(40)]
+BASE_TIME = datetime(2024, 1, 1)
+
+
+class ZipfSampler:
+    """依 1/rank^s 權重抽樣，rank 以 seed 打亂避免熱門程度與 id 相關"""
+
+    def __init__(self, ids: list, exponent: float, rng: random.Random):
+        self.ids = ids[:]
+        rng.shuffle(self.ids)
+        self.cumulative = list(
+            itertools.accumulate(
+                1.0 / (rank**exponent) for rank in range(1, len(ids) + 1)
+            )
+        )
+        self.total = self.cumulative[-1]
+
+    def sample(self, rng: random.Random):
+        index = bisect.bisect_left(self.cumulative, rng.random() * self.total)
+        return self.ids[min(index, len(self.ids) - 1)]
+
+
+def timestamp(rng: random.Random) -> datetime:
+    return BASE_TIME + timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600))
+
+
+def image_urls(rng: random.Random, prefix: str, max_images: int) -> list[str]:
+    # 長尾分佈：大部分 1~5 張，少數接近上限
+    count = min(max_images, int(rng.paretovariate(1.2)) + rng.randrange(3))
+    return [
+        f"https://images.example.com/{prefix}/{index}-{rng.getrandbits(32):08x}.jpg"
+        for index in range(count)
+    ]
+
+
+def social_media(rng: random.Random, handle: str) -> dict:
+    links = {"twitter": f"https://x.com/{handle}"}
+    if rng.random() < 0.4:
+        links["instagram"] = f"https://instagram.com/{handle}"
+    if rng.random() < 0.2:
+        links["pixiv"] = f"https://pixiv.net/users/{rng.randrange(10**8)}"
+    return links
+
+
+def source_rows(count: int, rng: random.Random) -> Iterator[dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "title": f"Source {i:05d}",
+            "company": rng.choice(COMPANIES),
+            "release_year": rng.randrange(1990, 2026),
+            "created_at": timestamp(rng),
+            "updated_at": BASE_TIME,
+        }
+
+
+def character_rows(count: int, source_count: int, rng: random.Random) -> Iterator[dict]:
+    sources = ZipfSampler(list(range(1, source_count + 1)), 1.0, rng)
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "original_name": f"character-{i:06d}",
+            "name": f"Character {i}",
+            "type": rng.choice(CHARACTER_TYPES),
+            "official_image": f"https://images.example.com/characters/{i}.png",
+            "source_id": sources.sample(rng) if rng.random() < 0.95 else None,
+            "created_at": timestamp(rng),
+            "updated_at": BASE_TIME,
+        }
+
+
+def maker_rows(count: int, rng: random.Random) -> Iterator[dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "original_name": f"maker-{i:05d}",
+            "name": f"Maker {i}",
+            "avatar": f"https://images.example.com/makers/{i}.png",
+            "social_media": social_media(rng, f"maker{i}"),
+            "created_at": timestamp(rng),
+            "updated_at": BASE_TIME,
+        }
+
+
+def kiger_rows(count: int, rng: random.Random) -> Iterator[dict]:
+    for i in range(count):
+        created = timestamp(rng)
+        yield {
+            "id": f"kiger-{i:07d}",
+            "name": f"Kiger {i}",
+            "bio": f"Synthetic kiger #{i}",
+            "profile_image": f"https://images.example.com/kigers/{i}.jpg",
+            "position": rng.choice(["", "Taipei", "Tokyo", "Osaka", "Seoul"]),
+            "is_active": rng.random() < 0.85,
+            "social_media": social_media(rng, f"kiger{i}"),
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def character_refs(
+    rng: random.Random,
+    characters: ZipfSampler,
+    makers: ZipfSampler,
+    mean_relations: float,
+    max_images: int,
+    prefix: str,
+) -> list[dict]:
+    count = max(1, min(200, int(rng.expovariate(1.0 / mean_relations)) + 1))
+    refs = []
+    seen = set()
+    for _ in range(count):
+        character_id = characters.sample(rng)
+        if character_id in seen:
+            continue
+        seen.add(character_id)
+        refs.append(
+            {
+                "characterId": character_id,
+                "makerId": makers.sample(rng) if rng.random() < 0.9 else None,
+                "images": image_urls(rng, prefix, max_images),
+            }
+        )
+    return refs
+
+
+def relation_rows(
+    kiger_count: int,
+    characters: ZipfSampler,
+    makers: ZipfSampler,
+    args,
+    rng: random.Random,
+) -> Iterator[dict]:
+    for i in range(kiger_count):
+        kiger_id = f"kiger-{i:07d}"
+        for ref in character_refs(
+            rng, characters, makers, args.relations, args.max_images, kiger_id
+        ):
+            yield {
+                "kiger_id": kiger_id,
+                "character_id": ref["characterId"],
+                "maker_id": ref["makerId"],
+                "images": ref["images"],
+            }
+
+
+def pending_rows(
+    count: int,
+    characters: ZipfSampler,
+    makers: ZipfSampler,
+    args,
+    rng: random.Random,
+) -> Iterator[dict]:
+    for i in range(count):
+        pending_id = f"pending-{i:06d}"
+        yield {
+            "id": pending_id,
+            "reference_id": None,
+            "name": f"Pending Kiger {i}",
+            "bio": "",
+            "profile_image": "",
+            "position": "",
+            "is_active": True,
+            "social_media": social_media(rng, f"pending{i}"),
+            "characters": character_refs(
+                rng, characters, makers, args.relations, args.max_images, pending_id
+            ),
+            "auto_created_characters": [],
+            "changed_fields": None,
+            "status": "pending",
+            "submitted_at": timestamp(rng),
+        }
+
+
+def batched(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+async def load(conn, table, rows: Iterator[dict], batch_size: int) -> int:
+    total = 0
+    start = time.perf_counter()
+    for batch in batched(rows, batch_size):
+        await conn.execute(insert(table), batch)
+        total += len(batch)
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    print(
+        f"  {table.name:<18} {total:>10,} rows  {elapsed:>7.1f}s  {rate:>10,.0f} rows/s"
+    )
+    return total
+
+
+def dataset_sizes(args) -> dict[str, int]:
+    kigers = args.kigers or SCALES[args.scale]
+    characters = args.characters or max(200, kigers // 5)
+    return {
+        "kigers": kigers,
+        "characters": characters,
+        "makers": args.makers or max(20, kigers // 200),
+        "sources": args.sources or max(10, characters // 25),
+        "pending": args.pending if args.pending is not None else kigers // 100,
+    }
+
+
+async def generate(args) -> dict[str, int]:
+    sizes = dataset_sizes(args)
+    kiger_count = sizes["kigers"]
+    character_count = sizes["characters"]
+    maker_count = sizes["makers"]
+    source_count = sizes["sources"]
+    pending_count = sizes["pending"]
+
+    engine = create_async_engine(args.database_url)
+    async with engine.begin() as conn:
+        if args.reset:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        existing = (
+            await conn.execute(select(func.count()).select_from(Kiger))
+        ).scalar()
+        if existing:
+            await engine.dispose()
+            sys.exit("資料庫已有資料，請加上 --reset 重新產生")
+
+    print(
+        f"seed={args.seed} kigers={kiger_count:,} characters={character_count:,} "
+        f"makers={maker_count:,} sources={source_count:,} pending={pending_count:,}"
+    )
+    # 每張表使用各自的亂數序列，調整其中一張的數量不會影響其他表的內容
+    rngs = {
+        name: random.Random(f"{args.seed}:{name}")
+        for name in (
+            "sources",
+            "characters",
+            "makers",
+            "kigers",
+            "relations",
+            "pending",
+        )
+    }
+    characters = ZipfSampler(
+        list(range(1, character_count + 1)), args.character_skew, rngs["relations"]
+    )
+    makers = ZipfSampler(
+        list(range(1, maker_count + 1)), args.maker_skew, rngs["relations"]
+    )
+
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            # 僅在匯入期間關閉同步寫入
+            await conn.execute(text("PRAGMA synchronous=OFF"))
+        elif conn.dialect.name in ("mysql", "mariadb"):
+            await conn.execute(text("SET unique_checks=0"))
+            await conn.execute(text("SET foreign_key_checks=0"))
+
+        await load(
+            conn,
+            Source.__table__,
+            source_rows(source_count, rngs["sources"]),
+            args.batch_size,
+        )
+        await load(
+            conn,
+            Character.__table__,
+            character_rows(character_count, source_count, rngs["characters"]),
+            args.batch_size,
+        )
+        await load(
+            conn,
+            Maker.__table__,
+            maker_rows(maker_count, rngs["makers"]),
+            args.batch_size,
+        )
+        await load(
+            conn,
+            Kiger.__table__,
+            kiger_rows(kiger_count, rngs["kigers"]),
+            args.batch_size,
+        )
+        await load(
+            conn,
+            KigerCharacter.__table__,
+            relation_rows(kiger_count, characters, makers, args, rngs["relations"]),
+            args.batch_size,
+        )
+        await load(
+            conn,
+            PendingKiger.__table__,
+            pending_rows(pending_count, characters, makers, args, rngs["pending"]),
+            args.batch_size,
+        )
+        # 直接寫入資料表不會更新分類計數與資料版本，匯入後整個重算並遞增版本
+        await rebuild_facets(conn)
+        await conn.execute(bump_data_version())
+
+        if conn.dialect.name in ("mysql", "mariadb"):
+            await conn.execute(text("SET unique_checks=1"))
+            await conn.execute(text("SET foreign_key_checks=1"))
+    print(f"完成，共耗時 {time.perf_counter() - start:.1f}s")
+    await engine.dispose()
+    return sizes
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("DATABASE_URL", "sqlite+aiosqlite:///dataset.db"),
+    )
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--kigers", type=int, help="覆寫 --scale 的 Kiger 數量")
+    parser.add_argument("--characters", type=int)
+    parser.add_argument("--makers", type=int)
+    parser.add_argument("--sources", type=int)
+    parser.add_argument("--pending", type=int, help="待審核 Kiger 數量")
+    parser.add_argument(
+        "--relations", type=float, default=10.0, help="每位 Kiger 平均角色數"
+    )
+    parser.add_argument("--max-images", type=int, default=50)
+    parser.add_argument("--character-skew", type=float, default=1.1)
+    parser.add_argument("--maker-skew", type=float, default=1.3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="先刪除所有資料表")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
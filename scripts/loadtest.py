@@ -0,0 +1,501 @@
+"""對公開與管理 API 進行端對端壓力測試
+
+用法：
+    python scripts/loadtest.py --mix read --duration 20 --concurrency 32
+    python scripts/loadtest.py --mix mixed --target server --kigers 20000
+    python scripts/loadtest.py --mix review --url http://127.0.0.1:8000 \\
+        --admin-username admin --admin-password admin123
+
+預設會在暫存目錄以 scripts/generate_dataset.py 建立 SQLite 資料庫，
+`--target inproc` 直接透過 ASGI 呼叫 api.main:app，
+`--target server` 則啟動本機 uvicorn；
+`--url` 可改為測試已在執行中的伺服器（需自行準備資料）。
+
+流量組合（--mix）：
+- read：公開讀取為主（Kiger/角色/商家詳細頁與分頁列表）
+- submit：讀取中夾雜大量投稿
+- review：管理員同時審核待審核 Kiger
+- mixed：以上三者混合
+
+結果依路由輸出 req/s 與 p50/p95/p99，並存成 JSON 方便跨版本比較。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+ADMIN_USERNAME = "loadtest"
+ADMIN_PASSWORD = "loadtest-password"
+# 等待伺服器啟動的秒數
+SERVER_START_TIMEOUT = 30.0
+
+
+@dataclass
+class Context:
+    """壓測期間共用的資料範圍與管理員憑證"""
+
+    kigers: int
+    characters: int
+    makers: int
+    pending: list[str] = field(default_factory=list)
+    admin_headers: dict = field(default_factory=dict)
+    submitted: int = 0
+
+
+# 每個操作回傳 (路由名稱, method, path, json body, 是否需要管理員)
+Operation = Callable[[random.Random, Context], Optional[tuple]]
+
+
+def kiger_detail(rng: random.Random, ctx: Context):
+    kiger_id = f"kiger-{rng.randrange(ctx.kigers):07d}"
+    return "GET /kiger/{kiger_id}", "GET", f"/kiger/{kiger_id}", None, False
+
+
+def kiger_page(rng: random.Random, ctx: Context):
+    start = rng.randrange(0, max(1, ctx.kigers - 50))
+    return "GET /kigers", "GET", f"/kigers?start={start}&end={start + 50}", None, False
+
+
+def character_detail(rng: random.Random, ctx: Context):
+    character_id = rng.randint(1, ctx.characters)
+    return (
+        "GET /character/{character_id}",
+        "GET",
+        f"/character/{character_id}",
+        None,
+        False,
+    )
+
+
+def character_page(rng: random.Random, ctx: Context):
+    start = rng.randrange(0, max(1, ctx.characters - 50))
+    return (
+        "GET /characters",
+        "GET",
+        f"/characters?start={start}&end={start + 50}",
+        None,
+        False,
+    )
+
+
+def maker_detail(rng: random.Random, ctx: Context):
+    maker_id = rng.randint(1, ctx.makers)
+    return "GET /maker/{maker_id}", "GET", f"/maker/{maker_id}", None, False
+
+
+def submit_kiger(rng: random.Random, ctx: Context):
+    ctx.submitted += 1
+    characters = [
+        {
+            "characterId": rng.randint(1, ctx.characters),
+            "makerId": rng.randint(1, ctx.makers),
+            "images": [f"https://images.example.com/submit/{ctx.submitted}.jpg"],
+        }
+        for _ in range(rng.randint(1, 5))
+    ]
+    body = {
+        "name": f"Loadtest Kiger {ctx.submitted}",
+        "bio": "",
+        "profileImage": "",
+        "isActive": True,
+        "socialMedia": {"twitter": f"https://x.com/loadtest{ctx.submitted}"},
+        "Characters": characters,
+    }
+    return "POST /kiger", "POST", "/kiger", body, False
+
+
+def submit_character(rng: random.Random, ctx: Context):
+    ctx.submitted += 1
+    body = {
+        "name": f"Loadtest Character {ctx.submitted}",
+        "originalName": f"loadtest-character-{ctx.submitted}-{rng.getrandbits(32):08x}",
+        "type": "game",
+        "officialImage": "",
+        "source": {
+            "title": f"Loadtest Source {rng.randrange(20)}",
+            "company": "Loadtest",
+            "releaseYear": 2024,
+        },
+    }
+    return "POST /character", "POST", "/character", body, False
+
+
+def review_kiger(rng: random.Random, ctx: Context):
+    if not ctx.pending:
+        return pending_kigers(rng, ctx)
+    pending_id = ctx.pending.pop()
+    return (
+        "POST /admin/review/kiger/{kiger_id}",
+        "POST",
+        f"/admin/review/kiger/{pending_id}",
+        {"action": "approve" if rng.random() < 0.8 else "reject"},
+        True,
+    )
+
+
+def pending_kigers(_rng: random.Random, _ctx: Context):
+    return "GET /admin/pending/kigers", "GET", "/admin/pending/kigers", None, True
+
+
+MIXES: dict[str, list[tuple[float, Operation]]] = {
+    "read": [
+        (55, kiger_detail),
+        (10, kiger_page),
+        (20, character_detail),
+        (5, character_page),
+        (10, maker_detail),
+    ],
+    "submit": [
+        (40, kiger_detail),
+        (10, character_detail),
+        (35, submit_kiger),
+        (15, submit_character),
+    ],
+    "review": [
+        (60, review_kiger),
+        (15, pending_kigers),
+        (25, kiger_detail),
+    ],
+    "mixed": [
+        (45, kiger_detail),
+        (8, kiger_page),
+        (15, character_detail),
+        (7, maker_detail),
+        (10, submit_kiger),
+        (5, submit_character),
+        (8, review_kiger),
+        (2, pending_kigers),
+    ],
+}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, duration: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / duration, 2) if duration else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    mix: str,
+    ctx: Context,
+    duration: float,
+    concurrency: int,
+    seed: int = 0,
+) -> dict:
+    """以固定併發量持續送出請求，回傳整體與各路由的統計"""
+    weights = [weight for weight, _ in MIXES[mix]]
+    operations = [operation for _, operation in MIXES[mix]]
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    deadline = time.monotonic() + duration
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(f"{seed}:{worker_id}")
+        while time.monotonic() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            route, method, path, body, admin = operation(rng, ctx)
+            headers = ctx.admin_headers if admin else None
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    method, path, json=body, headers=headers
+                )
+                failed = response.status_code >= 400
+            except httpx.TransportError:
+                failed = True
+            latencies.setdefault(route, []).append(time.perf_counter() - start)
+            if failed:
+                errors[route] = errors.get(route, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "routes": {
+            route: summarize(values, errors.get(route, 0), elapsed)
+            for route, values in sorted(latencies.items())
+        },
+    }
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post(
+        "/admin/login", json={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def pending_ids(client: httpx.AsyncClient, headers: dict) -> list[str]:
+    response = await client.get("/admin/pending/kigers", headers=headers)
+    response.raise_for_status()
+    return [item["id"] for item in response.json()]
+
+
+async def prepare_database(database_url: str, args) -> dict[str, int]:
+    """以 generate_dataset 建立資料，並加入壓測用的管理員帳號"""
+    import generate_dataset
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from api.auth import get_password_hash
+    from api.database import Admin
+
+    dataset_args = generate_dataset.build_parser().parse_args(
+        [
+            "--database-url",
+            database_url,
+            "--kigers",
+            str(args.kigers),
+            "--seed",
+            str(args.seed),
+            "--reset",
+        ]
+    )
+    sizes = await generate_dataset.generate(dataset_args)
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.execute(
+            Admin.__table__.insert(),
+            {
+                "username": ADMIN_USERNAME,
+                "hashed_password": get_password_hash(ADMIN_PASSWORD),
+            },
+        )
+    await engine.dispose()
+    return sizes
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str) -> None:
+    try:
+        async with (
+            asyncio.timeout(SERVER_START_TIMEOUT),
+            httpx.AsyncClient(base_url=base_url) as client,
+        ):
+            while True:
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+    except TimeoutError:
+        raise RuntimeError(f"server at {base_url} did not start") from None
+
+
+def start_server(command: list[str], env: dict) -> tuple[subprocess.Popen, str]:
+    """以 {port} 佔位符啟動伺服器並等待就緒，回傳 process 與 base URL"""
+    port = free_port()
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_ready(base_url))
+    except Exception:
+        process.terminate()
+        raise
+    return process, base_url
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    process.wait(timeout=30)
+
+
+async def run_against(base_url: Optional[str], ctx: Context, args) -> dict:
+    if base_url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+    else:
+        from api.main import app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://loadtest",
+            timeout=60,
+        )
+
+    async with client:
+        if args.mix in ("review", "mixed"):
+            ctx.admin_headers = await login(
+                client, args.admin_username, args.admin_password
+            )
+            ctx.pending = await pending_ids(client, ctx.admin_headers)
+        if args.warmup:
+            await run_load(client, "read", ctx, args.warmup, args.concurrency, -1)
+        return await run_load(
+            client, args.mix, ctx, args.duration, args.concurrency, args.seed
+        )
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict) -> None:
+    header = (
+        f"{'route':<38} {'req':>7} {'err':>5} {'req/s':>9} "
+        f"{'p50':>9} {'p95':>9} {'p99':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    rows = list(result["routes"].items()) + [("TOTAL", result["total"])]
+    for route, stats in rows:
+        print(
+            f"{route:<38} {stats['requests']:>7} {stats['errors']:>5} "
+            f"{stats['rps']:>9.1f} {stats['p50_ms']:>7.2f}ms "
+            f"{stats['p95_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", choices=MIXES, default="read")
+    parser.add_argument("--target", choices=("inproc", "server"), default="inproc")
+    parser.add_argument("--url", help="改為測試已在執行中的伺服器")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--kigers", type=int, default=5000, help="產生的資料量")
+    parser.add_argument("--characters", type=int, help="--url 模式下的角色 id 上限")
+    parser.add_argument("--makers", type=int, help="--url 模式下的商家 id 上限")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--admin-username", default=ADMIN_USERNAME)
+    parser.add_argument("--admin-password", default=ADMIN_PASSWORD)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="結果 JSON 路徑，預設為 bench-results/loadtest-<mix>-<時間>.json",
+    )
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # api.database 在 import 時就建立 engine，必須先設定 DATABASE_URL
+        if not args.url:
+            os.environ["DATABASE_URL"] = (
+                f"sqlite+aiosqlite:///{Path(tmp) / 'loadtest.db'}"
+            )
+        import generate_dataset
+
+        if args.url:
+            sizes = generate_dataset.dataset_sizes(
+                generate_dataset.build_parser().parse_args(
+                    ["--kigers", str(args.kigers)]
+                )
+            )
+            sizes["characters"] = args.characters or sizes["characters"]
+            sizes["makers"] = args.makers or sizes["makers"]
+            base_url = args.url
+            process = None
+        else:
+            sizes = asyncio.run(prepare_database(os.environ["DATABASE_URL"], args))
+            base_url = process = None
+            if args.target == "server":
+                command = [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "api.main:app",
+                    "--port",
+                    "{port}",
+                ]
+                process, base_url = start_server(command, dict(os.environ))
+
+        ctx = Context(
+            kigers=sizes["kigers"],
+            characters=sizes["characters"],
+            makers=sizes["makers"],
+        )
+        try:
+            result = asyncio.run(run_against(base_url, ctx, args))
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    print_report(result)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mix": args.mix,
+        "target": "url" if args.url else args.target,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "dataset": sizes,
+        **result,
+    }
+    output = args.output or (
+        ROOT
+        / "bench-results"
+        / f"loadtest-{args.mix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\n結果已儲存至 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
+from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock, patch
 
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from api.auth import get_password_hash
+from api.autocomplete import autocomplete_index
 from api.cache import clear_cache
-from api.database import Admin, Base, get_db
-from api.main import app
+from api.database import Admin, Base, get_db, get_primary_read_db, get_read_db
+from api.main import app, read_model
+from api.query_budget import add_budget_listener, remove_budget_listener
+from api.search import search_index
+from api.similarity import similarity_index
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 TEST_ADMIN_USERNAME = "testadmin"
@@ -46,16 +52,32 @@ async def db_session():
 @pytest_asyncio.fixture()
 async def client(db_session):
     clear_cache()
+    search_index.reset()
+    similarity_index.reset()
+    autocomplete_index.reset()
+    read_model.reset()
 
     async def override_get_db():
         yield db_session
 
+    @asynccontextmanager
+    async def open_test_session():
+        yield db_session
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_primary_read_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     # Disable rate limiter in tests
     app.state.limiter.enabled = False
 
-    with patch("api.main.init_db", new_callable=AsyncMock):
+    # 依賴注入之外（middleware、背景重建）使用的 session 也改為測試資料庫
+    with (
+        patch("api.main.init_db", new_callable=AsyncMock),
+        patch("api.main.read_session_maker", open_test_session),
+        patch.object(read_model, "open_session", open_test_session),
+        patch.object(autocomplete_index, "open_session", open_test_session),
+    ):
         async with AsyncClient(
             transport=ASGITransport(app=app),
             base_url="http://testserver",
@@ -69,6 +91,10 @@ async def client(db_session):
 @pytest_asyncio.fixture()
 async def admin_client(db_session):
     clear_cache()
+    search_index.reset()
+    similarity_index.reset()
+    autocomplete_index.reset()
+    read_model.reset()
 
     admin = Admin(
         username=TEST_ADMIN_USERNAME,
@@ -80,12 +106,24 @@ async def admin_client(db_session):
     async def override_get_db():
         yield db_session
 
+    @asynccontextmanager
+    async def open_test_session():
+        yield db_session
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_primary_read_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     # Disable rate limiter in tests
     app.state.limiter.enabled = False
 
-    with patch("api.main.init_db", new_callable=AsyncMock):
+    # 依賴注入之外（middleware、背景重建）使用的 session 也改為測試資料庫
+    with (
+        patch("api.main.init_db", new_callable=AsyncMock),
+        patch("api.main.read_session_maker", open_test_session),
+        patch.object(read_model, "open_session", open_test_session),
+        patch.object(autocomplete_index, "open_session", open_test_session),
+    ):
         async with AsyncClient(
             transport=ASGITransport(app=app),
             base_url="http://testserver",
@@ -104,3 +142,21 @@ async def admin_client(db_session):
 
     app.state.limiter.enabled = True
     app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def enforce_query_budget():
+    """請求的 SQL 數量超過路由宣告的 query_budget 時讓測試失敗"""
+    violations = []
+    add_budget_listener(violations.append)
+    yield violations
+    remove_budget_listener(violations.append)
+    if violations:
+        pytest.fail(
+            "query budget exceeded: "
+            + "; ".join(
+                f"{v['method']} {v['path']} ran {v['queries']} queries "
+                f"(budget {v['budget']})"
+                for v in violations
+            )
+        )
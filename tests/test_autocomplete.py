@@ -0,0 +1,150 @@
+from datetime import datetime
+
+import pytest
+
+from api.autocomplete import Snapshot, Suggestion, autocomplete_index
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import KigerCharacter, PendingMaker
+from api.database import Maker as DBMaker
+
+
+async def seed(db_session):
+    characters = [
+        DBCharacter(original_name="Hatsune Miku", name="初音未來", type="vtuber"),
+        DBCharacter(original_name="Hatsune Mikuo", name="初音未來男", type="vtuber"),
+        DBCharacter(original_name="Kagamine Rin", name="鏡音鈴", type="vtuber"),
+    ]
+    maker = DBMaker(original_name="Hatsu Studio", name="初工作室")
+    kigers = [DBKiger(id=f"ac-kiger-{i}", name=f"AC Kiger {i}") for i in range(3)]
+    db_session.add_all([*characters, maker, *kigers])
+    await db_session.flush()
+    # Mikuo 有兩位 Kiger、Miku 一位
+    db_session.add_all(
+        [
+            KigerCharacter(kiger_id=kigers[0].id, character_id=characters[1].id),
+            KigerCharacter(kiger_id=kigers[1].id, character_id=characters[1].id),
+            KigerCharacter(
+                kiger_id=kigers[2].id, character_id=characters[0].id, maker_id=maker.id
+            ),
+        ]
+    )
+    await db_session.commit()
+    return characters, maker
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_autocomplete_orders_by_kiger_count(client, db_session):
+    characters, maker = await seed(db_session)
+
+    response = await client.get("/autocomplete", params={"q": "hats"})
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["originalName"] for r in results] == [
+        "Hatsune Mikuo",
+        "Hatsune Miku",
+        "Hatsu Studio",
+    ]
+    assert results[0] == {
+        "type": "character",
+        "id": characters[1].id,
+        "name": "初音未來男",
+        "originalName": "Hatsune Mikuo",
+        "kigerCount": 2,
+    }
+    assert results[2]["kigerCount"] == 1
+
+
+async def test_autocomplete_matches_name_and_word_start(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/autocomplete", params={"q": "初音"})
+    assert [r["name"] for r in response.json()] == ["初音未來男", "初音未來"]
+
+    # 第二個單字開頭也能查到，但單字中間不行
+    response = await client.get("/autocomplete", params={"q": "RIN"})
+    assert [r["name"] for r in response.json()] == ["鏡音鈴"]
+    response = await client.get("/autocomplete", params={"q": "amine"})
+    assert response.json() == []
+
+
+async def test_autocomplete_limit_and_type(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/autocomplete", params={"q": "h", "limit": 1})
+    assert [r["originalName"] for r in response.json()] == ["Hatsune Mikuo"]
+
+    response = await client.get("/autocomplete", params={"q": "h", "type": "maker"})
+    assert [r["type"] for r in response.json()] == ["maker"]
+
+    response = await client.get("/autocomplete", params={"q": "h", "type": "kiger"})
+    assert response.status_code == 400
+    response = await client.get("/autocomplete", params={"q": "h", "limit": 100})
+    assert response.status_code == 422
+
+
+async def test_autocomplete_rebuilds_after_approval(admin_client, db_session):
+    await seed(db_session)
+    await admin_client.get("/autocomplete", params={"q": "h"})
+    autocomplete_index.delay = 0
+    before = autocomplete_index.snapshot
+
+    pending = PendingMaker(
+        original_name="Hatsune Works",
+        name="初音工房",
+        status="pending",
+        submitted_at=datetime.utcnow(),
+    )
+    db_session.add(pending)
+    await db_session.commit()
+    response = await admin_client.post(
+        f"/admin/review/maker/{pending.id}", json={"action": "approve"}
+    )
+    assert response.status_code == 200
+
+    # 重建完成前仍使用原本的快照
+    assert autocomplete_index.snapshot is before
+    await autocomplete_index.wait()
+    assert autocomplete_index.snapshot is not before
+
+    response = await admin_client.get("/autocomplete", params={"q": "hatsune w"})
+    assert [r["name"] for r in response.json()] == ["初音工房"]
+
+
+async def test_autocomplete_rebuilds_after_other_worker_writes(client, db_session):
+    await seed(db_session)
+    await client.get("/autocomplete", params={"q": "h"})
+    before = autocomplete_index.snapshot
+    autocomplete_index.max_age = 0
+    autocomplete_index.delay = 0
+
+    # 資料版本沒有改變時沿用原本的索引
+    await client.get("/autocomplete", params={"q": "h"})
+    await autocomplete_index.wait()
+    assert autocomplete_index.snapshot is before
+
+    # 其他 worker 的修改不會呼叫 schedule_rebuild，但會遞增資料版本
+    db_session.add(DBMaker(original_name="Hatsune Works", name="初音工房"))
+    await db_session.commit()
+    response = await client.get("/autocomplete", params={"q": "hatsune w"})
+    assert response.json() == []
+    await autocomplete_index.wait()
+    response = await client.get("/autocomplete", params={"q": "hatsune w"})
+    assert [r["name"] for r in response.json()] == ["初音工房"]
+
+
+def test_snapshot_caches_large_ranges():
+    snapshot = Snapshot(
+        [
+            Suggestion("character", i, f"角色{i}", f"Character {i}", i % 7)
+            for i in range(1000)
+        ]
+    )
+    results = snapshot.complete("char", limit=5)
+    assert [s.kiger_count for s in results] == [6] * 5
+    assert [s.id for s in results] == [6, 13, 20, 27, 34]
+    assert ("char", None) in snapshot.top
+    # 依使用人數排序，人數相同時名稱較短的在前
+    results = snapshot.complete("角色99", limit=20)
+    assert [s.id for s in results][:5] == [993, 992, 999, 991, 998]
+    assert [s.id for s in results][-3:] == [99, 995, 994]
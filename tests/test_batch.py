@@ -0,0 +1,137 @@
+import pytest
+from sqlalchemy import event
+
+import api.cache
+import api.main
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import KigerCharacter
+from api.database import Maker as DBMaker
+
+
+async def seed(db_session):
+    maker = DBMaker(original_name="BatchMaker", name="Batch Maker")
+    kigers = [DBKiger(id=f"batch-kiger-{i}", name=f"Batch Kiger {i}") for i in range(3)]
+    characters = [
+        DBCharacter(original_name=f"BatchChar{i}", name=f"Batch Char {i}", type="game")
+        for i in range(3)
+    ]
+    db_session.add_all([maker, *kigers, *characters])
+    await db_session.flush()
+    db_session.add_all(
+        KigerCharacter(kiger_id=kiger.id, character_id=character.id, maker_id=maker.id)
+        for kiger, character in zip(kigers, characters, strict=True)
+    )
+    await db_session.commit()
+    return kigers, characters, maker
+
+
+def capture_statements(db_session) -> list[str]:
+    statements = []
+
+    def before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(
+        db_session.bind.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    return statements
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_kigers_batch_keeps_order_and_reports_missing(client, db_session):
+    await seed(db_session)
+
+    response = await client.get(
+        "/kigers/batch?ids=batch-kiger-2,missing,batch-kiger-0,batch-kiger-2"
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [k["id"] for k in data["data"]] == ["batch-kiger-2", "batch-kiger-0"]
+    assert data["data"][0]["Characters"][0]["characterName"] == "Batch Char 2"
+    assert data["missing"] == ["missing"]
+
+
+async def test_batch_matches_detail_endpoint(client, db_session):
+    kigers, characters, maker = await seed(db_session)
+
+    batch = await client.get(f"/characters/batch?ids={characters[1].id}")
+    detail = await client.get(f"/character/{characters[1].id}")
+    assert batch.json()["data"] == [detail.json()]
+
+    batch = await client.get(f"/makers/batch?ids={maker.id}")
+    detail = await client.get(f"/maker/{maker.id}")
+    assert batch.json()["data"] == [detail.json()]
+
+
+async def test_batch_uses_per_id_cache(client, db_session):
+    kigers, _, _ = await seed(db_session)
+    await client.get("/kiger/batch-kiger-0")
+    statements = capture_statements(db_session)
+
+    response = await client.get(
+        "/kigers/batch?ids=batch-kiger-0,batch-kiger-1,batch-kiger-2"
+    )
+    assert len(response.json()["data"]) == 3
+    # 只查詢未命中的兩筆：Kiger 一次 IN 查詢，關聯與其 selectinload
+    assert "batch-kiger-0" not in str(statements)
+    assert len(statements) == 4
+    assert "kiger:batch-kiger-1" in api.cache.cache
+    assert "kiger:batch-kiger-2" in api.cache.cache
+
+    statements.clear()
+    await client.get("/kigers/batch?ids=batch-kiger-2,batch-kiger-1")
+    assert statements == []
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_post_batch_mixed_types(client, db_session):
+    kigers, characters, maker = await seed(db_session)
+
+    response = await client.post(
+        "/batch",
+        json={
+            "kigers": ["batch-kiger-1"],
+            "characters": [characters[0].id, 9999],
+            "makers": [maker.id],
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [k["id"] for k in data["kigers"]["data"]] == ["batch-kiger-1"]
+    assert [c["id"] for c in data["characters"]["data"]] == [characters[0].id]
+    assert data["characters"]["missing"] == [9999]
+    assert data["makers"]["data"][0]["name"] == "Batch Maker"
+
+
+async def test_post_batch_same_response_from_snapshot(client, db_session):
+    kigers, characters, maker = await seed(db_session)
+    requests = [
+        {},
+        {"kigers": ["batch-kiger-1", "missing-kiger"]},
+        {"characters": [characters[0].id], "makers": [maker.id, 9999]},
+        {
+            "kigers": [kiger.id for kiger in kigers],
+            "characters": [c.id for c in characters],
+            "makers": [maker.id],
+        },
+    ]
+    for body in requests:
+        api.cache.cache.clear()
+        api.main.read_model.enabled = False
+        from_db = await client.post("/batch", json=body)
+        api.main.read_model.enabled = True
+        from_snapshot = await client.post("/batch", json=body)
+        assert from_db.status_code == from_snapshot.status_code == 200
+        assert from_db.json() == from_snapshot.json(), body
+        assert set(from_db.json()) == {"kigers", "characters", "makers"}
+    assert api.main.read_model.snapshot is not None
+
+
+async def test_batch_rejects_invalid_ids(client):
+    response = await client.get("/characters/batch?ids=1,abc")
+    assert response.status_code == 400
+
+    ids = ",".join(str(i) for i in range(api.main.BATCH_MAX_IDS + 1))
+    response = await client.get(f"/makers/batch?ids={ids}")
+    assert response.status_code == 400
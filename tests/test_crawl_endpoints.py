@@ -1,3 +1,5 @@
+import subprocess
+import sys
 from unittest.mock import AsyncMock, patch
 
 
@@ -63,3 +65,12 @@ async def test_crawl_image_invalid_url(client):
     data = response.json()
     assert data["success"] is False
     assert data["error"] is not None
+
+
+def test_crawler_is_not_imported_with_app():
+    # 需要新的程序，其他測試可能已經載入 crawler
+    code = (
+        "import sys, api.main; "
+        "assert 'crawler' not in sys.modules and 'google.genai' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
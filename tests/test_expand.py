@@ -0,0 +1,159 @@
+import pytest
+from sqlalchemy import event
+
+import api.cache
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import KigerCharacter
+from api.database import Maker as DBMaker
+from api.database import Source as DBSource
+
+
+async def seed(db_session):
+    sources = [
+        DBSource(title=f"Expand Game {i}", company="ExpandCo", release_year=2020 + i)
+        for i in range(2)
+    ]
+    db_session.add_all(sources)
+    await db_session.flush()
+    makers = [
+        DBMaker(original_name=f"ExpandMaker{i}", name=f"Expand Maker {i}")
+        for i in range(2)
+    ]
+    kiger = DBKiger(id="expand-kiger", name="Expand Kiger", bio="")
+    characters = [
+        DBCharacter(
+            original_name=f"ExpandChar{i}",
+            name=f"Expand Char {i}",
+            type="game",
+            source_id=sources[i % 2].id if i < 3 else None,
+        )
+        for i in range(4)
+    ]
+    db_session.add_all([*makers, kiger, *characters])
+    await db_session.flush()
+    db_session.add_all(
+        KigerCharacter(
+            kiger_id=kiger.id,
+            character_id=character.id,
+            maker_id=makers[i % 2].id if i < 3 else None,
+        )
+        for i, character in enumerate(characters)
+    )
+    await db_session.commit()
+    return kiger, characters, makers, sources
+
+
+def capture_statements(db_session) -> list[str]:
+    statements = []
+
+    def before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(
+        db_session.bind.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    return statements
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_kiger_expand_embeds_related_records(client, db_session):
+    _, characters, makers, sources = await seed(db_session)
+
+    response = await client.get("/kiger/expand-kiger?expand=characters,makers,sources")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["name"] == "Expand Kiger"
+    assert len(data["Characters"]) == 4
+    included = data["included"]
+    assert [c["id"] for c in included["characters"]] == [c.id for c in characters]
+    assert included["characters"][0]["source"]["title"] == "Expand Game 0"
+    assert [m["name"] for m in included["makers"]] == [m.name for m in makers]
+    assert included["sources"] == [
+        {
+            "id": source.id,
+            "title": source.title,
+            "company": "ExpandCo",
+            "releaseYear": source.release_year,
+        }
+        for source in sources
+    ]
+
+
+async def test_expand_uses_batched_queries(client, db_session):
+    await seed(db_session)
+    await client.get("/kiger/expand-kiger")
+    statements = capture_statements(db_session)
+
+    response = await client.get("/kiger/expand-kiger?expand=characters,makers")
+    assert response.status_code == 200
+    # 詳情已在快取中：一次關聯查詢加上角色、商家各一次 IN 查詢
+    assert len(statements) == 3
+    assert all(" IN " in statement for statement in statements[1:])
+
+
+async def test_character_and_maker_expand(client, db_session):
+    kiger, characters, makers, sources = await seed(db_session)
+
+    response = await client.get(
+        f"/character/{characters[3].id}?expand=kigers,makers,sources"
+    )
+    included = response.json()["included"]
+    assert [k["id"] for k in included["kigers"]] == [kiger.id]
+    assert included["makers"] == []
+    assert included["sources"] == []
+
+    response = await client.get(f"/character/{characters[0].id}?expand=sources")
+    assert [s["id"] for s in response.json()["included"]["sources"]] == [sources[0].id]
+
+    response = await client.get(f"/maker/{makers[0].id}?expand=characters")
+    included = response.json()["included"]
+    assert [c["id"] for c in included["characters"]] == [
+        characters[0].id,
+        characters[2].id,
+    ]
+
+
+async def test_expand_with_fields(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/kiger/expand-kiger?fields=name&expand=makers")
+    data = response.json()
+    assert set(data) == {"name", "included"}
+    assert len(data["included"]["makers"]) == 2
+
+
+async def test_expand_rejects_unknown(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/kiger/expand-kiger?expand=kigers")
+    assert response.status_code == 400
+    assert "kigers" in response.json()["detail"]
+
+
+async def test_expand_not_found(client):
+    response = await client.get("/kiger/missing?expand=characters")
+    assert response.status_code == 404
+
+
+async def test_expand_cache_cleared_by_related_update(admin_client, db_session):
+    _, _, makers, _ = await seed(db_session)
+
+    await admin_client.get("/kiger/expand-kiger?expand=makers,characters")
+    await admin_client.get("/kiger/expand-kiger?expand=characters,makers")
+    keys = [key for key in api.cache.cache.keys() if key.startswith("expand:")]
+    assert keys == ["expand:kiger:expand-kiger|characters,makers"]
+
+    response = await admin_client.put(
+        f"/admin/maker/{makers[0].id}",
+        json={
+            "name": "Renamed Maker",
+            "originalName": "ExpandMaker0",
+            "Avatar": "",
+            "socialMedia": {},
+        },
+    )
+    assert response.status_code == 200
+
+    response = await admin_client.get("/kiger/expand-kiger?expand=makers")
+    assert response.json()["included"]["makers"][0]["name"] == "Renamed Maker"
@@ -0,0 +1,269 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import api.cache
+from api.database import Base, FacetCount, KigerCharacter, PendingCharacter
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import Maker as DBMaker
+from api.database import Source as DBSource
+from api.facets import (
+    BUILT_FACET,
+    ensure_facets,
+    rebuild_facets,
+    refresh_facets,
+    upsert_counts,
+)
+from api.migrations import ensure_schema
+
+
+async def seed(db_session):
+    game = DBSource(title="Genshin", company="miHoYo", release_year=2020)
+    anime = DBSource(title="Frieren", company="Madhouse", release_year=2023)
+    maker = DBMaker(original_name="FacetMaker", name="Facet Maker")
+    db_session.add_all([game, anime, maker])
+    await db_session.flush()
+    characters = [
+        DBCharacter(original_name="Ganyu", name="甘雨", type="game", source=game),
+        DBCharacter(original_name="Keqing", name="刻晴", type="game", source=game),
+        DBCharacter(original_name="Fern", name="費倫", type="anime", source=anime),
+    ]
+    kigers = [
+        DBKiger(id="facet-a", name="A", position="kiger", is_active=True),
+        DBKiger(id="facet-b", name="B", position="photographer", is_active=True),
+        DBKiger(id="facet-c", name="C", position="kiger", is_active=False),
+    ]
+    db_session.add_all([*characters, *kigers])
+    await db_session.flush()
+    # facet-a 以同一商家製作兩個角色，只算一位 Kiger
+    db_session.add_all(
+        [
+            KigerCharacter(
+                kiger_id="facet-a", character_id=characters[0].id, maker_id=maker.id
+            ),
+            KigerCharacter(
+                kiger_id="facet-a", character_id=characters[1].id, maker_id=maker.id
+            ),
+            KigerCharacter(
+                kiger_id="facet-b", character_id=characters[2].id, maker_id=maker.id
+            ),
+        ]
+    )
+    await db_session.commit()
+    return game, anime, maker, characters
+
+
+def capture_statements(db_session) -> list[str]:
+    statements = []
+
+    def before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(
+        db_session.bind.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    return statements
+
+
+def test_filter_columns_are_indexed():
+    assert Base.metadata.tables["characters"].c.source_id.index
+    assert Base.metadata.tables["characters"].c.type.index
+    assert Base.metadata.tables["kigers"].c.is_active.index
+    assert Base.metadata.tables["kigers"].c.position.index
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_filter_characters(client, db_session):
+    game, anime, _, _ = await seed(db_session)
+
+    response = await client.get("/characters", params={"sourceId": game.id})
+    assert [c["originalName"] for c in response.json()] == ["Ganyu", "Keqing"]
+
+    response = await client.get("/characters", params={"type": "anime"})
+    assert [c["originalName"] for c in response.json()] == ["Fern"]
+
+    response = await client.get(
+        "/characters",
+        params={"sourceId": game.id, "type": "anime", "fields": "id"},
+    )
+    assert response.json() == []
+
+    # 篩選結果分開快取，不影響完整列表
+    response = await client.get("/characters")
+    assert len(response.json()) == 3
+    assert f"all_characters|sourceId={game.id}" in api.cache.cache
+
+
+async def test_filter_kigers(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/kigers", params={"isActive": "false"})
+    assert [k["id"] for k in response.json()] == ["facet-c"]
+
+    response = await client.get(
+        "/kigers", params={"isActive": "true", "position": "kiger", "fields": "id"}
+    )
+    assert response.json() == [{"id": "facet-a"}]
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_facets_read_counters_only(client, db_session):
+    game, anime, maker, _ = await seed(db_session)
+    await rebuild_facets(db_session)
+    await db_session.commit()
+    statements = capture_statements(db_session)
+
+    response = await client.get("/facets")
+    assert response.status_code == 200
+    assert response.json() == {
+        "characterSources": [
+            {"id": game.id, "name": "Genshin", "count": 2},
+            {"id": anime.id, "name": "Frieren", "count": 1},
+        ],
+        "kigerMakers": [{"id": maker.id, "name": "Facet Maker", "count": 2}],
+    }
+    assert not any(
+        "FROM characters" in s or "kiger_characters" in s for s in statements
+    )
+
+    statements.clear()
+    await client.get("/facets")
+    assert statements == []
+
+
+async def test_review_and_update_refresh_facets(admin_client, db_session):
+    game, anime, maker, characters = await seed(db_session)
+    await rebuild_facets(db_session)
+    await db_session.commit()
+    await admin_client.get("/facets")
+
+    pending = PendingCharacter(
+        original_name="Stark",
+        name="修塔爾克",
+        type="anime",
+        source={"title": "Frieren", "company": "Madhouse", "releaseYear": 2023},
+        status="pending",
+        submitted_at=datetime.utcnow(),
+    )
+    db_session.add(pending)
+    await db_session.commit()
+    response = await admin_client.post(
+        f"/admin/review/character/{pending.id}", json={"action": "approve"}
+    )
+    assert response.status_code == 200
+
+    response = await admin_client.get("/facets")
+    counts = {f["name"]: f["count"] for f in response.json()["characterSources"]}
+    assert counts == {"Genshin": 2, "Frieren": 2}
+
+    # facet-a 改為不使用商家後，該商家只剩 facet-b
+    response = await admin_client.put(
+        "/admin/kiger/facet-a",
+        json={
+            "name": "A",
+            "bio": "",
+            "profileImage": "",
+            "position": "kiger",
+            "isActive": True,
+            "socialMedia": {},
+            "Characters": [{"characterId": characters[0].id, "images": []}],
+        },
+    )
+    assert response.status_code == 200
+    response = await admin_client.get("/facets")
+    assert response.json()["kigerMakers"] == [
+        {"id": maker.id, "name": "Facet Maker", "count": 1}
+    ]
+
+    # 增量更新的結果與整個重建相同
+    rows = await db_session.execute(
+        select(FacetCount.facet, FacetCount.item_id, FacetCount.total)
+    )
+    incremental = set(rows)
+    await rebuild_facets(db_session)
+    rows = await db_session.execute(
+        select(FacetCount.facet, FacetCount.item_id, FacetCount.total)
+    )
+    assert set(rows) == incremental
+
+
+async def test_refresh_facets_upserts_without_delete(client, db_session):
+    game, anime, _, characters = await seed(db_session)
+    await rebuild_facets(db_session)
+    await db_session.commit()
+
+    # 費倫改到 Genshin 後 Frieren 沒有角色，保留 total=0 的列
+    statements = capture_statements(db_session)
+    characters[2].source_id = game.id
+    await refresh_facets(db_session, character_sources={game.id, anime.id})
+    await db_session.commit()
+    assert not any(s.startswith("DELETE") for s in statements)
+
+    rows = await db_session.execute(
+        select(FacetCount.item_id, FacetCount.total).where(
+            FacetCount.facet == "character_sources"
+        )
+    )
+    assert dict(rows.all()) == {game.id: 3, anime.id: 0}
+    api.cache.cache.clear()
+    response = await client.get("/facets")
+    assert response.json()["characterSources"] == [
+        {"id": game.id, "name": "Genshin", "count": 3}
+    ]
+
+
+async def test_ensure_facets_concurrently(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'kigurumi.db'}"
+    engines = [create_async_engine(url) for _ in range(3)]
+    await ensure_schema(engines[0], Base.metadata)
+    sessions = [async_sessionmaker(engine)() for engine in engines]
+    await seed(sessions[0])
+
+    # 只有一個 worker 重建
+    statements = []
+    for engine in engines:
+        event.listen(
+            engine.sync_engine,
+            "before_cursor_execute",
+            lambda _conn, _cursor, statement, *_args: statements.append(statement),
+        )
+    await asyncio.gather(*(ensure_facets(session) for session in sessions))
+    assert sum(s.startswith("DELETE FROM facet_counts") for s in statements) == 1
+    rows = await sessions[0].execute(
+        select(FacetCount.total).where(FacetCount.facet != BUILT_FACET)
+    )
+    assert sorted(rows.scalars()) == [1, 2, 2]
+    for session, engine in zip(sessions, engines, strict=True):
+        await session.close()
+        await engine.dispose()
+
+
+async def test_ensure_facets_skips_empty_but_built_table(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'empty.db'}")
+    await ensure_schema(engine, Base.metadata)
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda _conn, _cursor, statement, *_args: statements.append(statement),
+    )
+    async with async_sessionmaker(engine)() as session:
+        await ensure_facets(session)
+        # 沒有任何資料時計數表沒有計數，之後啟動不再重建
+        await ensure_facets(session)
+    assert sum(s.startswith("DELETE FROM facet_counts") for s in statements) == 1
+    await engine.dispose()
+
+
+def test_upsert_counts_dialects():
+    for dialect in ("mysql", "mariadb"):
+        assert "ON DUPLICATE KEY UPDATE" in str(
+            upsert_counts(dialect, "kiger_makers", {1})
+        )
+    assert "ON CONFLICT" in str(upsert_counts("sqlite", "kiger_makers", {1}))
+    with pytest.raises(NotImplementedError):
+        upsert_counts("oracle", "kiger_makers", {1})
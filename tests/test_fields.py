@@ -0,0 +1,162 @@
+import pytest
+from sqlalchemy import event
+
+import api.cache
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import KigerCharacter
+from api.database import Maker as DBMaker
+from api.database import Source as DBSource
+
+
+async def seed(db_session):
+    source = DBSource(title="Fields Game", company="FieldsCo", release_year=2024)
+    db_session.add(source)
+    await db_session.flush()
+    maker = DBMaker(original_name="FieldsMaker", name="Fields Maker")
+    kiger = DBKiger(
+        id="fields-kiger",
+        name="Fields Kiger",
+        bio="Long bio",
+        profile_image="https://example.com/fields.png",
+        is_active=True,
+    )
+    character = DBCharacter(
+        original_name="FieldsChar",
+        name="Fields Char",
+        type="game",
+        source_id=source.id,
+    )
+    db_session.add_all([maker, kiger, character])
+    await db_session.flush()
+    db_session.add(
+        KigerCharacter(kiger_id=kiger.id, character_id=character.id, maker_id=maker.id)
+    )
+    await db_session.commit()
+    return kiger, character, maker
+
+
+def capture_statements(db_session) -> list[str]:
+    statements = []
+
+    def before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(
+        db_session.bind.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    return statements
+
+
+async def test_list_fields_trims_response(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/kigers?fields=id,name,profileImage")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "id": "fields-kiger",
+            "name": "Fields Kiger",
+            "profileImage": "https://example.com/fields.png",
+        }
+    ]
+
+    response = await client.get("/characters?fields=name,source")
+    assert response.json() == [
+        {
+            "name": "Fields Char",
+            "source": {
+                "title": "Fields Game",
+                "company": "FieldsCo",
+                "releaseYear": 2024,
+            },
+        }
+    ]
+
+    response = await client.get("/makers?fields=Avatar")
+    assert response.json() == [{"Avatar": None}]
+
+
+async def test_list_fields_selects_only_requested_columns(client, db_session):
+    await seed(db_session)
+    statements = capture_statements(db_session)
+
+    response = await client.get("/kigers?fields=name")
+    assert response.status_code == 200
+    query = statements[-1]
+    assert "bio" not in query
+    assert "social_media" not in query
+
+    await client.get("/characters?fields=name")
+    assert "sources" not in statements[-1]
+
+
+async def test_unknown_field_rejected(client):
+    response = await client.get("/kigers?fields=id,password")
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+
+async def test_fields_cached_under_normalized_key(client, db_session):
+    await seed(db_session)
+
+    first = await client.get("/kigers?fields=name,id")
+    second = await client.get("/kigers?fields= id , name")
+    assert first.json() == second.json()
+    keys = [key for key in api.cache.cache.keys() if key.startswith("all_kigers")]
+    assert keys == ["all_kigers|fields=id,name"]
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_detail_fields_skip_relations(client, db_session):
+    kiger, character, maker = await seed(db_session)
+    statements = capture_statements(db_session)
+
+    response = await client.get("/kiger/fields-kiger?fields=name")
+    assert response.json() == {"name": "Fields Kiger"}
+    assert len(statements) == 1
+    assert "kiger_characters" not in statements[0]
+
+    response = await client.get("/kiger/fields-kiger?fields=id,Characters")
+    data = response.json()
+    assert data["id"] == "fields-kiger"
+    assert data["Characters"][0]["characterName"] == "Fields Char"
+
+    response = await client.get(f"/character/{character.id}?fields=kigers")
+    assert response.json()["kigers"][0]["kigerid"] == "fields-kiger"
+
+    response = await client.get(f"/maker/{maker.id}?fields=name,kigers")
+    data = response.json()
+    assert data["name"] == "Fields Maker"
+    assert data["kigers"][0]["characterName"] == "Fields Char"
+
+
+async def test_detail_fields_not_found(client):
+    response = await client.get("/kiger/missing?fields=name")
+    assert response.status_code == 404
+
+
+async def test_update_invalidates_projections(admin_client, db_session):
+    await seed(db_session)
+
+    await admin_client.get("/kigers?fields=name")
+    await admin_client.get("/kiger/fields-kiger?fields=name")
+
+    response = await admin_client.put(
+        "/admin/kiger/fields-kiger",
+        json={
+            "name": "Renamed Kiger",
+            "bio": "",
+            "profileImage": "",
+            "position": "",
+            "isActive": True,
+            "socialMedia": {},
+            "Characters": [],
+        },
+    )
+    assert response.status_code == 200
+
+    response = await admin_client.get("/kigers?fields=name")
+    assert response.json() == [{"name": "Renamed Kiger"}]
+    response = await admin_client.get("/kiger/fields-kiger?fields=name")
+    assert response.json() == {"name": "Renamed Kiger"}
@@ -0,0 +1,195 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import api.auth
+import api.metrics
+from api import file_lock
+from api.cache import cache, set_cache
+from api.database import DB_POOL_SIZE
+from api.database import Kiger as DBKiger
+from api.database import create_read_engine, warm_pool
+from api.metrics import (
+    CACHE_ENTRIES,
+    CACHE_REQUESTS,
+    OUTBOUND_LATENCY,
+    POOL_CHECKED_OUT,
+    POOL_CONNECT,
+    POOL_IDLE,
+    POOL_OVERFLOW,
+    POOL_SIZE,
+    POOL_TIMEOUTS,
+    REQUEST_DB_QUERIES,
+    WorkerMetrics,
+    instrument_pool,
+    render_metrics,
+)
+
+METRICS_TOKEN = "scrape-token"
+
+
+@pytest.fixture()
+def scrape(client, monkeypatch):
+    """以 METRICS_TOKEN 讀取 /metrics"""
+    monkeypatch.setattr(api.auth, "METRICS_TOKEN", METRICS_TOKEN)
+
+    async def get():
+        return await client.get(
+            "/metrics", headers={"Authorization": f"Bearer {METRICS_TOKEN}"}
+        )
+
+    return get
+
+
+async def test_metrics_endpoint_exposes_route_latency(client, scrape):
+    await client.get("/kigers")
+
+    response = await scrape()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'route="/kigers"' in body
+    assert "db_pool_connect_seconds" in body
+    assert "cache_entries" in body
+
+
+async def test_metrics_requires_token(client, monkeypatch):
+    # 未設定 METRICS_TOKEN 時不開放
+    assert (await client.get("/metrics")).status_code == 404
+
+    monkeypatch.setattr(api.auth, "METRICS_TOKEN", METRICS_TOKEN)
+    assert (await client.get("/metrics")).status_code == 401
+    response = await client.get(
+        "/metrics", headers={"Authorization": "Bearer wrong-token"}
+    )
+    assert response.status_code == 401
+
+
+async def test_metrics_uses_route_template(client, db_session, scrape):
+    db_session.add(DBKiger(id="metrics-kiger", name="Metrics", bio=""))
+    await db_session.commit()
+
+    await client.get("/kiger/metrics-kiger")
+
+    body = (await scrape()).text
+    assert 'route="/kiger/{kiger_id}"' in body
+    assert "metrics-kiger" not in body
+
+
+async def test_metrics_counts_db_queries_per_request(client, scrape):
+    before = REQUEST_DB_QUERIES.count(route="/makers")
+    await client.get("/makers")
+    assert REQUEST_DB_QUERIES.count(route="/makers") == before + 1
+    body = (await scrape()).text
+    assert 'http_request_db_queries_bucket{route="/makers",le="0"}' in body
+
+
+async def test_metrics_counts_cache_hits_and_misses(client):
+    misses = CACHE_REQUESTS.get(family="all_characters", result="miss")
+    hits = CACHE_REQUESTS.get(family="all_characters", result="hit")
+
+    await client.get("/characters")
+    await client.get("/characters")
+
+    assert CACHE_REQUESTS.get(family="all_characters", result="miss") == misses + 1
+    assert CACHE_REQUESTS.get(family="all_characters", result="hit") == hits + 1
+
+
+@patch("api.main.fetch_twitter_user", new_callable=AsyncMock)
+async def test_metrics_records_outbound_latency(mock_fetch, client):
+    mock_fetch.return_value = {"name": "Test User"}
+    before = OUTBOUND_LATENCY.count(target="twitter_user", outcome="ok")
+
+    await client.post("/crawl/twitter/user", json={"username": "testuser"})
+
+    assert OUTBOUND_LATENCY.count(target="twitter_user", outcome="ok") == before + 1
+
+
+async def test_pool_warm_up_and_gauges(tmp_path):
+    engine = create_read_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", "test")
+    assert not engine.sync_engine.pool._pre_ping
+    await warm_pool(engine, 3)
+    await render_metrics()
+    assert POOL_SIZE.get(pool="test") == DB_POOL_SIZE
+    assert POOL_IDLE.get(pool="test") == 3
+
+    async with engine.connect() as conn:
+        await conn.execute(select(1))
+        body = await render_metrics()
+        assert POOL_CHECKED_OUT.get(pool="test") == 1
+        assert POOL_IDLE.get(pool="test") == 2
+    assert 'db_pool_checked_out{pool="test"} 1' in body
+    assert POOL_CONNECT.count(pool="test") == 4
+    await engine.dispose()
+
+
+async def test_pool_timeout_is_counted(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'timeout.db'}",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    instrument_pool(engine, "test-timeout")
+    async with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            await engine.connect().start()
+    assert POOL_TIMEOUTS.get(pool="test-timeout") == 1
+    await render_metrics()
+    assert POOL_OVERFLOW.get(pool="test-timeout") == 0
+    await engine.dispose()
+
+
+async def test_metrics_merge_all_workers(tmp_path):
+    CACHE_REQUESTS.inc(family="merge-test", result="hit")
+    POOL_SIZE.set(7, pool="merge-test")
+    hits = CACHE_REQUESTS.get(family="merge-test", result="hit")
+    scraper = WorkerMetrics(str(tmp_path))
+    # 同一個程序內的第二個 WorkerMetrics 代表另一個 worker，寫入的數值與目前相同
+    other = WorkerMetrics(str(tmp_path))
+
+    states = scraper.merged_states()
+    assert states["cache_requests_total"][("merge-test", "hit")] == 2 * hits
+    assert states["db_pool_size"][("merge-test",)] == 14
+
+    # worker 當掉時鎖隨之釋放：counter 併入 archive，gauge 不再計入
+    os.close(other.lock_fd)
+    states = scraper.merged_states()
+    assert states["cache_requests_total"][("merge-test", "hit")] == 2 * hits
+    assert states["db_pool_size"][("merge-test",)] == 7
+    assert f"{other.id}.json" not in os.listdir(tmp_path)
+
+    await scraper.close()
+    assert sorted(os.listdir(tmp_path)) == [".lock", "archive.json"]
+    archive = WorkerMetrics(str(tmp_path))
+    states = archive.merged_states()
+    assert states["cache_requests_total"][("merge-test", "hit")] == 3 * hits
+    await archive.close()
+
+
+async def test_cache_entries_gauge_set_on_render():
+    set_cache("gauge-test", 1)
+    await render_metrics()
+    assert CACHE_ENTRIES.get() == len(cache)
+
+
+async def test_render_metrics_waits_for_directory_lock_off_loop(tmp_path, monkeypatch):
+    worker = WorkerMetrics(str(tmp_path))
+    monkeypatch.setattr(api.metrics, "worker_metrics", worker)
+    # 另一個 worker 正在讀寫目錄
+    lock_fd = file_lock.acquire(str(tmp_path / ".lock"))
+    try:
+        render = asyncio.create_task(render_metrics())
+        # 等待目錄鎖期間事件迴圈仍可處理其他工作
+        await asyncio.wait_for(asyncio.sleep(0.05), 1)
+        assert not render.done()
+    finally:
+        os.close(lock_fd)
+    assert "cache_entries" in await render
+    await worker.close()
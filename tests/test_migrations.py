@@ -0,0 +1,172 @@
+import asyncio
+
+from sqlalchemy import delete, event, func, inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.database import (
+    Base,
+    KigerCharacter,
+    PendingCharacter,
+    PendingKiger,
+    PendingMaker,
+)
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.migrations import (
+    LATEST_VERSION,
+    MIGRATIONS,
+    ensure_schema,
+    migrate,
+    schema_lock,
+    schema_version,
+)
+
+MIGRATED_INDEXES = [
+    ("kiger_characters", "ix_kiger_characters_kiger_id"),
+    ("kiger_characters", "ix_kiger_characters_character_id"),
+    ("pending_kigers", "ix_pending_kigers_status_submitted_at"),
+    ("characters", "ix_characters_source_id"),
+]
+
+
+def index_names(connection, table_name: str) -> set[str]:
+    return {index["name"] for index in inspect(connection).get_indexes(table_name)}
+
+
+async def test_migrate_adds_indexes_to_existing_database():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        # 模擬加上索引之前建立的資料庫
+        await conn.run_sync(Base.metadata.create_all)
+        for _, index_name in MIGRATED_INDEXES:
+            await conn.execute(text(f"DROP INDEX {index_name}"))
+
+        assert await migrate(conn, Base.metadata) == [m.version for m in MIGRATIONS]
+        for table_name, index_name in MIGRATED_INDEXES:
+            assert index_name in await conn.run_sync(index_names, table_name)
+        result = await conn.execute(select(schema_version.c.version))
+        assert list(result.scalars()) == [m.version for m in MIGRATIONS]
+
+        # 已套用的版本不再執行
+        assert await migrate(conn, Base.metadata) == []
+    await engine.dispose()
+
+
+async def test_migrate_on_fresh_database_is_noop_for_existing_indexes():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        before = await conn.run_sync(index_names, "kiger_characters")
+        await migrate(conn, Base.metadata)
+        assert await conn.run_sync(index_names, "kiger_characters") == before
+    await engine.dispose()
+
+
+async def test_ensure_schema_skips_creation_when_version_is_current():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    assert await ensure_schema(engine, Base.metadata)
+    async with engine.connect() as conn:
+        assert "kigers" in await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).get_table_names()
+        )
+
+    # 已是最新版本：只查詢一次版本，不反射資料表
+    statements.clear()
+    assert not await ensure_schema(engine, Base.metadata)
+    assert len(statements) == 1
+    assert "schema_version" in statements[0]
+
+    # 版本落後時重新建立並套用 migration
+    async with engine.begin() as conn:
+        await conn.execute(delete(schema_version))
+    assert await ensure_schema(engine, Base.metadata)
+    async with engine.connect() as conn:
+        result = await conn.execute(select(func.max(schema_version.c.version)))
+        assert result.scalar() == LATEST_VERSION
+    await engine.dispose()
+
+
+async def test_ensure_schema_concurrently_on_empty_database(tmp_path):
+    # 每個 engine 代表一個同時啟動的 worker
+    url = f"sqlite+aiosqlite:///{tmp_path / 'kigurumi.db'}"
+    engines = [create_async_engine(url) for _ in range(4)]
+    created = await asyncio.gather(
+        *(ensure_schema(engine, Base.metadata) for engine in engines)
+    )
+    # 只有一個 worker 建立，其他的等待後發現已是最新版本
+    assert sorted(created) == [False, False, False, True]
+    async with engines[0].connect() as conn:
+        result = await conn.execute(select(schema_version.c.version))
+        assert list(result.scalars()) == [m.version for m in MIGRATIONS]
+    for engine in engines:
+        await engine.dispose()
+
+
+async def test_schema_lock_serializes_file_databases(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'kigurumi.db'}"
+    engines = [create_async_engine(url) for _ in range(2)]
+    events = []
+
+    async def hold(engine, name):
+        async with schema_lock(engine):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name} end")
+
+    await asyncio.gather(hold(engines[0], "a"), hold(engines[1], "b"))
+    assert events in (
+        ["a start", "a end", "b start", "b end"],
+        ["b start", "b end", "a start", "a end"],
+    )
+    for engine in engines:
+        await engine.dispose()
+
+
+async def query_plan(db_session, statement) -> str:
+    compiled = statement.compile(
+        dialect=db_session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    result = await db_session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+    return "\n".join(row.detail for row in result)
+
+
+async def test_pending_lists_use_status_index(db_session):
+    for model in (PendingKiger, PendingCharacter, PendingMaker):
+        plan = await query_plan(
+            db_session,
+            select(model)
+            .where(model.status == "pending")
+            .order_by(model.submitted_at.asc()),
+        )
+        assert f"ix_{model.__tablename__}_status_submitted_at" in plan
+        # 索引已依 submitted_at 排序，不需額外排序
+        assert "TEMP B-TREE" not in plan
+
+
+async def test_relation_lookups_use_foreign_key_indexes(db_session):
+    for condition, index_name in (
+        (KigerCharacter.kiger_id == "kiger", "ix_kiger_characters_kiger_id"),
+        (KigerCharacter.character_id == 1, "ix_kiger_characters_character_id"),
+        (KigerCharacter.maker_id == 1, "ix_kiger_characters_maker_id"),
+    ):
+        plan = await query_plan(db_session, select(KigerCharacter).where(condition))
+        assert f"USING INDEX {index_name}" in plan
+
+
+async def test_list_filters_use_indexes(db_session):
+    for condition, index_name in (
+        (DBCharacter.source_id == 1, "ix_characters_source_id"),
+        (DBCharacter.type == "game", "ix_characters_type"),
+    ):
+        plan = await query_plan(db_session, select(DBCharacter).where(condition))
+        assert f"USING INDEX {index_name}" in plan
+    plan = await query_plan(
+        db_session, select(DBKiger).where(DBKiger.position == "kiger")
+    )
+    assert "USING INDEX ix_kigers_position" in plan
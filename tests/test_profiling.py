@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select
+
+from api.database import Kiger as DBKiger
+from api.profiling import (
+    SamplingProfiler,
+    classify,
+    finish_profile,
+    profile_store,
+    start_profile,
+)
+
+
+def test_classify_breaks_out_categories():
+    app_frame = ("/app/api/main.py", "get_kiger", 10)
+    assert (
+        classify((app_frame, ("/venv/site-packages/pydantic/main.py", "validate", 1)))
+        == "pydantic"
+    )
+    assert (
+        classify(
+            (
+                app_frame,
+                ("/venv/site-packages/sqlalchemy/orm/loading.py", "_instance", 1),
+            )
+        )
+        == "orm_hydration"
+    )
+    assert classify((app_frame,)) == "other"
+
+
+def test_sampling_profiler_collects_call_tree():
+    def busy():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    busy()
+    profiler.stop()
+
+    tree = profiler.call_tree()
+    assert tree["samples"] > 0
+    assert "busy" in profiler.folded()
+    assert sum(profiler.breakdown().values()) > 0
+
+
+def spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def profile_concurrent_requests() -> SamplingProfiler:
+    async def profiled_request():
+        spin(0.03)
+        await asyncio.sleep(0.03)
+        spin(0.03)
+
+    async def other_request():
+        spin(0.05)
+
+    profiler = SamplingProfiler(interval=0.001)
+    task = asyncio.create_task(profiled_request())
+    profiler.track(task.get_coro())
+    profiler.start()
+    await asyncio.gather(task, asyncio.create_task(other_request()))
+    profiler.stop()
+    return profiler
+
+
+def assert_only_tracked_task(profiler: SamplingProfiler) -> None:
+    folded = profiler.folded()
+    assert "profiled_request" in folded
+    # 其他請求佔用事件迴圈的時間算是等待，不計入呼叫樹
+    assert "other_request" not in folded
+    assert "_run_once" not in folded
+    breakdown = profiler.breakdown()
+    assert breakdown["event_loop_wait"] >= 20
+    assert breakdown["other"] >= 20
+
+
+async def test_sampling_profiler_only_samples_tracked_task():
+    assert_only_tracked_task(await profile_concurrent_requests())
+
+
+def test_sampling_profiler_measures_wait_under_uvloop():
+    uvloop = pytest.importorskip("uvloop")
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        assert_only_tracked_task(runner.run(profile_concurrent_requests()))
+
+
+async def test_task_factory_removed_after_profile(db_session):
+    loop = asyncio.get_running_loop()
+    previous = loop.get_task_factory()
+    release = asyncio.Event()
+
+    async def background_work():
+        await release.wait()
+        await db_session.execute(select(DBKiger))
+        # 請求結束後才建立的 task
+        await asyncio.create_task(asyncio.sleep(0))
+
+    first = start_profile("GET", "/first")
+    second = start_profile("GET", "/second")
+    task = asyncio.create_task(background_work())
+    finish_profile(first, 200)
+    assert loop.get_task_factory() is not previous
+    finish_profile(second, 200)
+    # 沒有進行中的 profile 時，create_task 不再經過 profiler
+    assert loop.get_task_factory() is previous
+
+    tracked = list(second.profiler.coroutines or [])
+    release.set()
+    await task
+    assert second.queries == 0
+    assert list(second.profiler.coroutines or []) == tracked
+
+
+async def test_profile_header_ignored_for_non_admin(client):
+    response = await client.get("/kigers", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+    response = await client.get(
+        "/kigers", headers={"X-Profile": "1", "Authorization": "Bearer invalid"}
+    )
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+async def test_admin_profile_is_stored_for_download(admin_client, db_session):
+    db_session.add(DBKiger(id="profile-kiger", name="Profile", bio=""))
+    await db_session.commit()
+
+    response = await admin_client.get(
+        "/kiger/profile-kiger", headers={"X-Profile": "1"}
+    )
+    assert response.status_code == 200
+    assert response.json()["id"] == "profile-kiger"
+    profile_id = response.headers["X-Profile-Id"]
+
+    response = await admin_client.get(f"/admin/profiles/{profile_id}")
+    assert response.status_code == 200
+    profile = response.json()
+    assert profile["path"] == "/kiger/profile-kiger"
+    assert profile["status"] == 200
+    assert set(profile["breakdown"]) == {
+        "pydantic",
+        "orm_hydration",
+        "event_loop_wait",
+        "other",
+    }
+    assert profile["db"]["queries"] >= 1
+    assert profile["tree"]["name"] == "<root>"
+    assert "_run_once" not in response.text
+
+    response = await admin_client.get(f"/admin/profiles/{profile_id}?format=folded")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    summaries = (await admin_client.get("/admin/profiles")).json()
+    assert summaries[0]["id"] == profile_id
+    assert "tree" not in summaries[0]
+
+
+async def test_admin_profile_inline(admin_client):
+    response = await admin_client.get("/kigers?profile=inline")
+    assert response.status_code == 200
+    profile = response.json()
+    assert profile["id"] == response.headers["X-Profile-Id"]
+    assert profile["path"] == "/kigers"
+    assert profile_store.get(profile["id"]) is not None
+
+
+async def test_profile_download_requires_admin(client):
+    response = await client.get("/admin/profiles")
+    assert response.status_code in (401, 403)
+
+    response = await client.get("/admin/profiles/missing")
+    assert response.status_code in (401, 403)
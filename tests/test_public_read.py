@@ -1,8 +1,23 @@
+import pytest
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import api.database
+from api.database import (
+    READ_ENGINE_OPTIONS,
+    Base,
+    KigerCharacter,
+    get_db,
+    get_primary_read_db,
+    get_read_db,
+)
 from api.database import Character as DBCharacter
 from api.database import Kiger as DBKiger
-from api.database import KigerCharacter
 from api.database import Maker as DBMaker
 from api.database import Source as DBSource
+from api.main import app
 
 
 async def test_root(client):
@@ -140,6 +155,37 @@ async def test_get_characters_with_data(client, db_session):
     assert data[0]["source"]["releaseYear"] == 2023
 
 
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_get_characters_mixed_sources_single_query(client, db_session):
+    source = DBSource(title="Game1", company="Studio1", release_year=2020)
+    db_session.add(source)
+    await db_session.flush()
+    db_session.add_all(
+        [
+            DBCharacter(
+                original_name="WithSource",
+                name="With Source",
+                type="game",
+                source_id=source.id,
+            ),
+            DBCharacter(original_name="NoSource", name="No Source", type="other"),
+        ]
+    )
+    await db_session.commit()
+
+    response = await client.get("/characters")
+    assert response.status_code == 200
+    data = response.json()
+    assert [c["originalName"] for c in data] == ["WithSource", "NoSource"]
+    assert data[0]["source"] == {
+        "title": "Game1",
+        "company": "Studio1",
+        "releaseYear": 2020,
+    }
+    assert data[1]["source"] is None
+    assert data[1]["officialImage"] is None
+
+
 async def test_get_character_by_id(client, db_session):
     source = DBSource(title="VTuber Agency", company="Agency1", release_year=2022)
     db_session.add(source)
@@ -318,3 +364,61 @@ async def test_get_maker_with_kigers(client, db_session):
 async def test_get_maker_not_found(client):
     response = await client.get("/maker/99999")
     assert response.status_code == 404
+
+
+def dependency_calls(dependant) -> set:
+    calls = set()
+    for dependency in dependant.dependencies:
+        calls.add(dependency.call)
+        calls |= dependency_calls(dependency)
+    return calls
+
+
+def test_public_reads_use_read_session():
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        calls = dependency_calls(route.dependant)
+        sessions = calls & {get_db, get_primary_read_db, get_read_db}
+        if not sessions:
+            continue
+        read_only = route.methods == {"GET"} or route.path == "/batch"
+        if read_only and not route.path.startswith("/admin"):
+            assert sessions == {get_read_db}, route.path
+        else:
+            assert get_read_db not in calls, route.path
+
+
+async def test_read_session_skips_commit_and_rollback(tmp_path, monkeypatch):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'read.db'}", **READ_ENGINE_OPTIONS
+    )
+    calls = []
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def spy_transactions(dbapi_connection, _connection_record):
+        # AsyncAdapt 連線不可設定屬性，改包裝底層的 aiosqlite 連線
+        connection = dbapi_connection._connection
+        for name in ("commit", "rollback"):
+            method = getattr(connection, name)
+
+            def spy(method=method, name=name):
+                calls.append(name)
+                return method()
+
+            setattr(connection, name, spy)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    calls.clear()
+    monkeypatch.setattr(
+        api.database,
+        "read_session_maker",
+        async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+    )
+
+    for _ in range(3):
+        async for db in get_read_db(Request({"type": "http", "headers": []})):
+            await db.execute(select(DBKiger))
+    assert calls == []
+    await engine.dispose()
@@ -0,0 +1,132 @@
+import pytest
+from sqlalchemy import select
+
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import KigerCharacter
+from api.database import Maker as DBMaker
+from api.database import Source as DBSource
+from api.main import app
+from api.metrics import RequestStats
+from api.query_budget import check_query_budget, query_budget
+
+
+def character_data(index: int) -> dict:
+    return {
+        "name": f"Budget Char {index}",
+        "originalName": f"BudgetChar{index}",
+        "type": "game",
+        "officialImage": "",
+        "source": {
+            "title": f"Budget Game {index % 2}",
+            "company": "BudgetCo",
+            "releaseYear": 2024,
+        },
+    }
+
+
+async def test_check_query_budget_reports_violation():
+    @query_budget(2)
+    async def endpoint():
+        pass
+
+    route = next(r for r in app.routes if getattr(r, "path", "") == "/kigers")
+    original = route.endpoint
+    route.endpoint = endpoint
+    try:
+        assert check_query_budget("GET", route, RequestStats("/kigers", 2)) is None
+        violation = check_query_budget("GET", route, RequestStats("/kigers", 3))
+    finally:
+        route.endpoint = original
+    assert violation["budget"] == 2
+    assert violation["queries"] == 3
+    assert violation["route"] == "/kigers"
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_public_reads_within_budget(client, db_session):
+    source = DBSource(title="Budget Game", company="BudgetCo", release_year=2024)
+    db_session.add(source)
+    await db_session.flush()
+    maker = DBMaker(original_name="BudgetMaker", name="Budget Maker")
+    kiger = DBKiger(id="budget-kiger", name="Budget Kiger", bio="")
+    chars = [
+        DBCharacter(
+            original_name=f"BudgetChar{i}",
+            name=f"Budget Char {i}",
+            type="game",
+            source_id=source.id,
+        )
+        for i in range(5)
+    ]
+    db_session.add_all([maker, kiger, *chars])
+    await db_session.flush()
+    db_session.add_all(
+        KigerCharacter(kiger_id=kiger.id, character_id=c.id, maker_id=maker.id)
+        for c in chars
+    )
+    await db_session.commit()
+
+    for path in (
+        "/kigers",
+        "/kiger/budget-kiger",
+        "/characters",
+        f"/character/{chars[0].id}",
+        "/makers",
+        f"/maker/{maker.id}",
+        "/sources",
+    ):
+        response = await client.get(path)
+        assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_submit_and_review_kiger_do_not_scale_with_characters(
+    admin_client, db_session
+):
+    db_session.add(
+        DBCharacter(original_name="BudgetChar0", name="Existing", type="game")
+    )
+    await db_session.commit()
+    existing = (
+        await db_session.execute(
+            select(DBCharacter).where(DBCharacter.original_name == "BudgetChar0")
+        )
+    ).scalar_one()
+
+    characters = [{"characterId": existing.id, "images": []}]
+    characters += [
+        {"characterId": None, "images": [], "characterData": character_data(i)}
+        for i in range(1, 8)
+    ]
+    response = await admin_client.post(
+        "/kiger",
+        json={
+            "name": "Budget Kiger",
+            "bio": "",
+            "profileImage": "",
+            "isActive": True,
+            "socialMedia": {},
+            "Characters": characters,
+        },
+    )
+    assert response.status_code == 200
+    kiger_id = response.json()["id"]
+
+    response = await admin_client.post(
+        f"/admin/review/kiger/{kiger_id}", json={"action": "approve"}
+    )
+    assert response.status_code == 200
+
+    relations = (
+        (
+            await db_session.execute(
+                select(KigerCharacter).where(KigerCharacter.kiger_id == kiger_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert len(relations) == 8
+    sources = (await db_session.execute(select(DBSource))).scalars().all()
+    assert len(sources) == 2
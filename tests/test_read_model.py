@@ -0,0 +1,285 @@
+from sqlalchemy import delete, event
+
+from api.cache import clear_cache
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import (
+    KigerCharacter,
+    PendingKiger,
+    bump_published,
+    current_data_version,
+)
+from api.database import Maker as DBMaker
+from api.database import Source as DBSource
+from api.facets import rebuild_facets
+from api.main import read_model
+
+
+async def seed(db_session):
+    sources = [
+        DBSource(title=f"Model Game {i}", company="ModelCo", release_year=2020 + i)
+        for i in range(2)
+    ]
+    db_session.add_all(sources)
+    await db_session.flush()
+    makers = [
+        DBMaker(original_name=f"ModelMaker{i}", name=f"Model Maker {i}")
+        for i in range(3)
+    ]
+    kigers = [
+        DBKiger(
+            id=f"model-kiger-{i}",
+            name=f"Model Kiger {i}",
+            bio="",
+            position="performer" if i % 2 else "cosplayer",
+            is_active=i != 3,
+            social_media={"twitter": f"https://twitter.com/model{i}"},
+        )
+        for i in range(5)
+    ]
+    characters = [
+        DBCharacter(
+            original_name=f"ModelChar{i}",
+            name=f"Model Char {i}",
+            type="game" if i % 2 else "anime",
+            source_id=sources[i % 2].id if i < 4 else None,
+        )
+        for i in range(6)
+    ]
+    db_session.add_all([*makers, *kigers, *characters])
+    await db_session.flush()
+    # model-kiger-4 與 ModelChar5、Model Maker 2 沒有任何關聯
+    db_session.add_all(
+        KigerCharacter(
+            kiger_id=kigers[i % 4].id,
+            character_id=characters[i % 5].id,
+            maker_id=makers[i % 2].id if i % 3 else None,
+            images=[f"https://example.com/{i}.png"] if i % 2 else None,
+        )
+        for i in range(8)
+    )
+    await rebuild_facets(db_session)
+    await db_session.commit()
+    return kigers, characters, makers, sources
+
+
+def capture_statements(db_session) -> list[str]:
+    statements = []
+
+    def before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(
+        db_session.bind.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    return statements
+
+
+async def test_read_model_matches_database_responses(client, db_session):
+    kigers, characters, makers, sources = await seed(db_session)
+    character_ids = ",".join(str(c.id) for c in characters[:3])
+    maker_ids = ",".join(str(m.id) for m in makers)
+    urls = [
+        "/kigers",
+        "/kigers?start=1&end=3",
+        "/kigers?isActive=true",
+        "/kigers?position=performer&isActive=true",
+        "/kigers?position=nobody",
+        "/kigers?fields=id,name",
+        "/characters",
+        f"/characters?sourceId={sources[0].id}",
+        f"/characters?sourceId={sources[1].id}&type=game",
+        "/characters?fields=name,source&start=2",
+        "/makers",
+        "/makers?fields=name&end=2",
+        "/sources",
+        "/facets",
+        "/kigers/batch?ids=model-kiger-2,missing,model-kiger-0",
+        f"/characters/batch?ids={character_ids},999",
+        f"/makers/batch?ids={maker_ids}",
+        "/kiger/missing",
+        "/character/999",
+        "/maker/999",
+    ]
+    for kiger in kigers:
+        urls += [
+            f"/kiger/{kiger.id}",
+            f"/kiger/{kiger.id}?fields=name,Characters",
+            f"/kiger/{kiger.id}?expand=characters,makers,sources",
+        ]
+    for character in characters:
+        urls += [
+            f"/character/{character.id}",
+            f"/character/{character.id}?fields=source,kigers",
+            f"/character/{character.id}?expand=kigers,makers,sources",
+        ]
+    for maker in makers:
+        urls += [
+            f"/maker/{maker.id}",
+            f"/maker/{maker.id}?fields=id,kigers&expand=characters",
+            f"/maker/{maker.id}?expand=kigers,sources",
+        ]
+
+    expected = {}
+    for url in urls:
+        response = await client.get(url)
+        expected[url] = (response.status_code, response.json())
+    batch_payload = {"kigers": ["model-kiger-1"], "makers": [makers[0].id, 999]}
+    expected_batch = (await client.post("/batch", json=batch_payload)).json()
+
+    clear_cache()
+    read_model.enabled = True
+    for url in urls:
+        response = await client.get(url)
+        assert (response.status_code, response.json()) == expected[url], url
+    response = await client.post("/batch", json=batch_payload)
+    assert response.json() == expected_batch
+
+
+async def test_reads_do_not_query_once_built(client, db_session):
+    await seed(db_session)
+    read_model.enabled = True
+    assert (await client.get("/kigers")).status_code == 200
+
+    statements = capture_statements(db_session)
+    for url in (
+        "/kigers",
+        "/kiger/model-kiger-0?expand=characters",
+        "/characters",
+        "/makers",
+        "/sources",
+        "/facets",
+        "/kigers/batch?ids=model-kiger-1",
+    ):
+        assert (await client.get(url)).status_code == 200
+    assert statements == []
+
+
+async def test_admin_update_swaps_snapshot(admin_client, db_session):
+    _, characters, makers, _ = await seed(db_session)
+    read_model.enabled = True
+    response = await admin_client.get(f"/maker/{makers[0].id}")
+    assert response.json()["name"] == "Model Maker 0"
+    before = read_model.snapshot
+
+    response = await admin_client.put(
+        f"/admin/maker/{makers[0].id}",
+        json={
+            "name": "Renamed Maker",
+            "originalName": "ModelMaker0",
+            "Avatar": "https://example.com/renamed.png",
+            "socialMedia": {"twitter": "https://twitter.com/renamed"},
+        },
+    )
+    assert response.status_code == 200
+
+    # 寫入的請求等待重建完成才回應；舊快照不受影響，新快照整個替換
+    assert not read_model.rebuilding()
+    assert before.detail("maker", makers[0].id)["name"] == "Model Maker 0"
+    assert read_model.snapshot is not before
+    response = await admin_client.get(f"/maker/{makers[0].id}")
+    assert response.json()["name"] == "Renamed Maker"
+    # 關聯資料中的商家名稱也一併更新
+    response = await admin_client.get(f"/character/{characters[2].id}")
+    maker_names = {item["makerName"] for item in response.json()["kigers"]}
+    assert "Renamed Maker" in maker_names
+
+
+async def test_stale_snapshot_rebuilds_in_background(client, db_session):
+    await seed(db_session)
+    read_model.enabled = True
+    assert (await client.get("/kigers")).status_code == 200
+    before = read_model.snapshot
+
+    read_model.max_age = 0
+    read_model.delay = 0.05
+    # 資料版本沒有改變時沿用原本的快照
+    assert (await client.get("/kigers")).status_code == 200
+    await read_model.wait()
+    assert read_model.snapshot is before
+
+    # 其他 worker 的修改會遞增資料版本
+    kiger = await db_session.get(DBKiger, "model-kiger-0")
+    kiger.name = "Renamed Elsewhere"
+    await db_session.commit()
+    statements = capture_statements(db_session)
+    assert (await client.get("/kigers")).status_code == 200
+    # 過期時仍以舊快照回應，請求中不查詢資料庫
+    assert statements == []
+    assert read_model.rebuilding()
+
+    await read_model.wait()
+    assert read_model.snapshot is not before
+    assert read_model.snapshot.detail("kiger", "model-kiger-0")["name"] == (
+        "Renamed Elsewhere"
+    )
+
+
+async def test_published_changes_bump_data_version(db_session):
+    await seed(db_session)
+    version = await current_data_version(db_session)
+    assert version is not None
+
+    # 待審核的投稿不影響公開資料
+    db_session.add(PendingKiger(id="pending-version", name="Pending", status="pending"))
+    await db_session.commit()
+    assert await current_data_version(db_session) == version
+
+    kiger = await db_session.get(DBKiger, "model-kiger-0")
+    kiger.bio = "changed"
+    await db_session.commit()
+    assert await current_data_version(db_session) > version
+
+
+async def test_write_waits_for_rebuild_at_most_write_wait(admin_client, db_session):
+    _, _, makers, _ = await seed(db_session)
+    read_model.enabled = True
+    assert (await admin_client.get(f"/maker/{makers[0].id}")).status_code == 200
+    before = read_model.snapshot
+    read_model.delay = 0.5
+    read_model.write_wait = 0.05
+
+    response = await admin_client.put(
+        f"/admin/maker/{makers[0].id}",
+        json={
+            "name": "Slow Rebuild",
+            "originalName": "ModelMaker0",
+            "Avatar": "https://example.com/slow.png",
+            "socialMedia": {},
+        },
+    )
+    # 重建超過 write_wait 時先回應，重建在背景繼續
+    assert response.status_code == 200
+    assert read_model.rebuilding()
+    assert read_model.snapshot is before
+    await read_model.wait()
+    response = await admin_client.get(f"/maker/{makers[0].id}")
+    assert response.json()["name"] == "Slow Rebuild"
+
+
+async def test_core_changes_bump_data_version_once(db_session):
+    await seed(db_session)
+    version = await current_data_version(db_session)
+
+    # Core 的 delete 不經過 after_flush，需明確遞增
+    await db_session.execute(
+        delete(KigerCharacter).where(KigerCharacter.kiger_id == "model-kiger-0")
+    )
+    await bump_published(db_session)
+    await bump_published(db_session)
+    await db_session.commit()
+    assert await current_data_version(db_session) == version + 1
+
+
+async def test_write_without_published_changes_skips_rebuild(client, db_session):
+    await seed(db_session)
+    await read_model.rebuild_after_write(db_session)
+    read_model.enabled = True
+    assert (await client.get("/kigers")).status_code == 200
+    before = read_model.snapshot
+
+    db_session.add(PendingKiger(id="pending-only", name="Pending", status="pending"))
+    await db_session.commit()
+    await read_model.rebuild_after_write(db_session)
+    assert not read_model.rebuilding()
+    assert read_model.snapshot is before
@@ -0,0 +1,176 @@
+import time
+from contextlib import aclosing
+
+import pytest
+import pytest_asyncio
+from fastapi import Request, Response
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import api.database
+from api.cache import clear_cache
+from api.database import (
+    STICKY_PRIMARY_COOKIE,
+    Base,
+    can_fill_cache,
+    create_read_engine,
+    get_read_db,
+    stick_to_primary,
+)
+from api.database import Kiger as DBKiger
+from api.database import Maker as DBMaker
+from api.main import app, read_model
+
+MAKER_PAYLOAD = {
+    "name": "Updated Maker",
+    "originalName": "UpdatedMaker",
+    "Avatar": "",
+    "socialMedia": {},
+}
+
+KIGER_PAYLOAD = {
+    "name": "primary",
+    "bio": "",
+    "profileImage": "",
+    "isActive": True,
+    "socialMedia": {},
+    "Characters": [],
+}
+
+
+@pytest_asyncio.fixture()
+async def replicas(tmp_path, monkeypatch):
+    """以三個 SQLite 檔案模擬主資料庫與兩個副本，各自存有不同名稱的同一筆 Kiger"""
+    engines = {}
+    session_makers = {}
+    for name in ("primary", "replica-1", "replica-2"):
+        engine = create_read_engine(
+            f"sqlite+aiosqlite:///{tmp_path / name}.db", f"test-{name}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        async with session_maker() as session:
+            session.add(DBKiger(id="replicated", name=name, is_active=True))
+            await session.commit()
+        engines[name] = engine
+        session_makers[name] = session_maker
+
+    monkeypatch.setattr(api.database, "read_session_maker", session_makers["primary"])
+    monkeypatch.setattr(api.database, "_last_write", 0.0)
+    monkeypatch.setattr(
+        api.database,
+        "replica_session_makers",
+        [session_makers["replica-1"], session_makers["replica-2"]],
+    )
+    yield
+    for engine in engines.values():
+        await engine.dispose()
+
+
+async def read_name(client) -> str:
+    response = await client.get("/kiger/replicated")
+    assert response.status_code == 200
+    return response.json()["name"]
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_reads_round_robin_over_replicas(client):
+    app.dependency_overrides.pop(get_read_db)
+    names = []
+    for _ in range(4):
+        clear_cache()
+        names.append(await read_name(client))
+    assert sorted(names) == ["replica-1", "replica-1", "replica-2", "replica-2"]
+    assert names[0] != names[1]
+
+    clear_cache()
+    client.cookies.set(STICKY_PRIMARY_COOKIE, str(time.time() + 5))
+    assert await read_name(client) == "primary"
+
+    # 過期的 cookie 不再導向主資料庫
+    clear_cache()
+    client.cookies.set(STICKY_PRIMARY_COOKIE, str(time.time() - 1))
+    assert await read_name(client) != "primary"
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_admin_write_sticks_reads_to_primary(admin_client, db_session):
+    app.dependency_overrides.pop(get_read_db)
+    db_session.add(DBKiger(id="replicated", name="primary", is_active=True))
+    await db_session.commit()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://testserver"
+    ) as visitor:
+        # 寫入前副本的結果會留在快取中
+        assert await read_name(visitor) != "primary"
+        assert await read_name(admin_client) != "primary"
+
+        # 失敗的寫入不會 commit，也不送出 cookie
+        response = await admin_client.put("/admin/kiger/missing", json=KIGER_PAYLOAD)
+        assert response.status_code == 404
+        assert STICKY_PRIMARY_COOKIE not in response.cookies
+
+        response = await admin_client.put("/admin/kiger/replicated", json=KIGER_PAYLOAD)
+        assert response.status_code == 200
+        assert STICKY_PRIMARY_COOKIE in response.cookies
+
+        # 沒有 cookie 的讀取仍走副本，但副本的舊資料不會填回快取
+        assert await read_name(visitor) != "primary"
+        assert await read_name(admin_client) == "primary"
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_submission_does_not_stick_to_primary(client):
+    response = await client.post("/maker", json=MAKER_PAYLOAD)
+    assert response.status_code == 200
+    # 待審核的投稿不改變公開資料
+    assert STICKY_PRIMARY_COOKIE not in response.cookies
+    assert api.database._last_write == 0.0
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_replica_session_opened_before_write_skips_cache():
+    request = Request({"type": "http", "headers": []})
+    async with aclosing(get_read_db(request)) as sessions:
+        stale = await anext(sessions)
+        assert can_fill_cache(stale)
+
+        stick_to_primary(Response())
+        # 寫入前開啟的副本 session 可能讀到舊資料
+        assert not can_fill_cache(stale)
+
+    async with aclosing(get_read_db(request)) as sessions:
+        # 寫入後的一段時間內副本可能還沒追上
+        assert not can_fill_cache(await anext(sessions))
+
+    api.database._last_write -= api.database.REPLICA_STICKY_SECONDS + 1
+    async with aclosing(get_read_db(request)) as sessions:
+        assert can_fill_cache(await anext(sessions))
+
+
+async def test_no_sticky_cookie_without_replicas(admin_client, db_session):
+    maker = DBMaker(original_name="PlainMaker", name="Plain Maker")
+    db_session.add(maker)
+    await db_session.commit()
+
+    response = await admin_client.put(
+        f"/admin/maker/{maker.id}",
+        json=MAKER_PAYLOAD,
+    )
+    assert response.status_code == 200
+    assert STICKY_PRIMARY_COOKIE not in response.cookies
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_read_model_builds_from_primary(client, db_session):
+    app.dependency_overrides.pop(get_read_db)
+    db_session.add(DBKiger(id="replicated", name="primary", is_active=True))
+    await db_session.commit()
+
+    # 請求分配到副本時，第一次建立的快照仍讀取主資料庫
+    read_model.enabled = True
+    assert await read_name(client) == "primary"
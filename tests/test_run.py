@@ -0,0 +1,128 @@
+import os
+import sys
+
+import pytest
+
+import run
+
+
+@pytest.fixture()
+def installed(monkeypatch):
+    """以集合模擬已安裝的套件"""
+    modules = {"uvloop", "httptools", "gunicorn", "uvicorn_worker"}
+    monkeypatch.setattr(run, "_installed", lambda module: module in modules)
+    return modules
+
+
+@pytest.mark.usefixtures("installed")
+def test_production_options_defaults(monkeypatch):
+    for name in ("HOST", "PORT", "WEB_CONCURRENCY", "MAX_REQUESTS", "LOG_LEVEL"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(run.os, "cpu_count", lambda: 6)
+
+    options = run.production_options()
+    assert options["host"] == "0.0.0.0"
+    assert options["port"] == 8000
+    assert options["workers"] == 6
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "httptools"
+    assert options["max_requests"] == 10000
+
+
+@pytest.mark.usefixtures("installed")
+def test_production_options_from_env(monkeypatch):
+    monkeypatch.setenv("PORT", "9000")
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("MAX_REQUESTS", "0")
+    monkeypatch.setenv("KEEPALIVE_TIMEOUT", "15")
+
+    options = run.production_options()
+    assert options["port"] == 9000
+    assert options["workers"] == 3
+    assert options["max_requests"] == 0
+    assert options["keepalive"] == 15
+
+
+def test_production_options_without_speedups(installed):
+    installed.difference_update({"uvloop", "httptools"})
+    options = run.production_options()
+    assert options["loop"] == "asyncio"
+    assert options["http"] == "h11"
+
+
+def test_choose_launcher(installed):
+    assert run.choose_launcher() is run.run_gunicorn
+    # 只有 gunicorn、沒有 uvicorn-worker 時無法使用 gunicorn
+    installed.discard("uvicorn_worker")
+    assert run.choose_launcher() is run.run_uvicorn
+    installed.discard("gunicorn")
+    assert run.choose_launcher() is run.run_uvicorn
+
+
+@pytest.mark.usefixtures("installed")
+def test_prod_arguments_override_options(monkeypatch):
+    launched = []
+    metrics_dirs = []
+
+    def launch(options):
+        launched.append(options)
+        metrics_dirs.append(os.environ["METRICS_DIR"])
+
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+    monkeypatch.setattr(run, "choose_launcher", lambda: launch)
+    monkeypatch.setattr(
+        sys, "argv", ["run.py", "--prod", "--port", "9001", "--workers", "2"]
+    )
+    run.main()
+    assert launched[0]["port"] == 9001
+    assert launched[0]["workers"] == 2
+    # 未指定 METRICS_DIR 時使用暫存目錄，結束後刪除
+    assert metrics_dirs[0]
+    assert not os.path.exists(metrics_dirs[0])
+
+
+@pytest.mark.usefixtures("installed")
+def test_forked_worker_exit_keeps_metrics_dir(monkeypatch):
+    metrics_dirs = []
+
+    def launch(_options):
+        metrics_dirs.append(os.environ["METRICS_DIR"])
+        # 模擬 fork 出的 worker 結束時離開 main()
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+        raise SystemExit(0)
+
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+    monkeypatch.setattr(run, "choose_launcher", lambda: launch)
+    monkeypatch.setattr(sys, "argv", ["run.py", "--prod"])
+    with pytest.raises(SystemExit):
+        run.main()
+    assert os.path.isdir(metrics_dirs[0])
+    os.rmdir(metrics_dirs[0])
+
+
+@pytest.mark.usefixtures("installed")
+def test_gunicorn_config(monkeypatch):
+    # gunicorn 在 poetry 的 server 群組
+    BaseApplication = pytest.importorskip("gunicorn.app.base").BaseApplication
+    applications = []
+    monkeypatch.setattr(BaseApplication, "run", lambda self: applications.append(self))
+    options = {**run.production_options(), "host": "127.0.0.1", "port": 9002}
+    run.run_gunicorn(options)
+
+    cfg = applications[0].cfg
+    assert cfg.bind == ["127.0.0.1:9002"]
+    assert cfg.preload_app is True
+    assert cfg.post_fork is run.post_fork
+    assert cfg.max_requests == options["max_requests"]
+    assert cfg.worker_class.CONFIG_KWARGS == {"loop": "uvloop", "http": "httptools"}
+
+
+def test_post_fork_disposes_inherited_pools(monkeypatch):
+    import api.database
+
+    disposed = []
+    monkeypatch.setattr(
+        api.database, "dispose_inherited_pools", lambda: disposed.append(True)
+    )
+    run.post_fork(None, None)
+    assert disposed == [True]
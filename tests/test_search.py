@@ -0,0 +1,175 @@
+from datetime import datetime
+
+from api.database import Character as DBCharacter
+from api.database import Kiger as DBKiger
+from api.database import Maker as DBMaker
+from api.database import PendingCharacter, PendingKiger
+from api.search import InvertedIndex, make_entry, search_index
+
+
+async def seed(db_session):
+    characters = [
+        DBCharacter(original_name="Pikachu", name="皮卡丘", type="game"),
+        DBCharacter(original_name="Raichu", name="雷丘", type="game"),
+        DBCharacter(original_name="Hatsune Miku", name="初音未來", type="vtuber"),
+        DBCharacter(original_name="ピカチュウ", name="ピカチュウ", type="game"),
+    ]
+    db_session.add_all(
+        [
+            *characters,
+            DBKiger(id="search-kiger", name="丘比特"),
+            DBMaker(original_name="Pika Studio", name="皮卡工作室"),
+        ]
+    )
+    await db_session.commit()
+    return characters
+
+
+async def test_search_cjk_ngrams(client, db_session):
+    await seed(db_session)
+
+    response = await client.get("/search", params={"q": "卡丘"})
+    assert response.status_code == 200
+    assert [r["name"] for r in response.json()] == ["皮卡丘"]
+
+    response = await client.get("/search", params={"q": "丘"})
+    # 開頭相同的排在前面，其次依名稱長度
+    assert [r["name"] for r in response.json()] == ["丘比特", "雷丘", "皮卡丘"]
+
+    # 半形片假名以 NFKC 正規化
+    response = await client.get("/search", params={"q": "ﾋﾟｶ"})
+    assert [r["name"] for r in response.json()] == ["ピカチュウ"]
+
+
+async def test_search_english_prefix_and_types(client, db_session):
+    characters = await seed(db_session)
+
+    response = await client.get("/search", params={"q": "PIKA"})
+    results = response.json()
+    assert [r["originalName"] for r in results] == ["Pikachu", "Pika Studio"]
+    assert results[0] == {
+        "type": "character",
+        "id": characters[0].id,
+        "name": "皮卡丘",
+        "originalName": "Pikachu",
+    }
+
+    response = await client.get("/search", params={"q": "miku hats"})
+    assert [r["name"] for r in response.json()] == ["初音未來"]
+
+    response = await client.get("/search", params={"q": "pika", "type": "maker"})
+    assert [r["type"] for r in response.json()] == ["maker"]
+
+    response = await client.get("/search", params={"q": "pika", "type": "pokemon"})
+    assert response.status_code == 400
+
+
+async def test_search_exact_match_first(client, db_session):
+    await seed(db_session)
+    db_session.add(DBCharacter(original_name="Pika", name="皮卡", type="other"))
+    await db_session.commit()
+
+    response = await client.get("/search", params={"q": "皮卡"})
+    assert [r["name"] for r in response.json()] == ["皮卡", "皮卡丘", "皮卡工作室"]
+
+
+async def test_search_updates_on_commit(admin_client, db_session):
+    characters = await seed(db_session)
+    await admin_client.get("/search", params={"q": "pika"})
+    assert search_index.index is not None
+
+    response = await admin_client.put(
+        f"/admin/character/{characters[0].id}",
+        json={
+            "name": "電氣鼠",
+            "originalName": "Pikachu",
+            "type": "game",
+            "officialImage": "",
+            "source": {"title": "Pokemon", "company": "GameFreak", "releaseYear": 1996},
+        },
+    )
+    assert response.status_code == 200
+    response = await admin_client.get("/search", params={"q": "電氣"})
+    assert [r["id"] for r in response.json()] == [characters[0].id]
+    response = await admin_client.get("/search", params={"q": "卡丘"})
+    assert response.json() == []
+
+    pending = PendingCharacter(
+        original_name="Eevee",
+        name="伊布",
+        type="game",
+        status="pending",
+        submitted_at=datetime.utcnow(),
+    )
+    db_session.add(pending)
+    await db_session.commit()
+    response = await admin_client.post(
+        f"/admin/review/character/{pending.id}", json={"action": "approve"}
+    )
+    assert response.status_code == 200
+    response = await admin_client.get("/search", params={"q": "eevee"})
+    assert [r["name"] for r in response.json()] == ["伊布"]
+
+
+async def test_search_indexes_characters_created_by_kiger_review(
+    admin_client, db_session
+):
+    await admin_client.get("/search", params={"q": "anything"})
+
+    db_session.add(
+        PendingKiger(
+            id="search-review-kiger",
+            name="新人",
+            bio="",
+            is_active=True,
+            social_media={},
+            characters=[
+                {
+                    "characterData": {
+                        "name": "芙莉蓮",
+                        "originalName": "Frieren",
+                        "type": "anime",
+                    },
+                    "images": [],
+                }
+            ],
+            status="pending",
+            submitted_at=datetime.utcnow(),
+        )
+    )
+    await db_session.commit()
+    response = await admin_client.post(
+        "/admin/review/kiger/search-review-kiger", json={"action": "approve"}
+    )
+    assert response.status_code == 200
+
+    response = await admin_client.get("/search", params={"q": "frier"})
+    assert [r["name"] for r in response.json()] == ["芙莉蓮"]
+    response = await admin_client.get("/search", params={"q": "新人"})
+    assert [r["id"] for r in response.json()] == ["search-review-kiger"]
+
+
+async def test_rollback_discards_changes(client, db_session):
+    await seed(db_session)
+    await client.get("/search", params={"q": "pika"})
+
+    db_session.add(DBCharacter(original_name="Ghost", name="幽靈", type="other"))
+    await db_session.flush()
+    await db_session.rollback()
+
+    response = await client.get("/search", params={"q": "幽靈"})
+    assert response.json() == []
+
+
+def test_inverted_index_remove_and_limit():
+    index = InvertedIndex.build(
+        make_entry("character", i, f"角色{i}", f"character {i}") for i in range(50)
+    )
+    assert len(index.search("角色", limit=5)) == 5
+    assert [e.id for e in index.search("character 7")] == [7]
+
+    index.remove(("character", 7))
+    assert index.search("character 7") == []
+    index.add(make_entry("character", 7, "別名", "alias"))
+    assert [e.id for e in index.search("alias")] == [7]
+    assert "character" in index.words
@@ -0,0 +1,221 @@
+import asyncio
+import os
+
+from api import file_lock
+from api.cache import clear_cache
+from api.database import Kiger as DBKiger
+from api.main import load_read_model, read_model
+from api.read_model import ReadModel, SharedSnapshot
+from api.snapshot_file import read_header
+from tests.test_read_model import capture_statements, seed
+
+
+def other_worker(path) -> ReadModel:
+    """模擬另一個 worker 的 ReadModel"""
+    model = ReadModel(load_read_model, read_model.open_session)
+    model.enabled = True
+    model.path = str(path)
+    model.check_interval = 0
+    return model
+
+
+async def test_shared_snapshot_matches_in_memory(client, db_session, tmp_path):
+    kigers, characters, makers, sources = await seed(db_session)
+    urls = [
+        "/kigers",
+        "/kigers?start=1&end=3",
+        "/kigers?position=performer&isActive=true",
+        "/kigers?fields=id,name",
+        f"/characters?sourceId={sources[1].id}&type=game",
+        "/characters?fields=name,source&start=2",
+        "/makers",
+        "/makers?fields=name&end=2",
+        "/sources",
+        "/facets",
+        "/kigers/batch?ids=model-kiger-2,missing,model-kiger-0",
+        f"/characters/batch?ids={characters[0].id},{characters[5].id},999",
+        "/kiger/missing",
+        "/maker/999",
+    ]
+    for kiger in kigers:
+        urls += [
+            f"/kiger/{kiger.id}",
+            f"/kiger/{kiger.id}?expand=characters,makers,sources",
+        ]
+    for character in characters:
+        urls += [
+            f"/character/{character.id}",
+            f"/character/{character.id}?fields=source,kigers&expand=kigers",
+        ]
+    for maker in makers:
+        urls.append(f"/maker/{maker.id}?expand=kigers,sources")
+
+    read_model.enabled = True
+    expected = {}
+    for url in urls:
+        response = await client.get(url)
+        expected[url] = (response.status_code, response.json())
+    batch_payload = {"kigers": ["model-kiger-1"], "makers": [makers[0].id, 999]}
+    expected_batch = (await client.post("/batch", json=batch_payload)).json()
+
+    read_model.reset()
+    read_model.enabled = True
+    read_model.path = str(tmp_path / "snapshot.bin")
+    clear_cache()
+    for url in urls:
+        response = await client.get(url)
+        assert (response.status_code, response.json()) == expected[url], url
+    response = await client.post("/batch", json=batch_payload)
+    assert response.json() == expected_batch
+    assert isinstance(read_model.snapshot, SharedSnapshot)
+
+
+async def test_other_worker_maps_file_without_queries(client, db_session, tmp_path):
+    await seed(db_session)
+    path = tmp_path / "snapshot.bin"
+    read_model.enabled = True
+    read_model.path = str(path)
+    assert (await client.get("/kigers")).status_code == 200
+    assert read_header(str(path)) == read_model.snapshot.header
+
+    statements = capture_statements(db_session)
+    worker = other_worker(path)
+    snapshot = await worker.ensure_built()
+    # 只查詢資料版本，與檔案相同時直接 map
+    assert len(statements) == 1
+    assert "FROM data_version" in statements[0]
+    assert snapshot.header == read_model.snapshot.header
+    assert snapshot.detail("kiger", "model-kiger-0")["name"] == "Model Kiger 0"
+
+
+async def test_update_bumps_generation_for_other_workers(
+    admin_client, db_session, tmp_path
+):
+    _, _, makers, _ = await seed(db_session)
+    path = tmp_path / "snapshot.bin"
+    read_model.enabled = True
+    read_model.path = str(path)
+    assert (await admin_client.get(f"/maker/{makers[0].id}")).status_code == 200
+    worker = other_worker(path)
+    before = await worker.ensure_built()
+    generation = before.header.generation
+
+    response = await admin_client.put(
+        f"/admin/maker/{makers[0].id}",
+        json={
+            "name": "Shared Maker",
+            "originalName": "ModelMaker0",
+            "Avatar": "https://example.com/shared.png",
+            "socialMedia": {"twitter": "https://twitter.com/shared"},
+        },
+    )
+    assert response.status_code == 200
+    await read_model.wait()
+    assert read_header(str(path)).generation > generation
+
+    # 舊的 mapping 仍指向替換前的檔案
+    after = await worker.ensure_built()
+    assert after is not before
+    assert before.detail("maker", makers[0].id)["name"] == "Model Maker 0"
+    assert after.detail("maker", makers[0].id)["name"] == "Shared Maker"
+
+
+async def test_stale_file_is_rebuilt_before_serving(client, db_session, tmp_path):
+    await seed(db_session)
+    path = tmp_path / "snapshot.bin"
+    read_model.enabled = True
+    read_model.path = str(path)
+    assert (await client.get("/kigers")).status_code == 200
+    stale = read_header(str(path))
+
+    # 上一次部署或匯入後留下的檔案：之後的修改沒有重建檔案
+    kiger = await db_session.get(DBKiger, "model-kiger-0")
+    kiger.name = "Changed Offline"
+    await db_session.commit()
+
+    worker = other_worker(path)
+    snapshot = await worker.ensure_built()
+    assert snapshot.header.data_version > stale.data_version
+    assert snapshot.detail("kiger", "model-kiger-0")["name"] == "Changed Offline"
+    assert read_header(str(path)) == snapshot.header
+
+
+async def test_waiting_worker_rechecks_file_after_lock(client, db_session, tmp_path):
+    await seed(db_session)
+    path = tmp_path / "snapshot.bin"
+    read_model.enabled = True
+    read_model.path = str(path)
+    assert (await client.get("/kigers")).status_code == 200
+    kiger = await db_session.get(DBKiger, "model-kiger-0")
+    kiger.name = "Rebuilt By Other"
+    await db_session.commit()
+
+    # 另一個 worker 正在重建：持有檔案鎖
+    fd = file_lock.acquire(f"{path}.lock")
+    worker = other_worker(path)
+    task = asyncio.create_task(worker.ensure_built())
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    statements = capture_statements(db_session)
+    async with read_model.open_session() as db:
+        await read_model.load_snapshot(db)
+    os.close(fd)
+
+    # 取得鎖後發現檔案已是最新版本，直接 map 不再載入
+    snapshot = await task
+    assert snapshot.header == read_model.snapshot.header
+    assert snapshot.detail("kiger", "model-kiger-0")["name"] == "Rebuilt By Other"
+    loads = [s for s in statements if "FROM kigers" in s]
+    assert len(loads) == 1
+
+
+async def test_failed_rebuild_is_retried(client, db_session, tmp_path):
+    await seed(db_session)
+    read_model.enabled = True
+    read_model.path = str(tmp_path / "snapshot.bin")
+    assert (await client.get("/kigers")).status_code == 200
+    before = read_model.snapshot
+    read_model.retry_delay = 0.01
+    load = read_model.load
+    attempts = []
+
+    async def flaky_load(db):
+        attempts.append(db)
+        if len(attempts) == 1:
+            raise ConnectionError("database went away")
+        return await load(db)
+
+    read_model.load = flaky_load
+    try:
+        read_model.schedule_rebuild()
+        await read_model.wait()
+    finally:
+        read_model.load = load
+    assert len(attempts) == 2
+    assert read_model.snapshot.header.generation > before.header.generation
+
+
+async def test_cancelled_lock_wait_releases_lock(tmp_path):
+    path = str(tmp_path / "read-model.bin.lock")
+    fd = file_lock.acquire(path)
+    task = asyncio.create_task(file_lock.acquire_async(path))
+    await asyncio.sleep(0.05)
+    # 例如用戶端斷線：等待中的 task 被取消
+    task.cancel()
+    await asyncio.sleep(0)
+    os.close(fd)
+
+    # thread 拿到鎖後立即釋放，之後的重建不會卡住
+    for _ in range(100):
+        if not file_lock.is_held(path):
+            break
+        await asyncio.sleep(0.01)
+    assert not file_lock.is_held(path)
+    assert task.cancelled()
+
+
+def test_shared_path_ignored_without_file_locks(monkeypatch, tmp_path):
+    monkeypatch.setattr("api.read_model.READ_MODEL_PATH", str(tmp_path / "m.bin"))
+    monkeypatch.setattr(file_lock, "supported", lambda: False)
+    read_model.reset()
+    assert read_model.path == ""
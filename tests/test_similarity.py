@@ -0,0 +1,137 @@
+import pytest
+
+from api.database import Character as DBCharacter
+from api.similarity import Candidate, TrigramIndex, similarity_index, trigrams
+
+
+def character_payload(original_name: str, name: str) -> dict:
+    return {
+        "name": name,
+        "originalName": original_name,
+        "type": "game",
+        "officialImage": "",
+        "source": {"title": "Arknights", "company": "Hypergryph", "releaseYear": 2019},
+    }
+
+
+async def seed(db_session):
+    amiya = DBCharacter(original_name="Amiya", name="阿米婭", type="game")
+    db_session.add_all(
+        [amiya, DBCharacter(original_name="Texas", name="德克薩斯", type="game")]
+    )
+    await db_session.commit()
+    return amiya
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_submit_character_reports_duplicates(client, db_session):
+    amiya = await seed(db_session)
+
+    response = await client.post("/character", json=character_payload("amiya ", ""))
+    assert response.status_code == 200
+    duplicates = response.json()["duplicates"]
+    assert duplicates == [
+        {
+            "type": "character",
+            "id": amiya.id,
+            "name": "阿米婭",
+            "originalName": "Amiya",
+            "similarity": 1.0,
+            "submitted": "amiya ",
+        }
+    ]
+
+    # 簡體名稱與已發布角色的繁體名稱部分相同
+    response = await client.post("/character", json=character_payload("阿米娅", ""))
+    assert [d["id"] for d in response.json()["duplicates"]] == [amiya.id]
+
+    response = await client.post("/character", json=character_payload("Exusiai", ""))
+    assert response.json()["duplicates"] == []
+
+
+async def test_duplicates_include_pending_characters(client, db_session):
+    await seed(db_session)
+
+    response = await client.post(
+        "/character", json=character_payload("スズラン", "鈴蘭")
+    )
+    pending_id = int(response.json()["id"])
+
+    # 片假名、平假名與半形片假名視為相同
+    response = await client.post("/character", json=character_payload("すずらん", ""))
+    duplicates = response.json()["duplicates"]
+    assert [(d["type"], d["id"]) for d in duplicates] == [
+        ("pendingCharacter", pending_id)
+    ]
+    response = await client.post("/character", json=character_payload("ｽｽﾞﾗﾝ", ""))
+    assert len(response.json()["duplicates"]) == 2
+
+
+async def test_editing_existing_character_is_not_duplicate(client, db_session):
+    await seed(db_session)
+
+    response = await client.post("/character", json=character_payload("Texas", "德狗"))
+    assert response.json()["duplicates"] == []
+
+
+@pytest.mark.usefixtures("enforce_query_budget")
+async def test_submit_kiger_reports_duplicates_for_new_characters(client, db_session):
+    amiya = await seed(db_session)
+
+    response = await client.post(
+        "/kiger",
+        json={
+            "name": "Doctor",
+            "bio": "",
+            "profileImage": "",
+            "isActive": True,
+            "socialMedia": {},
+            "Characters": [
+                {"images": [], "characterData": character_payload("AMIYA", "阿米娅")}
+            ],
+        },
+    )
+    assert response.status_code == 200
+    duplicates = response.json()["duplicates"]
+    assert [(d["id"], d["submitted"]) for d in duplicates] == [(amiya.id, "AMIYA")]
+
+
+async def test_review_updates_index(admin_client, db_session):
+    await seed(db_session)
+    response = await admin_client.post(
+        "/character", json=character_payload("Kal'tsit", "凱爾希")
+    )
+    pending_id = response.json()["id"]
+
+    response = await admin_client.post(
+        f"/admin/review/character/{pending_id}", json={"action": "approve"}
+    )
+    assert response.status_code == 200
+    key = ("pendingCharacter", int(pending_id))
+    assert key not in similarity_index.index.candidates
+
+    response = await admin_client.post(
+        "/character", json=character_payload("Kaltsit", "")
+    )
+    assert [d["type"] for d in response.json()["duplicates"]] == ["character"]
+
+
+def test_trigram_index_similarity():
+    assert trigrams("Amiya") == trigrams("ＡＭＩＹＡ") == trigrams(" amiya ")
+    assert trigrams("アミヤ") == trigrams("あみや")
+
+    index = TrigramIndex.build(
+        [
+            Candidate("character", 1, "初音未來", "Hatsune Miku"),
+            Candidate("character", 2, "初音未來男", "Hatsune Mikuo"),
+            Candidate("character", 3, "鏡音鈴", "Kagamine Rin"),
+        ]
+    )
+    similar = index.similar(["hatsune miku"])
+    assert similar[("character", 1)] == 1.0
+    assert 0.3 < similar[("character", 2)] < 1.0
+    assert ("character", 3) not in similar
+
+    index.remove(("character", 1))
+    assert ("character", 1) not in index.similar(["hatsune miku"])
+    assert len(index) == 2
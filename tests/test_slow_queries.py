@@ -0,0 +1,144 @@
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api.database import Base, create_read_engine
+from api.database import Kiger as DBKiger
+from api.querylog import slow_query_recorder
+from api.sqlite import configure_sqlite
+
+
+@pytest.fixture()
+def record_all_queries():
+    threshold = slow_query_recorder.threshold_ms
+    sample_rate = slow_query_recorder.sample_rate
+    slow_query_recorder.threshold_ms = 0
+    slow_query_recorder.sample_rate = 1.0
+    slow_query_recorder.clear()
+    yield slow_query_recorder
+    slow_query_recorder.threshold_ms = threshold
+    slow_query_recorder.sample_rate = sample_rate
+    slow_query_recorder.clear()
+
+
+async def test_slow_queries_requires_auth(client):
+    response = await client.get("/admin/slow-queries")
+    assert response.status_code in (401, 403)
+
+
+async def test_slow_queries_captures_statement_and_explain(
+    admin_client, db_session, record_all_queries
+):
+    db_session.add(DBKiger(id="slow-kiger", name="Slow", bio=""))
+    await db_session.commit()
+    record_all_queries.clear()
+
+    await admin_client.get("/kiger/slow-kiger")
+
+    response = await admin_client.get("/admin/slow-queries")
+    assert response.status_code == 200
+    entries = response.json()
+    kiger_queries = [e for e in entries if "FROM kigers" in e["statement"]]
+    assert kiger_queries
+    entry = kiger_queries[0]
+    assert entry["path"] == "/kiger/slow-kiger"
+    assert entry["durationMs"] >= 0
+    assert entry["explain"]
+    assert "kigers" in " ".join(entry["explain"])
+
+
+async def test_slow_queries_below_threshold_not_recorded(admin_client):
+    slow_query_recorder.clear()
+    await admin_client.get("/kigers")
+
+    response = await admin_client.get("/admin/slow-queries")
+    assert response.json() == []
+
+
+async def test_slow_queries_sampling_and_ring_buffer(admin_client, record_all_queries):
+    record_all_queries.sample_rate = 0.0
+    await admin_client.get("/kigers")
+    assert (await admin_client.get("/admin/slow-queries")).json() == []
+    record_all_queries.sample_rate = 1.0
+
+    for _ in range(record_all_queries.entries.maxlen + 5):
+        await admin_client.get("/makers")
+    assert len(record_all_queries.entries) == record_all_queries.entries.maxlen
+
+
+async def test_slow_queries_clear(admin_client, record_all_queries):
+    await admin_client.get("/kigers")
+    response = await admin_client.delete("/admin/slow-queries")
+    assert response.status_code == 200
+    assert record_all_queries.list() == []
+
+
+async def test_slow_queries_explain_uses_separate_connection(
+    admin_client, db_session, record_all_queries
+):
+    db_session.add(DBKiger(id="slow-kiger", name="Slow", bio=""))
+    await db_session.commit()
+    record_all_queries.clear()
+    connections = {}
+
+    def before_cursor_execute(conn, _cursor, statement, *_args):
+        connections.setdefault(statement.split()[0], set()).add(conn)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        await admin_client.get("/kiger/slow-kiger")
+        await record_all_queries.wait()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    entry = next(
+        e for e in record_all_queries.list() if "FROM kigers" in e["statement"]
+    )
+    assert "kigers" in " ".join(entry["explain"])
+    # EXPLAIN 在背景另外取得的連線上執行，不在請求的 transaction 中，也不會被記錄
+    assert connections["EXPLAIN"].isdisjoint(connections["SELECT"])
+    assert not any(
+        e["statement"].startswith("EXPLAIN") for e in record_all_queries.list()
+    )
+
+
+async def test_slow_queries_explain_writer_queries_on_read_engine(
+    tmp_path, record_all_queries
+):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'explain.db'}"
+    writer = create_async_engine(url)
+    configure_sqlite(writer, writer=True)
+    read = create_read_engine(url, "explain-test")
+    record_all_queries.explain_with(writer, read)
+    statements = {writer: [], read: []}
+
+    def track(engine):
+        def before_cursor_execute(_conn, _cursor, statement, *_args):
+            statements[engine].append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    track(writer)
+    track(read)
+    try:
+        async with writer.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        record_all_queries.clear()
+        statements[writer].clear()
+        async with AsyncSession(writer) as session:
+            await session.execute(select(DBKiger))
+            await session.commit()
+        await record_all_queries.wait()
+    finally:
+        record_all_queries.explain_engines.pop(writer.sync_engine)
+        await writer.dispose()
+        await read.dispose()
+
+    entry = next(
+        e for e in record_all_queries.list() if "FROM kigers" in e["statement"]
+    )
+    assert "kigers" in " ".join(entry["explain"])
+    # EXPLAIN 不經過寫入的 engine，不會以 BEGIN IMMEDIATE 取得寫入鎖
+    assert not any(s.startswith("EXPLAIN") for s in statements[writer])
+    assert any(s.startswith("EXPLAIN") for s in statements[read])
@@ -0,0 +1,219 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from fastapi.routing import APIRoute
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import api.database
+import api.sqlite
+from api.auth import get_password_hash
+from api.database import (
+    Admin,
+    Base,
+    create_read_engine,
+    engine_options,
+    get_db,
+    get_primary_read_db,
+)
+from api.main import app
+from tests.test_public_read import dependency_calls
+from api.metrics import begin_request
+from api.sqlite import SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE, configure_sqlite
+
+
+async def test_pragmas_applied_to_new_connections(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'tuned.db'}"
+    engine = create_async_engine(url, **engine_options(url))
+    configure_sqlite(engine, writer=True)
+
+    async with engine.connect() as conn:
+        for pragma, expected in (
+            ("journal_mode", "wal"),
+            ("synchronous", 1),
+            ("mmap_size", SQLITE_MMAP_SIZE),
+            ("cache_size", -SQLITE_CACHE_SIZE_KB),
+            ("foreign_keys", 1),
+        ):
+            assert (await conn.exec_driver_sql(f"PRAGMA {pragma}")).scalar() == expected
+    await engine.dispose()
+
+
+async def test_writer_takes_lock_at_begin(tmp_path, monkeypatch):
+    monkeypatch.setattr(api.sqlite, "SQLITE_BUSY_TIMEOUT_MS", 50)
+    url = f"sqlite+aiosqlite:///{tmp_path / 'writer.db'}"
+    engine = create_async_engine(url, **engine_options(url))
+    configure_sqlite(engine, writer=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # BEGIN IMMEDIATE 不計入請求的查詢數
+    stats = begin_request()
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT 1"))
+    assert stats.queries == 1
+
+    async with engine.connect() as first, engine.connect() as second:
+        # BEGIN IMMEDIATE 在尚未寫入前就持有寫入鎖
+        await first.begin()
+        await first.execute(text("SELECT 1"))
+        with pytest.raises(OperationalError, match="locked"):
+            await second.begin()
+            await second.execute(text("SELECT 1"))
+    await engine.dispose()
+
+
+async def test_get_db_serializes_writers(tmp_path, monkeypatch):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'queue.db'}"
+    engine = create_async_engine(url, **engine_options(url))
+    configure_sqlite(engine, writer=True)
+    monkeypatch.setattr(
+        api.database,
+        "async_session_maker",
+        async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    monkeypatch.setattr(api.database, "write_queue", asyncio.Lock())
+    events = []
+
+    async def write(name: str):
+        async for db in get_db():
+            events.append(f"{name} start")
+            await db.execute(text("CREATE TABLE IF NOT EXISTS t (x)"))
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    await asyncio.gather(write("a"), write("b"))
+    assert events == ["a start", "a end", "b start", "b end"]
+    await engine.dispose()
+
+
+async def test_write_queue_released_after_commit(tmp_path, monkeypatch):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'release.db'}"
+    engine = create_async_engine(url, **engine_options(url))
+    configure_sqlite(engine, writer=True)
+    monkeypatch.setattr(
+        api.database,
+        "async_session_maker",
+        async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    queue = asyncio.Lock()
+    monkeypatch.setattr(api.database, "write_queue", queue)
+    committed = asyncio.Event()
+    events = []
+
+    async def commit_then_wait():
+        async for db in get_db():
+            await db.execute(text("CREATE TABLE t (x)"))
+            await db.commit()
+            committed.set()
+            # 例如等待讀取模型重建
+            await asyncio.sleep(0.2)
+            events.append("first done")
+
+    async def next_writer():
+        await committed.wait()
+        async for db in get_db():
+            await db.execute(text("INSERT INTO t VALUES (1)"))
+            events.append("second wrote")
+
+    await asyncio.gather(commit_then_wait(), next_writer())
+    assert events == ["second wrote", "first done"]
+    assert not queue.locked()
+    await engine.dispose()
+
+
+async def test_primary_read_db_does_not_wait_for_writers(monkeypatch):
+    queue = asyncio.Lock()
+    monkeypatch.setattr(api.database, "write_queue", queue)
+    await queue.acquire()
+    try:
+        # 管理員驗證與待審核列表不會排在寫入之後
+        async with asyncio.timeout(1):
+            async for db in get_primary_read_db():
+                assert db.bind is api.database.read_engine
+    finally:
+        queue.release()
+
+
+def test_only_mutating_routes_use_get_db():
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        calls = dependency_calls(route.dependant)
+        if route.methods == {"GET"} or route.path == "/admin/login":
+            assert get_db not in calls, route.path
+    mutating = {
+        route.path
+        for route in app.routes
+        if isinstance(route, APIRoute) and get_db in dependency_calls(route.dependant)
+    }
+    assert mutating == {
+        "/kiger",
+        "/character",
+        "/maker",
+        "/admin/review/kiger/{kiger_id}",
+        "/admin/review/character/{character_id}",
+        "/admin/review/maker/{maker_id}",
+        "/admin/kiger/{kiger_id}",
+        "/admin/character/{character_id}",
+        "/admin/maker/{maker_id}",
+    }
+
+
+async def test_app_sessions_without_overrides(tmp_path, monkeypatch):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    writer = create_async_engine(url, **engine_options(url))
+    configure_sqlite(writer, writer=True)
+    reader = create_read_engine(url, "test-read")
+    async with writer.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            Admin.__table__.insert(),
+            {"username": "sqlite-admin", "hashed_password": get_password_hash("pw")},
+        )
+    monkeypatch.setattr(
+        api.database,
+        "async_session_maker",
+        async_sessionmaker(writer, class_=AsyncSession, expire_on_commit=False),
+    )
+    monkeypatch.setattr(
+        api.database,
+        "read_session_maker",
+        async_sessionmaker(reader, class_=AsyncSession, expire_on_commit=False),
+    )
+    queue = asyncio.Lock()
+    monkeypatch.setattr(api.database, "write_queue", queue)
+    monkeypatch.setattr(app.state.limiter, "enabled", False)
+    assert app.dependency_overrides == {}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://testserver"
+    ) as client:
+        response = await client.post(
+            "/admin/login", json={"username": "sqlite-admin", "password": "pw"}
+        )
+        assert response.status_code == 200
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        # get_db 的寫入會 commit
+        response = await client.post(
+            "/maker",
+            json={
+                "name": "Queued",
+                "originalName": "Queued",
+                "Avatar": "",
+                "socialMedia": {},
+            },
+        )
+        assert response.status_code == 200
+
+        # autocommit 的主資料庫讀取看得到已 commit 的資料，也不等待寫入佇列
+        async with queue:
+            async with asyncio.timeout(1):
+                response = await client.get("/admin/pending/makers")
+        assert [maker["name"] for maker in response.json()] == ["Queued"]
+
+    await reader.dispose()
+    await writer.dispose()